@@ -1,7 +1,12 @@
+import os
+
 from django.apps import AppConfig
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
-    path = r'D:\radiology_v2\backend\accounts'  # Explicit path to resolve conflict
\ No newline at end of file
+    path = os.path.dirname(os.path.abspath(__file__))  # Explicit path to resolve conflict
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,278 @@
+"""
+Buffered audit log writer
+
+Audit entries (AuditLog, UserActivityLog and PatientAuditLog rows) are queued in-process when
+the surrounding transaction commits and inserted in batches, off the request
+path, once the queue reaches its batch size or the flush interval elapses.
+
+AUDIT_LOG['mode'] selects the pipeline:
+    sync      insert every entry immediately
+    buffered  batch in-process, flushed by a background thread
+    celery    batch in-process, hand each batch to a Celery worker
+
+Actions listed in AUDIT_LOG['sync_actions'] and entries written with
+durable=True are always inserted before the call returns. Anything still
+queued is flushed at interpreter exit.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connections, models, router, transaction
+from django.db.models.constants import OnConflict
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import AuditLog
+from .rbac_models import UserActivityLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_MODES = ('sync', 'buffered', 'celery')
+
+# Sent with entries (the inserted instances) after audit rows are written;
+# post_save is not sent for them
+audit_entries_written = Signal()
+
+
+def get_audit_config():
+    """AUDIT_LOG settings with defaults; celery mode needs a broker"""
+    config = {
+        'mode': 'buffered',
+        'batch_size': 200,
+        'flush_interval': 2.0,
+        'max_buffer_size': 5000,
+        'sync_actions': [],
+    }
+    config.update(getattr(settings, 'AUDIT_LOG', {}))
+    if config['mode'] not in AUDIT_MODES:
+        logger.warning(f"Unknown audit log mode {config['mode']!r}, writing synchronously")
+        config['mode'] = 'sync'
+    if config['mode'] == 'celery' and not (
+        getattr(settings, 'CELERY_BROKER_URL', '') or getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False)
+    ):
+        config['mode'] = 'buffered'
+    return config
+
+
+def insert_entries(model, entries):
+    """
+    Insert audit instances in multi-row INSERT statements
+
+    Raw inserts keep the timestamps captured when each entry was logged
+    instead of the auto_now_add value at flush time. Rows whose primary key
+    already exists (a redelivered queue batch) are skipped.
+    """
+    if not entries:
+        return
+    using = router.db_for_write(model)
+    connection = connections[using]
+    fields = model._meta.concrete_fields
+    batch_size = max(connection.ops.bulk_batch_size(fields, entries), 1)
+    on_conflict = OnConflict.IGNORE if connection.features.supports_ignore_conflicts else None
+
+    with transaction.atomic(using=using, savepoint=False):
+        for start in range(0, len(entries), batch_size):
+            model._base_manager._insert(
+                entries[start:start + batch_size],
+                fields=fields,
+                using=using,
+                raw=True,
+                on_conflict=on_conflict
+            )
+    for entry in entries:
+        entry._state.adding = False
+        entry._state.db = using
+    audit_entries_written.send(sender=model, entries=entries)
+
+
+def serialize_entries(entries):
+    """JSON payload of audit instances for the Celery queue"""
+    fields = entries[0]._meta.concrete_fields
+    return json.dumps(
+        [{field.attname: getattr(entry, field.attname) for field in fields} for entry in entries],
+        cls=DjangoJSONEncoder
+    )
+
+
+def deserialize_entries(model, payload):
+    """Unsaved audit instances from a serialize_entries payload"""
+    fields = model._meta.concrete_fields
+    entries = []
+    for row in json.loads(payload):
+        values = {}
+        for field in fields:
+            value = row.get(field.attname)
+            if value is not None and not isinstance(field, models.JSONField):
+                value = field.to_python(value)
+            values[field.attname] = value
+        entries.append(model(**values))
+    return entries
+
+
+class AuditWriter:
+    """
+    Process-wide audit queue with size, interval and shutdown flushes
+    """
+
+    def __init__(self):
+        self._reset()
+        atexit.register(self.flush)
+        if hasattr(os, 'register_at_fork'):
+            # Forked workers start with an empty queue and their own flusher
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = []
+        self._thread = None
+
+    def write(self, entry, durable=False):
+        """
+        Queue an unsaved audit instance, or insert it now when durable
+
+        The entry is queued when the current transaction commits and dropped
+        if it rolls back, like a regular insert would be.
+        """
+        now = timezone.now()
+        for field in entry._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                if getattr(entry, field.attname) is None:
+                    setattr(entry, field.attname, now)
+
+        config = get_audit_config()
+        if durable or config['mode'] == 'sync' or entry.action in config['sync_actions']:
+            insert_entries(type(entry), [entry])
+            return entry
+
+        transaction.on_commit(lambda: self._enqueue(entry, config), using=router.db_for_write(type(entry)))
+        return entry
+
+    def _enqueue(self, entry, config):
+        with self._lock:
+            self._pending.append(entry)
+            pending = len(self._pending)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._thread.start()
+
+        if pending >= config['max_buffer_size']:
+            # Writer is falling behind; flush in the caller to bound memory
+            self.flush()
+        elif pending >= config['batch_size']:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(get_audit_config()['flush_interval'])
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Audit log flush failed: {str(e)}")
+            finally:
+                close_old_connections()
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Write every queued entry and return how many were handed off
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+
+            by_model = {}
+            for entry in pending:
+                by_model.setdefault(type(entry), []).append(entry)
+
+            config = get_audit_config()
+            batch_size = config['batch_size']
+            for model, entries in by_model.items():
+                for start in range(0, len(entries), batch_size):
+                    batch = entries[start:start + batch_size]
+                    if config['mode'] == 'celery' and self._dispatch(model, batch):
+                        continue
+                    self._insert_batch(model, batch)
+            return len(pending)
+
+    def _dispatch(self, model, entries):
+        """Queue a batch for a Celery worker; False if the broker is unavailable"""
+        try:
+            from .tasks import write_audit_entries
+            write_audit_entries.delay(model._meta.label, serialize_entries(entries))
+            return True
+        except Exception as e:
+            logger.warning(f"Audit queue unavailable, writing {len(entries)} entries directly: {str(e)}")
+            return False
+
+    def _insert_batch(self, model, entries):
+        """Insert a batch, falling back to row by row so one bad entry is isolated"""
+        try:
+            insert_entries(model, entries)
+            return
+        except Exception as e:
+            logger.warning(f"Audit batch insert failed, retrying entries one by one: {str(e)}")
+
+        for entry in entries:
+            try:
+                insert_entries(model, [entry])
+            except Exception as e:
+                logger.error(f"Dropped {model.__name__} entry {entry.pk} ({entry.action}): {str(e)}")
+
+
+audit_writer = AuditWriter()
+
+
+def log_audit_event(user, action, resource_type=None, resource_id=None, details=None, request=None, durable=False):
+    """
+    Record an accounts AuditLog entry through the audit writer
+    """
+    ip_address = None
+    user_agent = None
+    if request is not None:
+        from .permissions import get_client_ip
+        ip_address = get_client_ip(request)
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+
+    return audit_writer.write(
+        AuditLog(
+            user=user,
+            action=action,
+            resource_type=resource_type,
+            resource_id=resource_id,
+            details=details if details is not None else {},
+            ip_address=ip_address,
+            user_agent=user_agent
+        ),
+        durable=durable
+    )
+
+
+def log_activity_event(user, activity_type, description='', request=None, durable=False, **fields):
+    """
+    Record an RBAC UserActivityLog entry through the audit writer
+    """
+    if request is not None:
+        from .permissions import get_client_ip
+        fields.setdefault('ip_address', get_client_ip(request))
+        fields.setdefault('user_agent', request.META.get('HTTP_USER_AGENT', ''))
+    if not fields.get('ip_address'):
+        fields['ip_address'] = '127.0.0.1'  # the column is not nullable
+
+    return audit_writer.write(
+        UserActivityLog(user=user, activity_type=activity_type, description=description, **fields),
+        durable=durable
+    )
@@ -0,0 +1,360 @@
+"""
+Cached token authentication
+
+DRF's TokenAuthentication resolves every request with a Token + User join.
+CachedTokenAuthentication keeps the token -> user resolution in a bounded
+in-process TTL cache, backed by the shared Django cache (Redis when
+configured) when AUTH_TOKEN_CACHE['shared'] is set.
+
+Cached entries carry two per-user version stamps and are discarded as soon as
+either changes:
+
+- 'auth' is bumped when the user's credentials are revoked: logout (the token
+  is deleted), password change and deactivation (see accounts.signals);
+- 'user' is bumped on any other save of the user, so the cached user object
+  is reloaded.
+
+The stamps live in the Django cache, so without the shared cache they only
+reach the process that made the change. Entries are then also checked against
+the user's durable auth_version column, bumped by every revocation, with one
+primary key lookup per request: a logout, password change or deactivation in
+another worker takes effect immediately, other user changes within
+local_timeout.
+
+With AUTH_TOKEN_CACHE['signed_tokens'] enabled, signed simplejwt access tokens
+sent as "Bearer <token>" are accepted as well. They carry the user's
+auth_version, a column bumped on every revocation, and are verified from
+their signature and that version, read through the shared cache. Signed
+tokens need the shared cache (a per-process cache would miss revocations
+made by other workers); they stay disabled without it.
+"""
+
+import copy
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+from .permission_cache import PermissionCache
+
+logger = logging.getLogger(__name__)
+
+AUTH_VERSION_CLAIM = 'auth_version'
+
+
+def get_token_cache_config():
+    """AUTH_TOKEN_CACHE settings with defaults"""
+    config = {
+        'timeout': 300,
+        'local_timeout': 30,
+        'local_max_entries': 1000,
+        'shared': False,
+        'signed_tokens': False,
+    }
+    config.update(getattr(settings, 'AUTH_TOKEN_CACHE', {}))
+    return config
+
+
+_signed_tokens_warned = False
+
+
+def signed_tokens_enabled():
+    """Whether signed tokens are issued and accepted (they require the shared cache)"""
+    global _signed_tokens_warned
+    config = get_token_cache_config()
+    if not config['signed_tokens']:
+        return False
+    if not config['shared']:
+        if not _signed_tokens_warned:
+            _signed_tokens_warned = True
+            logger.warning("AUTH_SIGNED_TOKENS is ignored without AUTH_TOKEN_CACHE_SHARED: revocations would not reach other processes")
+        return False
+    return True
+
+
+class BoundedTTLCache:
+    """
+    Thread-safe LRU mapping whose entries expire after a fixed number of seconds
+    """
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TokenCache:
+    """
+    Versioned cache of authenticated users, keyed by token digest or user id
+    """
+
+    CACHE_PREFIX = 'auth_token'
+    _local = None
+    _local_lock = threading.Lock()
+
+    @staticmethod
+    def _version_key(scope):
+        return f"{TokenCache.CACHE_PREFIX}:version:{scope}"
+
+    @staticmethod
+    def token_key(key):
+        # Raw tokens never end up in cache keys
+        return f"{TokenCache.CACHE_PREFIX}:token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+    @staticmethod
+    def user_key(user_id):
+        return f"{TokenCache.CACHE_PREFIX}:user:{user_id}"
+
+    @staticmethod
+    def local_cache():
+        if TokenCache._local is None:
+            with TokenCache._local_lock:
+                if TokenCache._local is None:
+                    config = get_token_cache_config()
+                    TokenCache._local = BoundedTTLCache(config['local_max_entries'], config['local_timeout'])
+        return TokenCache._local
+
+    @staticmethod
+    def versions(user_id):
+        """Current ('auth', 'user') stamps of a user"""
+        auth_key = TokenCache._version_key(f'auth:{user_id}')
+        user_key = TokenCache._version_key(f'user:{user_id}')
+        stamps = cache.get_many([auth_key, user_key])
+        return (stamps.get(auth_key, 0), stamps.get(user_key, 0))
+
+    @staticmethod
+    def _load_auth_version(user_id):
+        """auth_version of an active user from the database, None for unknown or inactive users"""
+        from django.contrib.auth import get_user_model
+
+        return get_user_model().objects.filter(pk=user_id, is_active=True).values_list(
+            'auth_version', flat=True
+        ).first()
+
+    @staticmethod
+    def auth_version(user_id):
+        """
+        Durable auth_version of an active user, through the shared cache
+
+        None for unknown or inactive users, so their signed tokens are refused.
+        """
+        cache_key = TokenCache._version_key(f'signed:{user_id}')
+        version = cache.get(cache_key)
+        if version is not None:
+            return version
+        started = time.time_ns()
+        version = TokenCache._load_auth_version(user_id)
+        # Not cached over a revocation that committed while reading
+        if version is not None and TokenCache.versions(user_id)[0] < started:
+            cache.set(cache_key, version, get_token_cache_config()['timeout'])
+        return version
+
+    @staticmethod
+    def _snapshot(user):
+        """Copy of a user without per-request state"""
+        user = copy.copy(user)
+        PermissionCache.clear_memo(user)
+        return user
+
+    @staticmethod
+    def resolve(cache_key, load):
+        """
+        User for a cache key: local cache, then the shared cache, then load()
+
+        Entries are only stored when no stamp was bumped after loading started,
+        so a revocation racing with the load is never cached over. Without the
+        shared cache, revocations made by other processes are caught through
+        the auth_version loaded with the user.
+        """
+        config = get_token_cache_config()
+        local = TokenCache.local_cache()
+
+        entry = local.get(cache_key)
+        if entry is None and config['shared']:
+            entry = cache.get(cache_key)
+            if entry is not None:
+                local.set(cache_key, entry)
+        if entry is not None:
+            user = entry['user']
+            if TokenCache.versions(user.pk) == entry['versions'] and (
+                config['shared'] or TokenCache._load_auth_version(user.pk) == user.auth_version
+            ):
+                return TokenCache._snapshot(user)
+            local.delete(cache_key)
+
+        started = time.time_ns()
+        user = load()
+        versions = TokenCache.versions(user.pk)
+        if max(versions) < started:
+            entry = {'user': TokenCache._snapshot(user), 'versions': versions}
+            local.set(cache_key, entry)
+            if config['shared']:
+                cache.set(cache_key, entry, config['timeout'])
+        return user
+
+    @staticmethod
+    def forget(key):
+        """Drop a token's entries (other processes see the 'auth' stamp instead)"""
+        cache_key = TokenCache.token_key(key)
+        TokenCache.local_cache().delete(cache_key)
+        if get_token_cache_config()['shared']:
+            cache.delete(cache_key)
+
+    @staticmethod
+    def _bump(scope, user_ids):
+        version = time.time_ns()
+        scopes = {f'{scope}:{user_id}' for user_id in user_ids if user_id is not None}
+        if scopes:
+            cache.set_many({TokenCache._version_key(scope): version for scope in scopes}, timeout=None)
+
+    @staticmethod
+    def _revoked(user_ids):
+        TokenCache._bump('auth', user_ids)
+        cache.delete_many([TokenCache._version_key(f'signed:{user_id}') for user_id in user_ids])
+
+    @staticmethod
+    def revoke(user_ids):
+        """
+        Invalidate every cached and signed token of the given users
+
+        auth_version is bumped in the surrounding transaction; cached entries
+        are dropped once it commits.
+        """
+        from django.contrib.auth import get_user_model
+
+        user_ids = [user_id for user_id in user_ids if user_id is not None]
+        if not user_ids:
+            return
+        # update() sends no post_save, so the revoking save is not recursed into
+        get_user_model().objects.filter(pk__in=user_ids).update(auth_version=F('auth_version') + 1)
+        transaction.on_commit(lambda: TokenCache._revoked(user_ids))
+
+    @staticmethod
+    def refresh(user_ids):
+        """Reload the cached user objects of the given users"""
+        TokenCache._bump('user', user_ids)
+
+
+def issue_signed_tokens(user):
+    """Signed refresh/access token pair bound to the user's current auth_version"""
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    refresh = RefreshToken.for_user(user)
+    refresh[AUTH_VERSION_CLAIM] = TokenCache.auth_version(user.pk)
+    return {'access': str(refresh.access_token), 'refresh': str(refresh)}
+
+
+def check_signed_token(token):
+    """User id of a signed token still valid under its user's auth_version, else None"""
+    from rest_framework_simplejwt.settings import api_settings
+
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if user_id is None or not signed_tokens_enabled():
+        return None
+    version = TokenCache.auth_version(user_id)
+    if version is None or token.get(AUTH_VERSION_CLAIM) != version:
+        return None
+    return user_id
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication with cached token resolution and optional signed tokens
+    """
+
+    signed_keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if (
+            len(auth) == 2 and
+            auth[0].lower() == self.signed_keyword.lower().encode() and
+            signed_tokens_enabled()
+        ):
+            try:
+                raw_token = auth[1].decode()
+            except UnicodeError:
+                raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain invalid characters.'))
+            return self.authenticate_signed(raw_token)
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+
+        def load():
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            return token.user
+
+        user = TokenCache.resolve(TokenCache.token_key(key), load)
+        token = model(key=key, user=user)
+        return (user, token)
+
+    def authenticate_signed(self, raw_token):
+        from rest_framework_simplejwt.exceptions import TokenError
+        from rest_framework_simplejwt.settings import api_settings
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        try:
+            token = AccessToken(raw_token)
+        except TokenError as e:
+            raise exceptions.AuthenticationFailed(str(e))
+
+        user_id = check_signed_token(token)
+        if user_id is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        def load():
+            from django.contrib.auth import get_user_model
+
+            user_model = get_user_model()
+            try:
+                user = user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except user_model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            return user
+
+        return (TokenCache.resolve(TokenCache.user_key(user_id), load), token)
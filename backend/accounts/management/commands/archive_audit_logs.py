@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.partitioning import (
+    PARTITIONED_MODELS, archive_month, drop_month, ensure_partitions, expired_months,
+    get_partitioned_models, get_partitioning_config
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Create upcoming monthly audit log partitions, then archive months past '
+        'their retention period to compressed NDJSON and drop them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            action='append',
+            choices=list(PARTITIONED_MODELS),
+            help='Audit model to process (repeatable; all by default)',
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            help='Override the configured retention period for every selected model',
+        )
+        parser.add_argument(
+            '--output-dir',
+            help='Directory for archive files (AUDIT_ARCHIVE_DIR by default)',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Write archive files but keep the archived rows',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the months that would be archived',
+        )
+
+    def handle(self, *args, **options):
+        config = get_partitioning_config()
+        models = [
+            model for model in get_partitioned_models()
+            if not options['model'] or model._meta.label in options['model']
+        ]
+
+        self.stdout.write("=== AUDIT LOG PARTITIONS AND RETENTION ===\n")
+        failures = 0
+        for model in models:
+            label = model._meta.label
+
+            if not options['dry_run']:
+                for name in ensure_partitions(model):
+                    self.stdout.write(f"{label}: created partition {name}")
+
+            retention = options['retention_months']
+            if retention is None:
+                retention = config['retention_months'].get(label, 0)
+            if not retention:
+                self.stdout.write(f"{label}: no retention period, keeping all rows")
+                continue
+
+            months = expired_months(model, retention)
+            if not months:
+                self.stdout.write(f"{label}: nothing older than {retention} months")
+                continue
+
+            for month in months:
+                if options['dry_run']:
+                    self.stdout.write(f"{label}: would archive {month:%Y-%m}")
+                    continue
+
+                path, rows = archive_month(model, month, options['output_dir'])
+                if path:
+                    self.stdout.write(f"{label}: archived {rows} rows for {month:%Y-%m} to {path}")
+                if options['keep']:
+                    continue
+                try:
+                    drop_month(model, month, rows)
+                except RuntimeError as e:
+                    failures += 1
+                    self.stdout.write(self.style.WARNING(f"{label}: kept {month:%Y-%m}: {str(e)}"))
+                    continue
+                self.stdout.write(f"{label}: dropped {month:%Y-%m}")
+
+        if failures:
+            raise CommandError(f"{failures} archived month(s) changed during export and were kept; run again")
+        self.stdout.write(self.style.SUCCESS("Audit log maintenance complete"))
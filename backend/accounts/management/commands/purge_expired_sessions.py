@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from accounts.presence import Presence
+
+
+class Command(BaseCommand):
+    help = 'Delete expired user sessions and stale online-presence entries'
+
+    def handle(self, *args, **options):
+        purged = Presence.purge()
+        self.stdout.write(f"Expired sessions deleted: {purged['sessions']}")
+        if 'redis_users' in purged:
+            self.stdout.write(
+                f"Stale presence entries removed: {purged['redis_users']} users, "
+                f"{purged['redis_sessions']} sessions"
+            )
@@ -0,0 +1,33 @@
+"""
+Presence tracking for authenticated requests (see accounts/presence.py)
+"""
+
+import logging
+
+from .presence import Presence, get_presence_config
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceMiddleware:
+    """
+    Records the last-seen time of the user and session after each response
+
+    Runs after the view so users authenticated by DRF (token or signed token)
+    are seen as well as session users.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = get_presence_config()['enabled']
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if self.enabled:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                try:
+                    Presence.touch(request, user)
+                except Exception as e:
+                    logger.warning(f"Presence update failed for user {user.pk}: {str(e)}")
+        return response
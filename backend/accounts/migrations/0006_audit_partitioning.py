@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:31
+
+from django.db import migrations, models
+
+from accounts.partitioning import partition_table, unpartition_table
+
+# Audit tables and the timestamp column they are partitioned by (PostgreSQL only)
+PARTITIONED_TABLES = {
+    "auth_audit_logs": "timestamp",
+    "user_activity_logs": "timestamp",
+}
+
+
+def partition_audit_tables(apps, schema_editor):
+    for table, column in PARTITIONED_TABLES.items():
+        partition_table(schema_editor, table, column)
+
+
+def unpartition_audit_tables(apps, schema_editor):
+    for table in PARTITIONED_TABLES:
+        unpartition_table(schema_editor, table)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0005_registrationnotification"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(fields=["-timestamp"], name="auth_audit__timesta_f9004d_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="useractivitylog",
+            index=models.Index(fields=["-timestamp"], name="user_activi_timesta_5d25b4_idx"),
+        ),
+        migrations.RunPython(partition_audit_tables, unpartition_audit_tables),
+    ]
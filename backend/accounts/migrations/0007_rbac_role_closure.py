@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from accounts.rbac_models import rebuild_role_closure
+
+
+def build_closure(apps, schema_editor):
+    rebuild_role_closure(apps.get_model('accounts', 'RBACRole'), apps.get_model('accounts', 'RBACRoleClosure'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_audit_partitioning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RBACRoleClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='accounts.rbacrole')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='accounts.rbacrole')),
+            ],
+            options={
+                'db_table': 'rbac_role_closure',
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='rbac_role_c_descend_09b005_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
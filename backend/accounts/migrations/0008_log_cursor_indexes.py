@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:48
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# Expressions match the SQL Django emits for __icontains on PostgreSQL, so the
+# activity log search is served by these indexes.
+TRIGRAM_INDEXES = {
+    "user_activity_action_trgm": 'UPPER(("action")::text) gin_trgm_ops',
+    "user_activity_description_trgm": 'UPPER(("description")::text) gin_trgm_ops',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, expression in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" '
+            f'ON "user_activity_logs" USING gin ({expression})'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_rbac_role_closure'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='auth_audit__timesta_2afcc4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(fields=['-timestamp', '-id'], name='user_activi_timesta_298f92_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='auth_audit__timesta_f9004d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='useractivitylog',
+            name='user_activi_timesta_5d25b4_idx',
+        ),
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_log_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersession',
+            index=models.Index(fields=['-last_activity'], name='user_sessio_last_ac_0963e2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersession',
+            index=models.Index(fields=['expires_at'], name='user_sessio_expires_66ae96_idx'),
+        ),
+    ]
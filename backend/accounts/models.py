@@ -81,6 +81,8 @@ class User(AbstractUser):
     is_approved = models.BooleanField(default=False)
     is_suspended = models.BooleanField(default=False)
     last_login_ip = models.GenericIPAddressField(blank=True, null=True)
+    # Bumped when credentials are revoked; signed tokens carry the version they were issued under
+    auth_version = models.PositiveIntegerField(default=0, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -94,23 +96,27 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.full_name or self.username} ({self.email})"
     
+    def save(self, *args, **kwargs):
+        """auth_version is only written by TokenCache.revoke, never from a possibly stale instance"""
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'auth_version'
+            ]
+        super().save(*args, **kwargs)
+    
+    def get_access(self):
+        """Compiled active role names and permission codenames (cached, see permission_cache)"""
+        from .permission_cache import PermissionCache
+        return PermissionCache.get(self)
+    
     def has_role(self, role_name):
         """Check if user has a specific role"""
-        return self.roles.filter(name=role_name, is_active=True).exists()
+        return role_name in self.get_access().roles
     
     def has_permission(self, permission_codename):
-        """Check if user has a specific permission"""
-        # Check direct permissions
-        if self.permissions.filter(codename=permission_codename, is_active=True).exists():
-            return True
-        
-        # Check role-based permissions
-        role_permissions = Permission.objects.filter(
-            rolepermission__role__in=self.roles.filter(is_active=True),
-            codename=permission_codename,
-            is_active=True
-        )
-        return role_permissions.exists()
+        """Check if user has a specific permission (direct or role-based)"""
+        return permission_codename in self.get_access().permissions
     
     def get_all_permissions(self):
         """Get all permissions for the user (direct + role-based)"""
@@ -246,6 +252,9 @@ class AuditLog(models.Model):
     class Meta:
         db_table = 'auth_audit_logs'
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.user} - {self.action} at {self.timestamp}"
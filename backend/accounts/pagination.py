@@ -0,0 +1,45 @@
+"""
+Keyset pagination for the audit and activity log browsers
+
+Log tables grow with every request, so exact counts and OFFSET scans get
+slower over time. These paginators walk the (timestamp, id) index with a
+cursor and report an optional planner-estimated total instead.
+"""
+
+from django.conf import settings
+
+from patient_management.pagination import KeysetPagination
+
+
+def get_log_pagination_config():
+    """LOG_PAGINATION settings with defaults"""
+    config = {
+        'mode': 'page',
+        'page_size': 50,
+        'max_page_size': 200,
+        'total': 'estimate',
+    }
+    config.update(getattr(settings, 'LOG_PAGINATION', {}))
+    return config
+
+
+def use_cursor_pagination(params):
+    """Cursor pages when configured, or when the client opts in"""
+    return (
+        get_log_pagination_config()['mode'] == 'cursor'
+        or params.get('pagination') == 'cursor'
+        or 'cursor' in params
+    )
+
+
+class LogCursorPagination(KeysetPagination):
+    """
+    Newest-first cursor pagination over (timestamp, id)
+    """
+    ordering = ('-timestamp', '-id')
+
+    def __init__(self):
+        config = get_log_pagination_config()
+        self.page_size = config['page_size']
+        self.max_page_size = config['max_page_size']
+        self.default_total = config['total']
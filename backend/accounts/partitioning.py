@@ -0,0 +1,330 @@
+"""
+Monthly partitioning, retention and archival of audit tables
+
+On PostgreSQL each audit table is range-partitioned by its timestamp column
+into one partition per calendar month (UTC) plus a DEFAULT partition that
+catches rows outside the created ranges. Queries filtering on the timestamp
+column are pruned to the matching partitions, and expired months are removed
+by dropping a partition instead of deleting rows.
+
+Other databases keep a single table indexed on the timestamp column; there a
+month is archived and removed with range queries.
+"""
+
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Audit models and the column they are partitioned by
+PARTITIONED_MODELS = {
+    'accounts.AuditLog': 'timestamp',
+    'accounts.UserActivityLog': 'timestamp',
+    'patient_management.PatientAuditLog': 'created_at',
+}
+
+
+def get_partitioning_config():
+    """AUDIT_PARTITIONING settings with defaults"""
+    config = {
+        'months_ahead': 3,
+        'retention_months': {},
+        'archive_dir': os.path.join(settings.BASE_DIR, 'data', 'audit_archive'),
+        'compress_level': 6,
+        'chunk_size': 5000,
+    }
+    config.update(getattr(settings, 'AUDIT_PARTITIONING', {}))
+    return config
+
+
+def month_start(value):
+    """First instant of the UTC month containing a date or datetime"""
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def _quote(connection, name):
+    return connection.ops.quote_name(name)
+
+
+def is_partitioned(connection, table):
+    """Whether a PostgreSQL table is a partitioned parent"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection, table):
+    """Monthly partitions of a table as {month_start: partition name}"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [table]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = {}
+    prefix = f'{table}_p'
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions[datetime(int(suffix[:4]), int(suffix[4:]), 1, tzinfo=dt_timezone.utc)] = name
+    return partitions
+
+
+def create_partition(connection, table, column, month):
+    """
+    Create the partition for one month, moving any of its rows out of DEFAULT
+
+    Returns False if the partition already exists.
+    """
+    name = partition_name(table, month)
+    if month in list_partitions(connection, table):
+        return False
+
+    start, end = month, add_months(month, 1)
+    quote = lambda value: _quote(connection, value)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {quote(default_partition_name(table))} '
+            f'WHERE {quote(column)} >= %s AND {quote(column)} < %s RETURNING *) '
+            f'INSERT INTO {quote(name)} SELECT * FROM moved',
+            [start, end]
+        )
+        # Bounds must be literals on older PostgreSQL releases
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    return True
+
+
+def ensure_partitions(model, months_ahead=None, now=None):
+    """
+    Create partitions for the current month and the configured months ahead
+
+    Returns the names of the partitions created; a no-op for tables that are
+    not partitioned.
+    """
+    table = model._meta.db_table
+    connection = connections[router.db_for_write(model)]
+    if not is_partitioned(connection, table):
+        return []
+
+    if months_ahead is None:
+        months_ahead = get_partitioning_config()['months_ahead']
+    column = model._meta.get_field(PARTITIONED_MODELS[model._meta.label]).column
+    current = month_start(now or timezone.now())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if create_partition(connection, table, column, month):
+            created.append(partition_name(table, month))
+    return created
+
+
+def _rebuild_table(schema_editor, table, column=None, months_ahead=3):
+    """
+    Recreate a table as range-partitioned by column, or as a plain table when
+    column is None, keeping its rows, indexes and foreign keys
+    """
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    legacy = f'{table}_rebuild'
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+            "WHERE indrelid = %s::regclass AND NOT indisprimary",
+            [table]
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table]
+        )
+        foreign_keys = cursor.fetchall()
+        if column:
+            cursor.execute(f'SELECT MIN({quote(column)}) FROM {quote(table)}')
+            oldest = cursor.fetchone()[0]
+
+    schema_editor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}')
+    if column:
+        schema_editor.execute(
+            f'CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ({quote(column)})'
+        )
+        schema_editor.execute(
+            f'CREATE TABLE {quote(default_partition_name(table))} PARTITION OF {quote(table)} DEFAULT'
+        )
+        month = month_start(oldest or timezone.now())
+        last = add_months(month_start(timezone.now()), months_ahead)
+        while month <= last:
+            create_partition(connection, table, column, month)
+            month = add_months(month, 1)
+    else:
+        schema_editor.execute(
+            f'CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+
+    schema_editor.execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(legacy)}')
+    schema_editor.execute(f'DROP TABLE {quote(legacy)} CASCADE')
+
+    # Unique constraints on a partitioned table must include the partition key
+    primary_key = f'"id", {quote(column)}' if column else '"id"'
+    schema_editor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY ({primary_key})')
+    for name, definition in foreign_keys:
+        schema_editor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
+    for definition in index_definitions:
+        schema_editor.execute(definition)
+
+
+def partition_table(schema_editor, table, column):
+    """Migration helper: convert a PostgreSQL table to monthly partitions"""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or is_partitioned(connection, table):
+        return
+    _rebuild_table(schema_editor, table, column, get_partitioning_config()['months_ahead'])
+
+
+def unpartition_table(schema_editor, table):
+    """Migration helper: convert a partitioned PostgreSQL table back to a plain table"""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or not is_partitioned(connection, table):
+        return
+    _rebuild_table(schema_editor, table)
+
+
+def get_partitioned_models():
+    return [apps.get_model(label) for label in PARTITIONED_MODELS]
+
+
+def expired_months(model, retention_months, now=None):
+    """
+    Months older than the retention window that still hold data, oldest first
+    """
+    table = model._meta.db_table
+    field_name = PARTITIONED_MODELS[model._meta.label]
+    connection = connections[router.db_for_write(model)]
+    cutoff = add_months(month_start(now or timezone.now()), -retention_months)
+
+    if is_partitioned(connection, table):
+        return sorted(month for month in list_partitions(connection, table) if month < cutoff)
+
+    months = model.objects.filter(**{f'{field_name}__lt': cutoff}).annotate(
+        month=TruncMonth(field_name, tzinfo=dt_timezone.utc)
+    ).order_by('month').values_list('month', flat=True).distinct()
+    return [month_start(month) for month in months]
+
+
+def month_queryset(model, month):
+    """Rows of one month, bounded on the partition column"""
+    field_name = PARTITIONED_MODELS[model._meta.label]
+    return model.objects.filter(**{
+        f'{field_name}__gte': month,
+        f'{field_name}__lt': add_months(month, 1),
+    })
+
+
+def archive_file_path(model, month, directory=None):
+    directory = directory or get_partitioning_config()['archive_dir']
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{model._meta.db_table}_{month:%Y%m}.ndjson.gz')
+
+
+def archive_month(model, month, directory=None):
+    """
+    Export one month of rows to a compressed NDJSON file
+
+    The file is written under a temporary name and renamed once complete.
+    Returns (path, rows written); no file is kept for an empty month.
+    """
+    config = get_partitioning_config()
+    path = archive_file_path(model, month, directory)
+    field_name = PARTITIONED_MODELS[model._meta.label]
+    columns = [field.attname for field in model._meta.concrete_fields]
+    rows = 0
+
+    temporary_path = f'{path}.partial'
+    with gzip.open(temporary_path, 'wt', encoding='utf-8', compresslevel=config['compress_level']) as handle:
+        queryset = month_queryset(model, month).order_by(field_name, 'pk').values(*columns)
+        for row in queryset.iterator(chunk_size=config['chunk_size']):
+            handle.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+            rows += 1
+    if not rows:
+        os.remove(temporary_path)
+        return None, 0
+    os.replace(temporary_path, path)
+    return path, rows
+
+
+def drop_month(model, month, expected_rows):
+    """
+    Remove an archived month: drop its partition, or delete its rows
+
+    Refuses (raising RuntimeError) if the month no longer holds exactly the
+    archived number of rows, so rows written after the export are never lost.
+    """
+    table = model._meta.db_table
+    connection = connections[router.db_for_write(model)]
+    queryset = month_queryset(model, month)
+
+    with transaction.atomic(using=connection.alias):
+        if is_partitioned(connection, table):
+            name = list_partitions(connection, table).get(month)
+            quote = lambda value: _quote(connection, value)
+            with connection.cursor() as cursor:
+                if name:
+                    # Block writes to the partition until it is gone
+                    cursor.execute(f'LOCK TABLE {quote(name)} IN ACCESS EXCLUSIVE MODE')
+                current_rows = queryset.count()
+                if current_rows != expected_rows:
+                    raise RuntimeError(
+                        f'{table} {month:%Y-%m} has {current_rows} rows, {expected_rows} were archived'
+                    )
+                if name:
+                    cursor.execute(f'ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}')
+                    cursor.execute(f'DROP TABLE {quote(name)}')
+                # Rows for the month that landed in DEFAULT
+                queryset.delete()
+            return current_rows
+
+        deleted, _ = queryset.delete()
+        if deleted != expected_rows:
+            raise RuntimeError(f'{table} {month:%Y-%m} has {deleted} rows, {expected_rows} were archived')
+        return deleted
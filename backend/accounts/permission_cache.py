@@ -0,0 +1,110 @@
+"""
+Compiled per-user role and permission sets
+
+A user's active role names and permission codenames are compiled once into
+frozensets and cached under the user's version stamp and a global stamp.
+Changes to UserRole / UserPermission bump the user's stamp; changes to Role,
+Permission or RolePermission bump the global one (see accounts.signals).
+The compiled sets are also memoized on the user instance, which lives for a
+single request.
+"""
+
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+UserAccess = namedtuple('UserAccess', ['roles', 'permissions'])
+
+
+class PermissionCache:
+    """
+    Versioned cache of UserAccess sets
+    """
+
+    CACHE_PREFIX = 'rbac_user_access'
+    MEMO_ATTRIBUTE = '_rbac_access'
+
+    @staticmethod
+    def _version_key(scope):
+        return f"{PermissionCache.CACHE_PREFIX}:version:{scope}"
+
+    @staticmethod
+    def _access_key(user_id):
+        return f"{PermissionCache.CACHE_PREFIX}:{user_id}"
+
+    @staticmethod
+    def compile(user):
+        """
+        Active role names and permission codenames (direct or via roles) in two queries
+        """
+        from .models import Permission, Role
+
+        roles = frozenset(
+            Role.objects.filter(userrole__user=user, is_active=True).values_list('name', flat=True)
+        )
+        direct = Permission.objects.filter(
+            userpermission__user=user, is_active=True
+        ).order_by().values_list('codename')
+        via_roles = Permission.objects.filter(
+            rolepermission__role__userrole__user=user,
+            rolepermission__role__is_active=True,
+            is_active=True
+        ).order_by().values_list('codename')
+        permissions = frozenset(codename for (codename,) in direct.union(via_roles))
+        return UserAccess(roles, permissions)
+
+    @staticmethod
+    def get(user):
+        """
+        Compiled access for a user: request memo, then the shared cache, then the database
+        """
+        access = getattr(user, PermissionCache.MEMO_ATTRIBUTE, None)
+        if access is not None:
+            return access
+
+        user_version_key = PermissionCache._version_key(user.pk)
+        global_version_key = PermissionCache._version_key('all')
+        access_key = PermissionCache._access_key(user.pk)
+        cached = cache.get_many([user_version_key, global_version_key, access_key])
+        versions = (cached.get(user_version_key, 0), cached.get(global_version_key, 0))
+
+        entry = cached.get(access_key)
+        if entry is not None and entry['versions'] == versions:
+            access = UserAccess(frozenset(entry['roles']), frozenset(entry['permissions']))
+        else:
+            access = PermissionCache.compile(user)
+            cache.set(
+                access_key,
+                {'versions': versions, 'roles': list(access.roles), 'permissions': list(access.permissions)},
+                getattr(settings, 'RBAC_PERMISSION_CACHE_TIMEOUT', 300)
+            )
+
+        setattr(user, PermissionCache.MEMO_ATTRIBUTE, access)
+        return access
+
+    @staticmethod
+    def clear_memo(user):
+        """Drop the compiled sets memoized on a user instance"""
+        user.__dict__.pop(PermissionCache.MEMO_ATTRIBUTE, None)
+
+    @staticmethod
+    def invalidate(user_ids):
+        """
+        Bump the version stamps of the given users
+        """
+        version = time.time_ns()
+        scopes = {user_id for user_id in user_ids if user_id is not None}
+        if scopes:
+            cache.set_many(
+                {PermissionCache._version_key(scope): version for scope in scopes},
+                timeout=None
+            )
+
+    @staticmethod
+    def invalidate_all():
+        """
+        Bump the global stamp after role or permission definitions change
+        """
+        cache.set(PermissionCache._version_key('all'), time.time_ns(), timeout=None)
@@ -1,7 +1,7 @@
 from rest_framework import permissions
 from django.core.exceptions import PermissionDenied
 from functools import wraps
-from .models import AuditLog
+from .audit import log_audit_event
 
 
 class BaseRBACPermission(permissions.BasePermission):
@@ -107,7 +107,7 @@ def require_permission(permission_codename):
             
             if not request.user.has_permission(permission_codename):
                 # Log unauthorized access attempt
-                AuditLog.objects.create(
+                log_audit_event(
                     user=request.user,
                     action='PERMISSION_DENIED',
                     resource_type='API_ENDPOINT',
@@ -116,8 +116,7 @@ def require_permission(permission_codename):
                         'endpoint': request.path,
                         'method': request.method
                     },
-                    ip_address=get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
+                    request=request
                 )
                 raise PermissionDenied(f"Permission '{permission_codename}' required")
             
@@ -138,7 +137,7 @@ def require_role(role_name):
             
             if not request.user.has_role(role_name):
                 # Log unauthorized access attempt
-                AuditLog.objects.create(
+                log_audit_event(
                     user=request.user,
                     action='ROLE_DENIED',
                     resource_type='API_ENDPOINT',
@@ -147,8 +146,7 @@ def require_role(role_name):
                         'endpoint': request.path,
                         'method': request.method
                     },
-                    ip_address=get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
+                    request=request
                 )
                 raise PermissionDenied(f"Role '{role_name}' required")
             
@@ -168,7 +166,7 @@ def require_superuser(view_func):
         
         if not request.user.is_superuser_role():
             # Log unauthorized access attempt
-            AuditLog.objects.create(
+            log_audit_event(
                 user=request.user,
                 action='SUPERUSER_REQUIRED',
                 resource_type='API_ENDPOINT',
@@ -176,8 +174,7 @@ def require_superuser(view_func):
                     'endpoint': request.path,
                     'method': request.method
                 },
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+                request=request
             )
             raise PermissionDenied("SuperUser access required")
         
@@ -288,7 +285,7 @@ class RBACMiddleware:
         
         # Log API access if user is authenticated
         if request.user.is_authenticated and request.path.startswith('/api/'):
-            AuditLog.objects.create(
+            log_audit_event(
                 user=request.user,
                 action='API_ACCESS',
                 resource_type='API_ENDPOINT',
@@ -297,8 +294,7 @@ class RBACMiddleware:
                     'method': request.method,
                     'status_code': response.status_code
                 },
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+                request=request
             )
         
         return response
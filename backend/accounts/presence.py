@@ -0,0 +1,207 @@
+"""
+Presence tracking for online users and active sessions
+
+PresenceMiddleware records when each authenticated user and session was last
+seen. Updates are throttled per session (PRESENCE['throttle'] seconds, in
+process), so steady traffic costs one write per session per interval rather
+than one per request:
+
+- with a Redis URL configured, last-seen times go to two sorted sets (users
+  and sessions) scored by timestamp, and online / active-session queries are
+  ZCOUNT / ZREVRANGEBYSCORE range reads;
+- the UserSession row of the session is created or extended to
+  PRESENCE['session_timeout'] seconds from now; without Redis, queries read
+  these rows instead, through the last_activity / expires_at indexes.
+
+Expired sessions are purged by `manage.py purge_expired_sessions` or the
+periodic Celery task of the same name.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .authentication import BoundedTTLCache
+from .permissions import get_client_ip
+from .rbac_models import UserSession
+
+logger = logging.getLogger(__name__)
+
+
+def get_presence_config():
+    """PRESENCE settings with defaults"""
+    config = {
+        'enabled': True,
+        'redis_url': '',
+        'throttle': 60,  # seconds between recorded updates of one session
+        'online_window': 900,  # seen within this many seconds counts as online
+        'session_timeout': 1800,  # idle seconds before a session expires
+        'local_max_entries': 10000,
+    }
+    config.update(getattr(settings, 'PRESENCE', {}))
+    return config
+
+
+def session_id_for(request):
+    """Stable 40-character id of the request's token or session; secrets are never stored"""
+    auth = getattr(request, 'auth', None)
+    raw = None
+    if auth is not None:
+        # DRF Token, or a signed access token (one session per token id)
+        raw = getattr(auth, 'key', None) or getattr(auth, 'payload', {}).get('jti')
+    elif getattr(request, 'session', None) is not None:
+        raw = request.session.session_key
+    if not raw:
+        return None
+    return hashlib.sha1(str(raw).encode()).hexdigest()
+
+
+def _from_timestamp(value):
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+
+
+class Presence:
+    """
+    Last-seen times of users and sessions
+    """
+
+    KEY_PREFIX = 'medixscan:presence'
+    USERS_KEY = f'{KEY_PREFIX}:users'
+    SESSIONS_KEY = f'{KEY_PREFIX}:sessions'
+
+    _local = None
+    _redis = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def throttle_cache():
+        if Presence._local is None:
+            with Presence._lock:
+                if Presence._local is None:
+                    config = get_presence_config()
+                    Presence._local = BoundedTTLCache(config['local_max_entries'], config['throttle'])
+        return Presence._local
+
+    @staticmethod
+    def redis():
+        """Redis client, or None when presence is kept in the database only"""
+        url = get_presence_config()['redis_url']
+        if not url:
+            return None
+        if Presence._redis is None:
+            with Presence._lock:
+                if Presence._redis is None:
+                    import redis
+                    Presence._redis = redis.Redis.from_url(url)
+        return Presence._redis
+
+    @staticmethod
+    def touch(request, user):
+        """Record that the user was seen on this request's session (throttled)"""
+        session_id = session_id_for(request)
+        throttle_key = (user.pk, session_id)
+        local = Presence.throttle_cache()
+        if local.get(throttle_key):
+            return False
+        local.set(throttle_key, True)
+
+        config = get_presence_config()
+        now = time.time()
+        client = Presence.redis()
+        if client is not None:
+            try:
+                pipeline = client.pipeline(transaction=False)
+                pipeline.zadd(Presence.USERS_KEY, {user.pk: now})
+                if session_id:
+                    pipeline.zadd(Presence.SESSIONS_KEY, {f'{user.pk}:{session_id}': now})
+                pipeline.execute()
+            except Exception as e:
+                logger.warning(f"Presence update in Redis failed: {str(e)}")
+
+        if session_id:
+            seen = _from_timestamp(now)
+            expires_at = seen + timedelta(seconds=config['session_timeout'])
+            # update() skips the save signals, so only new sessions invalidate dashboard stats
+            updated = UserSession.objects.filter(session_key=session_id).update(
+                last_activity=seen, expires_at=expires_at
+            )
+            if not updated:
+                UserSession.objects.create(
+                    session_key=session_id,
+                    user_id=user.pk,
+                    ip_address=get_client_ip(request) or '0.0.0.0',
+                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                    expires_at=expires_at,
+                )
+        return True
+
+    @staticmethod
+    def end_session(user_id, raw_key):
+        """Forget a session ended by logout"""
+        session_id = hashlib.sha1(str(raw_key).encode()).hexdigest()
+        # Held rather than cleared, so the logout request itself does not re-record the session
+        Presence.throttle_cache().set((user_id, session_id), True)
+        UserSession.objects.filter(session_key=session_id).delete()
+        client = Presence.redis()
+        if client is not None:
+            try:
+                client.zrem(Presence.SESSIONS_KEY, f'{user_id}:{session_id}')
+            except Exception as e:
+                logger.warning(f"Presence session removal in Redis failed: {str(e)}")
+
+    @staticmethod
+    def online_users(offset=0, limit=100):
+        """(total, [(user_id, last_seen), ...]) of users seen recently, most recent first"""
+        config = get_presence_config()
+        client = Presence.redis()
+        if client is not None:
+            cutoff = time.time() - config['online_window']
+            try:
+                total = client.zcount(Presence.USERS_KEY, cutoff, '+inf')
+                rows = client.zrevrangebyscore(
+                    Presence.USERS_KEY, '+inf', cutoff, start=offset, num=limit, withscores=True
+                )
+                return total, [(int(member), _from_timestamp(score)) for member, score in rows]
+            except Exception as e:
+                logger.warning(f"Presence read from Redis failed, using sessions table: {str(e)}")
+
+        cutoff = timezone.now() - timedelta(seconds=config['online_window'])
+        seen = (
+            UserSession.objects.filter(last_activity__gte=cutoff)
+            .values('user_id')
+            .annotate(last_seen=Max('last_activity'))
+            .order_by('-last_seen', 'user_id')
+        )
+        return seen.count(), [(row['user_id'], row['last_seen']) for row in seen[offset:offset + limit]]
+
+    @staticmethod
+    def active_session_count():
+        config = get_presence_config()
+        client = Presence.redis()
+        if client is not None:
+            try:
+                return client.zcount(Presence.SESSIONS_KEY, time.time() - config['session_timeout'], '+inf')
+            except Exception as e:
+                logger.warning(f"Presence read from Redis failed, using sessions table: {str(e)}")
+        return UserSession.objects.filter(expires_at__gt=timezone.now()).count()
+
+    @staticmethod
+    def purge():
+        """Drop expired sessions and stale presence entries; returns counts by store"""
+        config = get_presence_config()
+        purged = {}
+        client = Presence.redis()
+        if client is not None:
+            now = time.time()
+            pipeline = client.pipeline(transaction=False)
+            pipeline.zremrangebyscore(Presence.USERS_KEY, '-inf', f"({now - config['online_window']}")
+            pipeline.zremrangebyscore(Presence.SESSIONS_KEY, '-inf', f"({now - config['session_timeout']}")
+            purged['redis_users'], purged['redis_sessions'] = pipeline.execute()
+        purged['sessions'], _ = UserSession.objects.filter(expires_at__lte=timezone.now()).delete()
+        return purged
@@ -1,8 +1,9 @@
 # Enhanced RBAC Models for User Management System
 # Advanced Role-Based Access Control with Audit Logging
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.core.exceptions import ValidationError
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 from django.core.validators import RegexValidator
@@ -58,12 +59,138 @@ class RBACRole(models.Model):
     def __str__(self):
         return f"{self.display_name} (Level {self.security_level})"
     
+    def clean(self):
+        super().clean()
+        self.validate_parent_role()
+    
+    def validate_parent_role(self):
+        """Reject a parent that is the role itself or one of its descendants"""
+        if not self.parent_role_id:
+            return
+        if self.parent_role_id == self.pk or (
+            not self._state.adding and
+            RBACRoleClosure.objects.filter(ancestor_id=self.pk, descendant_id=self.parent_role_id).exists()
+        ):
+            raise ValidationError({'parent_role': 'A role cannot inherit from itself or from one of its descendants.'})
+    
+    def save(self, *args, **kwargs):
+        """Save the role and keep the hierarchy closure in step with parent_role"""
+        adding = self._state.adding
+        previous_parent_id = None
+        if not adding:
+            previous_parent_id = RBACRole.objects.filter(pk=self.pk).values_list('parent_role_id', flat=True).first()
+        if adding or previous_parent_id != self.parent_role_id:
+            self.validate_parent_role()
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                RBACRoleClosure.add_role(self)
+            elif previous_parent_id != self.parent_role_id:
+                RBACRoleClosure.move_subtree(self)
+    
     def get_all_permissions(self):
-        """Get all permissions including inherited from parent roles"""
-        permissions = set(self.permissions.all())
-        if self.parent_role:
-            permissions.update(self.parent_role.get_all_permissions())
-        return permissions
+        """Get all permissions including inherited from parent roles (one query over the closure)"""
+        return set(
+            Permission.objects.filter(rbacrole__descendant_links__descendant=self)
+            .select_related('content_type')
+            .distinct()
+        )
+    
+    @staticmethod
+    def get_permission_map(role_ids=None):
+        """
+        Effective permission ids for many roles at once: {role_id: set(permission_id)}
+        """
+        links = RBACRoleClosure.objects.filter(ancestor__permissions__isnull=False)
+        if role_ids is not None:
+            links = links.filter(descendant_id__in=role_ids)
+        permission_map = {}
+        for role_id, permission_id in links.values_list('descendant_id', 'ancestor__permissions'):
+            permission_map.setdefault(role_id, set()).add(permission_id)
+        return permission_map
+
+
+class RBACRoleClosure(models.Model):
+    """
+    Transitive closure of the role hierarchy: one row per (ancestor, descendant)
+    pair, including every role paired with itself at depth 0
+    """
+    ancestor = models.ForeignKey(RBACRole, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(RBACRole, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+    
+    class Meta:
+        db_table = 'rbac_role_closure'
+        unique_together = ['ancestor', 'descendant']
+        indexes = [
+            models.Index(fields=['descendant', 'ancestor']),
+        ]
+    
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+    
+    @classmethod
+    def add_role(cls, role):
+        """Link a new role to itself and to every ancestor of its parent"""
+        links = [cls(ancestor_id=role.pk, descendant_id=role.pk, depth=0)]
+        if role.parent_role_id:
+            links.extend(
+                cls(ancestor_id=ancestor_id, descendant_id=role.pk, depth=depth + 1)
+                for ancestor_id, depth in cls.objects.filter(
+                    descendant_id=role.parent_role_id
+                ).values_list('ancestor_id', 'depth')
+            )
+        cls.objects.bulk_create(links)
+    
+    @classmethod
+    def move_subtree(cls, role):
+        """Re-link a role and its descendants after its parent changed"""
+        subtree = list(cls.objects.filter(ancestor_id=role.pk).values_list('descendant_id', 'depth'))
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+        cls.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if role.parent_role_id:
+            ancestors = cls.objects.filter(descendant_id=role.parent_role_id).values_list('ancestor_id', 'depth')
+            cls.objects.bulk_create([
+                cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + 1 + descendant_depth)
+                for ancestor_id, ancestor_depth in ancestors
+                for descendant_id, descendant_depth in subtree
+            ], batch_size=1000)
+    
+    @classmethod
+    def rebuild(cls):
+        """Recompute the whole closure from parent_role; returns role ids found in cycles"""
+        return rebuild_role_closure(RBACRole, cls)
+
+
+def rebuild_role_closure(role_model, closure_model):
+    """
+    Recompute the closure table from parent pointers
+
+    A parent chain that loops back on itself is cut where the loop closes;
+    the ids of roles on such chains are returned.
+    """
+    parents = dict(role_model.objects.values_list('id', 'parent_role_id'))
+    links = []
+    cycles = set()
+    for role_id in parents:
+        links.append(closure_model(ancestor_id=role_id, descendant_id=role_id, depth=0))
+        seen = {role_id}
+        depth = 0
+        parent_id = parents.get(role_id)
+        while parent_id is not None:
+            if parent_id in seen:
+                cycles.add(role_id)
+                break
+            seen.add(parent_id)
+            depth += 1
+            links.append(closure_model(ancestor_id=parent_id, descendant_id=role_id, depth=depth))
+            parent_id = parents.get(parent_id)
+    
+    with transaction.atomic():
+        closure_model.objects.all().delete()
+        closure_model.objects.bulk_create(links, batch_size=1000)
+    return cycles
 
 class RBACPermissionGroup(models.Model):
     """
@@ -199,6 +326,7 @@ class UserActivityLog(models.Model):
             models.Index(fields=['user', '-timestamp']),
             models.Index(fields=['activity_type', '-timestamp']),
             models.Index(fields=['severity', '-timestamp']),
+            models.Index(fields=['-timestamp', '-id']),
         ]
         
     def __str__(self):
@@ -279,6 +407,10 @@ class UserSession(models.Model):
     class Meta:
         db_table = 'user_sessions'
         ordering = ['-last_activity']
+        indexes = [
+            models.Index(fields=['-last_activity']),
+            models.Index(fields=['expires_at']),
+        ]
         
     def __str__(self):
         return f"{self.user.username} - {self.ip_address}"
@@ -0,0 +1,161 @@
+"""
+Cached statistics for the RBAC admin dashboard and registration notifications
+
+Counts come from one conditional aggregation per table and daily trends from
+a single TruncDate group-by. Results are cached for a short time
+(RBAC_STATS_CACHE_TIMEOUT) under a per-scope version stamp that the accounts
+signals bump when users, roles, sessions, notable activity or registration
+notifications change, so polling dashboards mostly hit the cache.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import User
+from .rbac_models import RBACRole, RegistrationNotification, UserActivityLog, UserSession
+
+# Activity that shows up on the dashboard, and so invalidates it
+NOTABLE_SEVERITIES = ('high', 'critical')
+
+
+class RBACStats:
+    """
+    Dashboard ('dashboard' scope) and registration ('registrations' scope) statistics
+    """
+
+    CACHE_PREFIX = 'rbac_stats'
+
+    @staticmethod
+    def _version_key(scope):
+        return f"{RBACStats.CACHE_PREFIX}:version:{scope}"
+
+    @staticmethod
+    def _cached(scope, name, compute):
+        """Value of compute() cached under the scope's version stamp and today's date"""
+        today = timezone.localdate()
+        version = cache.get(RBACStats._version_key(scope), 0)
+        cache_key = f"{RBACStats.CACHE_PREFIX}:{scope}:{name}:{today.isoformat()}:{version}"
+        value = cache.get(cache_key)
+        if value is None:
+            value = compute()
+            cache.set(cache_key, value, getattr(settings, 'RBAC_STATS_CACHE_TIMEOUT', 30))
+        return value
+
+    @staticmethod
+    def invalidate(scope):
+        cache.set(RBACStats._version_key(scope), time.time_ns(), timeout=None)
+
+    @staticmethod
+    def compute_dashboard(recent_limit=10):
+        now = timezone.now()
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        users = User.objects.order_by().aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            pending=Count('id', filter=Q(security_profile__account_status='pending_approval')),
+            suspended=Count('id', filter=Q(security_profile__account_status='suspended')),
+        )
+        roles = RBACRole.objects.order_by().aggregate(
+            total=Count('id'),
+            system=Count('id', filter=Q(is_system_role=True)),
+        )
+        # Range on the partition column so only the current partition is scanned
+        failed_logins_today = UserActivityLog.objects.filter(
+            activity_type='login',
+            success=False,
+            timestamp__gte=today_start
+        ).count()
+        sessions = UserSession.objects.filter(expires_at__gt=now).order_by().aggregate(
+            active=Count('session_key'),
+            suspicious=Count('session_key', filter=Q(is_suspicious=True)),
+        )
+
+        recent_activities = list(
+            UserActivityLog.objects.filter(severity__in=NOTABLE_SEVERITIES).values(
+                'id', 'user__username', 'action', 'severity', 'timestamp', 'success'
+            )[:recent_limit]
+        )
+
+        return {
+            'users': {
+                'total': users['total'],
+                'active': users['active'],
+                'pending': users['pending'],
+                'suspended': users['suspended'],
+                'inactive': users['total'] - users['active']
+            },
+            'roles': {
+                'total': roles['total'],
+                'system': roles['system'],
+                'custom': roles['total'] - roles['system']
+            },
+            'security': {
+                'failed_logins_today': failed_logins_today,
+                'active_sessions': sessions['active'],
+                'suspicious_activities': sessions['suspicious']
+            },
+            'recent_activities': [
+                {
+                    'id': str(activity['id']),
+                    'user': activity['user__username'],
+                    'action': activity['action'],
+                    'severity': activity['severity'],
+                    'timestamp': activity['timestamp'].isoformat(),
+                    'success': activity['success']
+                }
+                for activity in recent_activities
+            ]
+        }
+
+    @staticmethod
+    def dashboard():
+        return RBACStats._cached('dashboard', 'summary', RBACStats.compute_dashboard)
+
+    @staticmethod
+    def compute_registration_counts():
+        today = timezone.localdate()
+        week_start = today - timedelta(days=today.weekday())
+        return RegistrationNotification.objects.order_by().aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='pending')),
+            approved=Count('id', filter=Q(status='approved')),
+            rejected=Count('id', filter=Q(status='rejected')),
+            today=Count('id', filter=Q(created_at__date=today)),
+            approved_today=Count('id', filter=Q(status='approved', processed_at__date=today)),
+            rejected_today=Count('id', filter=Q(status='rejected', processed_at__date=today)),
+            this_week=Count('id', filter=Q(created_at__date__gte=week_start)),
+            this_month=Count('id', filter=Q(created_at__date__gte=today.replace(day=1))),
+        )
+
+    @staticmethod
+    def registration_counts():
+        return RBACStats._cached('registrations', 'counts', RBACStats.compute_registration_counts)
+
+    @staticmethod
+    def compute_daily_registrations(days=7):
+        """Registrations per day, newest first, including days without any"""
+        today = timezone.localdate()
+        first_day = today - timedelta(days=days - 1)
+        counts = dict(
+            RegistrationNotification.objects.filter(created_at__date__gte=first_day)
+            .annotate(day=TruncDate('created_at'))
+            .order_by()
+            .values('day')
+            .annotate(count=Count('id'))
+            .values_list('day', 'count')
+        )
+        return [
+            {'date': today - timedelta(days=offset), 'count': counts.get(today - timedelta(days=offset), 0)}
+            for offset in range(days)
+        ]
+
+    @staticmethod
+    def daily_registrations():
+        return RBACStats._cached('registrations', 'daily', RBACStats.compute_daily_registrations)
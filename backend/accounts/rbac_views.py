@@ -9,13 +9,14 @@ from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
-from django.db.models import Q, Count, Prefetch
+from django.db.models import Q, Count, Max, OuterRef, Prefetch, Subquery
 from django.utils import timezone
 from django.contrib.auth.models import Permission
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotFound
 import json
 import logging
 from datetime import timedelta, datetime
@@ -26,6 +27,10 @@ from .rbac_models import (
     RoleAssignment, UserSession, RBACPermissionGroup
 )
 from .models import User
+from .authentication import TokenCache
+from .audit import log_activity_event
+from .rbac_stats import RBACStats
+from .pagination import LogCursorPagination, use_cursor_pagination
 
 logger = logging.getLogger(__name__)
 
@@ -39,12 +44,12 @@ def superuser_required(view_func):
 
 def log_admin_activity(user, action, description, metadata=None, severity='medium'):
     """Helper function to log admin activities"""
-    UserActivityLog.objects.create(
-        user=user,
-        activity_type='admin_action',
+    log_activity_event(
+        user,
+        'admin_action',
+        description,
         severity=severity,
         action=action,
-        description=description,
         metadata=metadata or {},
         ip_address=getattr(user, '_current_ip', '127.0.0.1'),
         user_agent=getattr(user, '_current_user_agent', ''),
@@ -59,63 +64,7 @@ def rbac_dashboard_stats(request):
     Get comprehensive dashboard statistics for RBAC management
     """
     try:
-        # User statistics
-        total_users = User.objects.count()
-        active_users = User.objects.filter(is_active=True).count()
-        pending_users = UserSecurityProfile.objects.filter(account_status='pending_approval').count()
-        suspended_users = UserSecurityProfile.objects.filter(account_status='suspended').count()
-        
-        # Role statistics
-        total_roles = RBACRole.objects.count()
-        system_roles = RBACRole.objects.filter(is_system_role=True).count()
-        custom_roles = RBACRole.objects.filter(is_system_role=False).count()
-        
-        # Security statistics
-        failed_logins_today = UserActivityLog.objects.filter(
-            activity_type='login',
-            success=False,
-            timestamp__date=timezone.now().date()
-        ).count()
-        
-        active_sessions = UserSession.objects.filter(
-            expires_at__gt=timezone.now()
-        ).count()
-        
-        # Recent activity
-        recent_activities = UserActivityLog.objects.select_related('user').filter(
-            severity__in=['high', 'critical']
-        )[:10]
-        
-        stats = {
-            'users': {
-                'total': total_users,
-                'active': active_users,
-                'pending': pending_users,
-                'suspended': suspended_users,
-                'inactive': total_users - active_users
-            },
-            'roles': {
-                'total': total_roles,
-                'system': system_roles,
-                'custom': custom_roles
-            },
-            'security': {
-                'failed_logins_today': failed_logins_today,
-                'active_sessions': active_sessions,
-                'suspicious_activities': recent_activities.filter(is_suspicious=True).count()
-            },
-            'recent_activities': [
-                {
-                    'id': str(activity.id),
-                    'user': activity.user.username,
-                    'action': activity.action,
-                    'severity': activity.severity,
-                    'timestamp': activity.timestamp.isoformat(),
-                    'success': activity.success
-                }
-                for activity in recent_activities
-            ]
-        }
+        stats = RBACStats.dashboard()
         
         log_admin_activity(
             request.user, 
@@ -149,11 +98,25 @@ def rbac_users_management(request):
             role_filter = request.GET.get('role', '')
             sort_by = request.GET.get('sort', '-date_joined')
             
-            # Build query
-            users_query = User.objects.select_related('security_profile').prefetch_related(
-                'role_assignments__role',
-                'activity_logs'
-            )
+            # Build query: only the listed columns, active roles in one prefetch
+            # and the latest activity from the (user, -timestamp) index
+            last_activity = UserActivityLog.objects.filter(
+                user=OuterRef('pk')
+            ).order_by('-timestamp').values('timestamp')[:1]
+            users_query = User.objects.select_related('security_profile').only(
+                'id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff',
+                'is_superuser', 'date_joined', 'last_login',
+                'security_profile__account_status', 'security_profile__failed_login_attempts',
+                'security_profile__account_locked_until'
+            ).prefetch_related(
+                Prefetch(
+                    'role_assignments',
+                    queryset=RoleAssignment.objects.filter(status='active').select_related('role').only(
+                        'user_id', 'role__name'
+                    ),
+                    to_attr='active_role_assignments'
+                )
+            ).annotate(last_activity=Subquery(last_activity))
             
             # Apply filters
             if search:
@@ -181,14 +144,10 @@ def rbac_users_management(request):
             users_data = []
             for user in users_page:
                 security_profile = getattr(user, 'security_profile', None)
-                active_roles = [
-                    assignment.role.name 
-                    for assignment in user.role_assignments.filter(status='active')
-                ]
+                active_roles = [assignment.role.name for assignment in user.active_role_assignments]
                 
                 last_login = user.last_login.isoformat() if user.last_login else None
-                last_activity = user.activity_logs.first()
-                last_activity_time = last_activity.timestamp.isoformat() if last_activity else None
+                last_activity_time = user.last_activity.isoformat() if user.last_activity else None
                 
                 users_data.append({
                     'id': user.id,
@@ -258,6 +217,7 @@ def rbac_users_management(request):
                 
             elif operation == 'deactivate':
                 users.update(is_active=False)
+                TokenCache.revoke(user_ids)
                 UserSecurityProfile.objects.filter(user__in=users).update(account_status='inactive')
                 action = 'Bulk Deactivate Users'
                 
@@ -330,7 +290,7 @@ def rbac_roles_management(request, role_id=None):
                     'description': role.description,
                     'category': role.category,
                     'security_level': role.security_level,
-                    'parent_role': str(role.parent_role.id) if role.parent_role else None,
+                    'parent_role': str(role.parent_role_id) if role.parent_role_id else None,
                     'is_system_role': role.is_system_role,
                     'requires_approval': role.requires_approval,
                     'max_session_duration': role.max_session_duration.total_seconds() if role.max_session_duration else None,
@@ -360,9 +320,11 @@ def rbac_roles_management(request, role_id=None):
         else:
             # Get all roles with stats
             try:
-                roles = RBACRole.objects.prefetch_related('permissions', 'assignments').annotate(
-                    user_count=Count('assignments', filter=Q(assignments__status='active'))
+                roles = RBACRole.objects.annotate(
+                    user_count=Count('assignments', filter=Q(assignments__status='active'), distinct=True),
+                    permission_count=Count('permissions', distinct=True)
                 )
+                effective_permissions = RBACRole.get_permission_map()
                 
                 roles_data = []
                 for role in roles:
@@ -375,7 +337,8 @@ def rbac_roles_management(request, role_id=None):
                         'security_level': role.security_level,
                         'is_system_role': role.is_system_role,
                         'user_count': role.user_count,
-                        'permission_count': role.permissions.count(),
+                        'permission_count': role.permission_count,
+                        'effective_permission_count': len(effective_permissions.get(role.id, ())),
                         'created_at': role.created_at.isoformat()
                     })
                 
@@ -521,9 +484,30 @@ def rbac_activity_logs(request):
                 Q(description__icontains=search)
             )
         
-        # Paginate
-        paginator = Paginator(logs_query, page_size)
-        logs_page = paginator.get_page(page)
+        # Paginate: keyset cursor over (timestamp, id) when configured or requested
+        if use_cursor_pagination(request.query_params):
+            paginator = LogCursorPagination()
+            logs_page = paginator.paginate_queryset(logs_query, request)
+            pagination = {
+                'page_size': paginator.page_size,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'has_next': paginator.has_next,
+                'has_previous': paginator.has_previous
+            }
+            if paginator.total is not None:
+                pagination.update(paginator.total)
+        else:
+            paginator = Paginator(logs_query, page_size)
+            logs_page = paginator.get_page(page)
+            pagination = {
+                'page': page,
+                'page_size': page_size,
+                'total_pages': paginator.num_pages,
+                'total_count': paginator.count,
+                'has_next': logs_page.has_next(),
+                'has_previous': logs_page.has_previous()
+            }
         
         # Format response
         logs_data = []
@@ -549,20 +533,15 @@ def rbac_activity_logs(request):
         
         return Response({
             'logs': logs_data,
-            'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total_pages': paginator.num_pages,
-                'total_count': paginator.count,
-                'has_next': logs_page.has_next(),
-                'has_previous': logs_page.has_previous()
-            },
+            'pagination': pagination,
             'filters': {
                 'activity_types': [choice[0] for choice in UserActivityLog.ACTIVITY_TYPES],
                 'severity_levels': [choice[0] for choice in UserActivityLog.SEVERITY_LEVELS]
             }
         })
         
+    except NotFound as e:
+        return Response({'error': str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         logger.error(f"Error getting activity logs: {str(e)}")
         return Response(
@@ -596,7 +575,7 @@ def rbac_security_monitoring(request):
             timestamp__gte=timezone.now() - timedelta(hours=24)
         ).values('ip_address').annotate(
             count=Count('id'),
-            latest=models.Max('timestamp')
+            latest=Max('timestamp')
         ).order_by('-count')[:10]
         
         # Locked accounts
@@ -700,13 +679,8 @@ def rbac_registration_notifications(request):
         notifications = notifications.order_by('-created_at')
         
         # Get statistics
-        today = timezone.now().date()
-        stats = {
-            'pending': RegistrationNotification.objects.filter(status='pending').count(),
-            'approved': RegistrationNotification.objects.filter(status='approved').count(),
-            'rejected': RegistrationNotification.objects.filter(status='rejected').count(),
-            'today': RegistrationNotification.objects.filter(created_at__date=today).count(),
-        }
+        counts = RBACStats.registration_counts()
+        stats = {key: counts[key] for key in ('pending', 'approved', 'rejected', 'today')}
         
         # Pagination
         total_count = notifications.count()
@@ -738,13 +712,11 @@ def rbac_registration_notifications(request):
             })
         
         # Log activity
-        UserActivityLog.objects.create(
-            user=request.user,
-            activity_type='data_access',
-            description='Accessed registration notifications',
-            ip_address=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            success=True
+        log_activity_event(
+            request.user,
+            'data_access',
+            'Accessed registration notifications',
+            request=request
         )
         
         return Response({
@@ -777,7 +749,7 @@ def rbac_approve_registration(request, notification_id):
     try:
         from .rbac_models import RegistrationNotification
         from django.contrib.auth import get_user_model
-        from .models import Role
+        from .models import Role, UserRole
         
         User = get_user_model()
         
@@ -807,14 +779,13 @@ def rbac_approve_registration(request, notification_id):
             email=notification.email,
             first_name=notification.first_name,
             last_name=notification.last_name,
-            is_doctor=True,
             is_active=True
         )
         
         # Assign doctor role
         try:
-            doctor_role = Role.objects.get(name='doctor')
-            user.roles.add(doctor_role)
+            doctor_role = Role.objects.get(name='DOCTOR')
+            UserRole.objects.create(user=user, role=doctor_role, assigned_by=request.user)
         except Role.DoesNotExist:
             logger.warning("Doctor role not found, user created without role")
         
@@ -822,13 +793,11 @@ def rbac_approve_registration(request, notification_id):
         notification.approve(request.user)
         
         # Log activity
-        UserActivityLog.objects.create(
-            user=request.user,
-            activity_type='user_management',
-            description=f'Approved registration for Dr. {notification.get_full_name()}',
-            ip_address=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            success=True
+        log_activity_event(
+            request.user,
+            'user_management',
+            f'Approved registration for Dr. {notification.get_full_name()}',
+            request=request
         )
         
         return Response({
@@ -872,13 +841,11 @@ def rbac_reject_registration(request, notification_id):
         notification.reject(request.user, rejection_reason)
         
         # Log activity
-        UserActivityLog.objects.create(
-            user=request.user,
-            activity_type='user_management',
-            description=f'Rejected registration for Dr. {notification.get_full_name()}',
-            ip_address=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            success=True
+        log_activity_event(
+            request.user,
+            'user_management',
+            f'Rejected registration for Dr. {notification.get_full_name()}',
+            request=request
         )
         
         return Response({
@@ -914,13 +881,11 @@ def rbac_delete_notification(request, notification_id):
         notification.delete()
         
         # Log activity
-        UserActivityLog.objects.create(
-            user=request.user,
-            activity_type='data_management',
-            description=f'Deleted registration notification for Dr. {doctor_name}',
-            ip_address=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            success=True
+        log_activity_event(
+            request.user,
+            'data_management',
+            f'Deleted registration notification for Dr. {doctor_name}',
+            request=request
         )
         
         return Response({
@@ -944,40 +909,18 @@ def rbac_notification_stats(request):
     Get registration notification statistics
     """
     try:
-        from .rbac_models import RegistrationNotification
-        
-        today = timezone.now().date()
-        this_week_start = today - timedelta(days=today.weekday())
-        this_month_start = today.replace(day=1)
-        
+        counts = RBACStats.registration_counts()
         stats = {
-            'total_notifications': RegistrationNotification.objects.count(),
-            'pending_approvals': RegistrationNotification.objects.filter(status='pending').count(),
-            'approved_today': RegistrationNotification.objects.filter(
-                status='approved', 
-                processed_at__date=today
-            ).count(),
-            'rejected_today': RegistrationNotification.objects.filter(
-                status='rejected', 
-                processed_at__date=today
-            ).count(),
-            'registrations_this_week': RegistrationNotification.objects.filter(
-                created_at__date__gte=this_week_start
-            ).count(),
-            'registrations_this_month': RegistrationNotification.objects.filter(
-                created_at__date__gte=this_month_start
-            ).count(),
+            'total_notifications': counts['total'],
+            'pending_approvals': counts['pending'],
+            'approved_today': counts['approved_today'],
+            'rejected_today': counts['rejected_today'],
+            'registrations_this_week': counts['this_week'],
+            'registrations_this_month': counts['this_month'],
         }
         
         # Daily registration trend (last 7 days)
-        daily_stats = []
-        for i in range(7):
-            date = today - timedelta(days=i)
-            count = RegistrationNotification.objects.filter(created_at__date=date).count()
-            daily_stats.append({
-                'date': date,
-                'count': count
-            })
+        daily_stats = RBACStats.daily_registrations()
         
         return Response({
             'success': True,
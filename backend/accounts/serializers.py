@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import make_password
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from .authentication import check_signed_token
 from .models import User, Role, Permission, UserRole, UserPermission, RolePermission, UserProfile, AuditLog
 
 
@@ -66,10 +69,11 @@ class UserListSerializer(serializers.ModelSerializer):
         ]
     
     def get_role_names(self, obj):
-        return [role.name for role in obj.roles.filter(is_active=True)]
+        # Filtered in Python so roles prefetched by the listing are reused
+        return [role.name for role in obj.roles.all() if role.is_active]
     
     def get_is_superuser_role(self, obj):
-        return obj.is_superuser_role()
+        return 'SUPERUSER' in self.get_role_names(obj)
 
 
 class UserDetailSerializer(serializers.ModelSerializer):
@@ -227,7 +231,7 @@ class AssignRoleSerializer(serializers.Serializer):
     """
     Serializer for assigning roles to users
     """
-    user_id = serializers.UUIDField()
+    user_id = serializers.IntegerField()
     role_name = serializers.CharField()
     expires_at = serializers.DateTimeField(required=False)
     
@@ -250,7 +254,7 @@ class AssignPermissionSerializer(serializers.Serializer):
     """
     Serializer for assigning permissions to users
     """
-    user_id = serializers.UUIDField()
+    user_id = serializers.IntegerField()
     permission_codename = serializers.CharField()
     expires_at = serializers.DateTimeField(required=False)
     
@@ -371,3 +375,13 @@ class DashboardStatsSerializer(serializers.Serializer):
     class Meta:
         model = UserProfile
         fields = ['user', 'phone_number', 'bio', 'avatar', 'date_of_birth']
+
+
+class SignedTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer that refuses refresh tokens revoked since they were issued
+    """
+    def validate(self, attrs):
+        if check_signed_token(self.token_class(attrs['refresh'])) is None:
+            raise TokenError('Token is revoked')
+        return super().validate(attrs)
@@ -0,0 +1,115 @@
+"""
+Accounts signals
+
+Keep compiled user access sets (accounts.permission_cache) in step with role
+and permission assignments and definitions, and cached token resolutions
+(accounts.authentication) in step with logouts, password changes and
+deactivations. Cached RBAC dashboard statistics (accounts.rbac_stats) are
+invalidated when the rows they count change.
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .audit import audit_entries_written
+from .authentication import TokenCache
+from .models import Permission, Role, RolePermission, User, UserPermission, UserRole
+from .permission_cache import PermissionCache
+from .presence import Presence
+from .rbac_models import (
+    RBACRole, RegistrationNotification, UserActivityLog, UserSecurityProfile, UserSession
+)
+from .rbac_stats import NOTABLE_SEVERITIES, RBACStats
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+@receiver(post_save, sender=UserPermission)
+@receiver(post_delete, sender=UserPermission)
+def invalidate_access_on_assignment(sender, instance, **kwargs):
+    """A user's roles or direct permissions changed"""
+    PermissionCache.invalidate([instance.user_id])
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+@receiver(m2m_changed, sender=User.permissions.through)
+def invalidate_access_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Assignments made through user.roles / user.permissions (or the reverse managers)"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        PermissionCache.invalidate([instance.pk])
+    elif pk_set:
+        PermissionCache.invalidate(pk_set)
+    else:
+        # Reverse clear: the affected users are no longer known
+        PermissionCache.invalidate_all()
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+def invalidate_access_on_definition_change(sender, instance, **kwargs):
+    """Role or permission activation, renames and role grants affect every holder"""
+    PermissionCache.invalidate_all()
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    """Logout (or user deletion) removed the token"""
+    TokenCache.forget(instance.key)
+    TokenCache.revoke([instance.user_id])
+    Presence.end_session(instance.user_id, instance.key)
+
+
+@receiver(post_save, sender=User)
+def revoke_or_refresh_cached_user(sender, instance, created, **kwargs):
+    """Password changes and deactivation revoke tokens; other saves reload the cached user"""
+    if created:
+        return
+    # set_password() keeps the raw password on the instance until save() completes
+    if instance._password is not None or not instance.is_active:
+        TokenCache.revoke([instance.pk])
+    else:
+        TokenCache.refresh([instance.pk])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=UserSecurityProfile)
+@receiver(post_delete, sender=UserSecurityProfile)
+@receiver(post_save, sender=RBACRole)
+@receiver(post_delete, sender=RBACRole)
+@receiver(post_save, sender=UserSession)
+@receiver(post_delete, sender=UserSession)
+def invalidate_rbac_dashboard(sender, instance, **kwargs):
+    """User, role and session counts changed"""
+    RBACStats.invalidate('dashboard')
+
+
+def _is_dashboard_activity(entry):
+    """Only failed logins and high-severity activity are shown on the dashboard"""
+    return entry.severity in NOTABLE_SEVERITIES or (entry.activity_type == 'login' and not entry.success)
+
+
+@receiver(post_save, sender=UserActivityLog)
+def invalidate_rbac_dashboard_on_activity(sender, instance, created, **kwargs):
+    if _is_dashboard_activity(instance):
+        RBACStats.invalidate('dashboard')
+
+
+@receiver(audit_entries_written, sender=UserActivityLog)
+def invalidate_rbac_dashboard_on_activity_batch(sender, entries, **kwargs):
+    """Activity entries from the batched writer are inserted without post_save"""
+    if any(_is_dashboard_activity(entry) for entry in entries):
+        RBACStats.invalidate('dashboard')
+
+
+@receiver(post_save, sender=RegistrationNotification)
+@receiver(post_delete, sender=RegistrationNotification)
+def invalidate_registration_stats(sender, instance, **kwargs):
+    RBACStats.invalidate('registrations')
@@ -0,0 +1,22 @@
+"""
+Celery tasks for accounts
+"""
+
+from celery import shared_task
+from django.apps import apps
+
+from .audit import deserialize_entries, insert_entries
+from .presence import Presence
+
+
+@shared_task(acks_late=True, ignore_result=True)
+def write_audit_entries(model_label, payload):
+    """Insert a batch of audit entries queued by a web process"""
+    model = apps.get_model(model_label)
+    insert_entries(model, deserialize_entries(model, payload))
+
+
+@shared_task(ignore_result=True)
+def purge_expired_sessions():
+    """Periodic cleanup of expired sessions (see CELERY_BEAT_SCHEDULE)"""
+    Presence.purge()
@@ -0,0 +1,217 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .audit import audit_writer
+from .authentication import TokenCache, issue_signed_tokens
+from .models import Role, User
+from .rbac_models import RBACRole, RegistrationNotification, RoleAssignment, UserActivityLog, UserSecurityProfile
+
+
+class RBACUsersManagementQueryTests(TestCase):
+    """The RBAC user listing runs a fixed number of queries whatever the page size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin-pass-123'
+        )
+        cls.radiologist = RBACRole.objects.create(name='radiologist', display_name='Radiologist', security_level=2)
+        cls.reviewer = RBACRole.objects.create(name='reviewer', display_name='Reviewer', security_level=2)
+
+        now = timezone.now()
+        for index in range(12):
+            user = User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com', password='user-pass-123'
+            )
+            UserSecurityProfile.objects.create(user=user, account_status='active')
+            RoleAssignment.objects.create(user=user, role=cls.radiologist, status='active')
+            RoleAssignment.objects.create(user=user, role=cls.reviewer, status='revoked')
+            for minutes in (30, 5):
+                log = UserActivityLog.objects.create(
+                    user=user, activity_type='login', action='Login', description='Signed in',
+                    ip_address='127.0.0.1'
+                )
+                UserActivityLog.objects.filter(pk=log.pk).update(timestamp=now - timedelta(minutes=minutes))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get_users(self, page_size):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/rbac/users/', {'page_size': page_size, 'sort': 'username'})
+        self.assertEqual(response.status_code, 200)
+        return response.data['users'], len(queries)
+
+    def test_query_count_independent_of_page_size(self):
+        small_page, small_queries = self.get_users(2)
+        large_page, large_queries = self.get_users(12)
+
+        self.assertEqual(len(small_page), 2)
+        self.assertEqual(len(large_page), 12)
+        self.assertEqual(small_queries, large_queries)
+
+    def test_roles_and_last_activity(self):
+        users, _ = self.get_users(20)
+        listed = {user['username']: user for user in users}
+
+        user = listed['user0']
+        self.assertEqual(user['roles'], ['radiologist'])
+        latest = UserActivityLog.objects.filter(user__username='user0').order_by('-timestamp').first()
+        self.assertEqual(user['last_activity'], latest.timestamp.isoformat())
+        self.assertEqual(user['security_profile']['account_status'], 'active')
+        self.assertIsNone(listed['admin']['last_activity'])
+
+
+class RegistrationApprovalTests(TestCase):
+    """Approving a registration creates a doctor account"""
+
+    def test_approved_registrant_gets_the_doctor_role(self):
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='admin-pass-123')
+        Role.objects.create(name='DOCTOR', display_name='Doctor')
+        notification = RegistrationNotification.objects.create(
+            first_name='New', last_name='Doctor', email='new.doctor@example.com', medical_license='LIC-1'
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        response = client.post(f'/api/rbac/notifications/registrations/{notification.id}/approve/')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertTrue(User.objects.get(email='new.doctor@example.com').has_role('DOCTOR'))
+
+
+SIGNED_TOKENS = {'shared': True, 'signed_tokens': True}
+
+
+@override_settings(AUTH_TOKEN_CACHE=SIGNED_TOKENS, PRESENCE={'enabled': False})
+class SignedTokenRevocationTests(TestCase):
+    """Signed tokens are checked against the durable auth_version"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='doctor', email='doctor@example.com', password='doctor-pass-123')
+
+    def setUp(self):
+        cache.clear()
+        TokenCache.local_cache().clear()
+        self.client = APIClient()
+        self.tokens = issue_signed_tokens(self.user)
+
+    def profile(self, access):
+        return self.client.get('/api/auth/profile/', HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def refresh(self):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': self.tokens['refresh']}, format='json')
+
+    def revoke(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TokenCache.revoke([self.user.pk])
+        # A restart or cull loses every cached stamp
+        cache.clear()
+        TokenCache.local_cache().clear()
+
+    def test_valid_tokens_authenticate_and_refresh(self):
+        self.assertEqual(self.profile(self.tokens['access']).status_code, 200)
+        response = self.refresh()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profile(response.data['access']).status_code, 200)
+
+    def test_revoked_tokens_stay_revoked_after_cache_loss(self):
+        self.revoke()
+        self.assertEqual(self.profile(self.tokens['access']).status_code, 401)
+        self.assertEqual(self.refresh().status_code, 401)
+
+    def test_password_change_keeps_revocation_through_later_saves(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('changed-pass-123')
+        user.save()
+        # The instance still holds the old auth_version
+        user.full_name = 'Renamed'
+        user.save()
+        cache.clear()
+        self.assertEqual(self.profile(self.tokens['access']).status_code, 401)
+
+    def test_inactive_users_are_refused(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.profile(self.tokens['access']).status_code, 401)
+
+    @override_settings(AUTH_TOKEN_CACHE={'shared': False, 'signed_tokens': True})
+    def test_signed_tokens_require_the_shared_cache(self):
+        self.assertEqual(self.profile(self.tokens['access']).status_code, 401)
+        self.assertEqual(self.refresh().status_code, 401)
+
+
+@override_settings(AUTH_TOKEN_CACHE={'shared': False}, PRESENCE={'enabled': False})
+class LocalTokenCacheRevocationTests(TestCase):
+    """Without the shared cache, revocations in another worker still apply at once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='doctor', email='doctor@example.com', password='doctor-pass-123')
+
+    def setUp(self):
+        cache.clear()
+        TokenCache.local_cache().clear()
+        self.token = Token.objects.create(user=self.user)
+        self.key = self.token.key
+        self.client = APIClient()
+        self.assertEqual(self.profile().status_code, 200)
+
+    def profile(self):
+        return self.client.get('/api/auth/profile/', HTTP_AUTHORIZATION=f'Token {self.key}')
+
+    def in_other_worker(self, change):
+        # forget() only drops the entries of the worker that ran it
+        with patch.object(TokenCache, 'forget'), self.captureOnCommitCallbacks(execute=True):
+            change()
+        # Stamps bumped there never reach this worker's cache
+        cache.clear()
+
+    def test_cached_token_is_used_until_revoked(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.profile().status_code, 200)
+        self.assertFalse(any('authtoken_token' in query['sql'] for query in queries.captured_queries))
+
+    def test_logout_in_other_worker(self):
+        self.in_other_worker(self.token.delete)
+        self.assertEqual(self.profile().status_code, 401)
+
+    def test_deactivation_in_other_worker(self):
+        def deactivate():
+            user = User.objects.get(pk=self.user.pk)
+            user.is_active = False
+            user.save()
+
+        self.in_other_worker(deactivate)
+        self.assertEqual(self.profile().status_code, 401)
+
+
+@override_settings(AUDIT_LOG={'mode': 'buffered', 'flush_interval': 3600}, PRESENCE={'enabled': False})
+class ActivityLogWriterTests(TestCase):
+    """RBAC activity entries go through the batched audit writer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='admin-pass-123')
+
+    def test_dashboard_activity_is_written_off_the_request_path(self):
+        audit_writer.flush()
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.get('/api/rbac/dashboard/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UserActivityLog.objects.filter(user=self.admin).exists())
+
+        self.assertEqual(audit_writer.flush(), 1)
+        entry = UserActivityLog.objects.get(user=self.admin)
+        self.assertEqual((entry.activity_type, entry.performed_by_id), ('admin_action', self.admin.pk))
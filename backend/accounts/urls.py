@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 from .simple_views import simple_login
 from .emergency_login import emergency_login
@@ -22,6 +23,7 @@ urlpatterns = [
     path('simple-login/', simple_login, name='simple-login'),
     path('emergency-login/', emergency_login, name='emergency-login'),
     path('logout/', views.LogoutView.as_view(), name='logout'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     
     # Emergency admin endpoints
     path('emergency/approve-admin/', emergency_approve_admin, name='emergency-approve-admin'),
@@ -24,6 +24,9 @@ from .permissions import (
     IsSuperUser, IsDoctor, HasPermission, CanManageUsers,
     require_permission, require_role, require_superuser, get_client_ip
 )
+from .audit import log_audit_event
+from .authentication import TokenCache, issue_signed_tokens, signed_tokens_enabled
+from .pagination import LogCursorPagination, use_cursor_pagination
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -44,13 +47,12 @@ class RegisterView(APIView):
             token, created = Token.objects.get_or_create(user=user)
             
             # Log registration
-            AuditLog.objects.create(
+            log_audit_event(
                 user=user,
                 action='REGISTER',
                 resource_type='USER',
                 resource_id=str(user.id),
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+                request=request
             )
             
             return Response({
@@ -180,7 +182,7 @@ class LoginView(APIView):
                 
                 # Log login
                 try:
-                    AuditLog.objects.create(
+                    log_audit_event(
                         user=user,
                         action='LOGIN',
                         resource_type='AUTH',
@@ -188,8 +190,7 @@ class LoginView(APIView):
                             'login_method': 'token',
                             'roles': [role.name for role in user.roles.filter(is_active=True)]
                         },
-                        ip_address=get_client_ip(request),
-                        user_agent=request.META.get('HTTP_USER_AGENT', '')
+                        request=request
                     )
                 except Exception as audit_error:
                     print(f"Audit log error: {audit_error}")
@@ -209,6 +210,8 @@ class LoginView(APIView):
                     },
                     'message': 'Login successful'
                 }
+                if signed_tokens_enabled():
+                    response_data.update(issue_signed_tokens(user))
                 print(f"Returning success response")
                 return Response(response_data, status=status.HTTP_200_OK)
             else:
@@ -232,12 +235,11 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             # Log logout
-            AuditLog.objects.create(
+            log_audit_event(
                 user=request.user,
                 action='LOGOUT',
                 resource_type='AUTH',
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+                request=request
             )
             
             # Delete token
@@ -273,18 +275,24 @@ class UserManagementViewSet(viewsets.ModelViewSet):
             return UserUpdateSerializer
         return UserDetailSerializer
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # UserListSerializer reads every listed user's roles
+            queryset = queryset.prefetch_related('roles')
+        return queryset
+    
     def perform_create(self, serializer):
         user = serializer.save()
         
         # Log user creation
-        AuditLog.objects.create(
+        log_audit_event(
             user=self.request.user,
             action='CREATE',
             resource_type='USER',
             resource_id=str(user.id),
             details={'created_user': user.email},
-            ip_address=get_client_ip(self.request),
-            user_agent=self.request.META.get('HTTP_USER_AGENT', '')
+            request=self.request
         )
     
     @action(detail=False, methods=['post'], url_path='create-doctor')
@@ -303,14 +311,13 @@ class UserManagementViewSet(viewsets.ModelViewSet):
             user = serializer.save()
             
             # Log doctor creation
-            AuditLog.objects.create(
+            log_audit_event(
                 user=request.user,
                 action='CREATE',
                 resource_type='DOCTOR',
                 resource_id=str(user.id),
                 details={'doctor_email': user.email},
-                ip_address=get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+                request=request
             )
             
             return Response({
@@ -352,7 +359,7 @@ class UserManagementViewSet(viewsets.ModelViewSet):
                     user_role.save()
                 
                 # Log role assignment
-                AuditLog.objects.create(
+                log_audit_event(
                     user=request.user,
                     action='ROLE_ASSIGN',
                     resource_type='USER',
@@ -361,8 +368,7 @@ class UserManagementViewSet(viewsets.ModelViewSet):
                         'assigned_role': role_name,
                         'target_user': user.email
                     },
-                    ip_address=get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
+                    request=request
                 )
                 
                 return Response({
@@ -408,7 +414,7 @@ class UserManagementViewSet(viewsets.ModelViewSet):
                     user_permission.save()
                 
                 # Log permission assignment
-                AuditLog.objects.create(
+                log_audit_event(
                     user=request.user,
                     action='PERMISSION_GRANT',
                     resource_type='USER',
@@ -417,8 +423,7 @@ class UserManagementViewSet(viewsets.ModelViewSet):
                         'assigned_permission': permission_codename,
                         'target_user': user.email
                     },
-                    ip_address=get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
+                    request=request
                 )
                 
                 return Response({
@@ -467,13 +472,12 @@ def upload_scan(request):
     Upload scan endpoint (Doctor with upload_scan permission)
     """
     # Log scan upload attempt
-    AuditLog.objects.create(
+    log_audit_event(
         user=request.user,
         action='CREATE',
         resource_type='SCAN',
         details={'action': 'upload_scan'},
-        ip_address=get_client_ip(request),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
+        request=request
     )
     
     return Response({
@@ -491,13 +495,12 @@ def view_report(request):
     View report endpoint (Doctor with view_report permission)
     """
     # Log report view
-    AuditLog.objects.create(
+    log_audit_event(
         user=request.user,
         action='VIEW',
         resource_type='REPORT',
         details={'action': 'view_report'},
-        ip_address=get_client_ip(request),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
+        request=request
     )
     
     return Response({
@@ -604,12 +607,12 @@ class ChangePasswordView(APIView):
         request.user.save()
         
         # Log password change
-        AuditLog.objects.create(
+        log_audit_event(
             user=request.user,
             action='UPDATE',
             resource_type='PASSWORD',
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
+            request=request,
+            durable=True
         )
         
         return Response({
@@ -625,10 +628,20 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for audit logs (SuperUser only)
     """
-    queryset = AuditLog.objects.all()
+    queryset = AuditLog.objects.select_related('user')
     serializer_class = AuditLogSerializer
     permission_classes = [IsAuthenticated, IsSuperUser]
     
+    @property
+    def paginator(self):
+        """
+        Page-number pagination by default, keyset pagination when opted in
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params if self.request else {}
+            self._paginator = LogCursorPagination() if use_cursor_pagination(params) else self.pagination_class()
+        return self._paginator
+    
     def get_queryset(self):
         queryset = super().get_queryset()
         
@@ -704,6 +717,8 @@ class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
+        # Also ends signed token sessions, which have no Token row
+        TokenCache.revoke([request.user.pk])
         try:
             # Delete the user's token
             token = Token.objects.get(user=request.user)
@@ -0,0 +1,40 @@
+"""
+Cache backends that count hits and misses for the metrics registry
+"""
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+from .metrics import metrics
+
+_missing = object()
+
+
+class InstrumentedCacheMixin:
+    """Counts get()/get_many() results under the cache's METRICS_NAME"""
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self._metrics_name = params.get('METRICS_NAME', 'default')
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            metrics.observe_cache(self._metrics_name, 0, 1)
+            return default
+        metrics.observe_cache(self._metrics_name, 1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        metrics.observe_cache(self._metrics_name, len(found), len(keys) - len(found))
+        return found
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
@@ -3,7 +3,7 @@ Enhanced RBAC Service for Advanced User Management
 Provides API endpoints for comprehensive user management features
 """
 
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
@@ -13,7 +13,11 @@ from django.db import transaction
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from accounts.models import Role, UserRole, Permission
+from accounts.presence import Presence
+from accounts.rbac_models import UserActivityLog
+from .metrics import render_prometheus, system_metrics
 import json
 from datetime import datetime, timedelta
 import logging
@@ -38,9 +42,13 @@ class EnhancedUserManagementAPI:
             active_users = User.objects.filter(is_active=True).count()
             total_roles = Role.objects.count()
             
-            # Mock some advanced metrics (implement real logic as needed)
-            active_sessions = 15  # Replace with real session count
-            failed_logins = 5     # Replace with real failed login count from last 24h
+            now = timezone.now()
+            active_sessions = Presence.active_session_count()
+            failed_logins = UserActivityLog.objects.filter(
+                activity_type='login',
+                success=False,
+                timestamp__gte=now - timedelta(hours=24)
+            ).count()
             suspended_accounts = User.objects.filter(is_suspended=True).count()
             
             stats = {
@@ -107,7 +115,8 @@ class EnhancedUserManagementAPI:
             # Apply sorting
             if sort_order == 'desc':
                 sort_by = f'-{sort_by}'
-            queryset = queryset.order_by(sort_by)
+            # Roles of every listed user in one query
+            queryset = queryset.order_by(sort_by).prefetch_related('roles')
             
             # Paginate
             paginator = Paginator(queryset, per_page)
@@ -331,16 +340,12 @@ class EnhancedUserManagementAPI:
             if not request.user.is_superuser:
                 return JsonResponse({'error': 'Permission denied'}, status=403)
             
-            # Mock system metrics (implement real monitoring as needed)
-            metrics = {
-                'cpu_usage': 25,        # percentage
-                'memory_usage': 45,     # percentage
-                'disk_usage': 60,       # percentage
-                'active_connections': 12,
-                'response_time': 150    # milliseconds
-            }
+            if request.GET.get('format') == 'prometheus':
+                return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
             
-            return JsonResponse(metrics)
+            # Merged across workers: CPU and memory (percent) summed over worker
+            # processes, in-flight requests, and mean response time in milliseconds
+            return JsonResponse(system_metrics())
             
         except Exception as e:
             logger.error(f"Error getting system metrics: {str(e)}")
@@ -355,25 +360,33 @@ class EnhancedUserManagementAPI:
             if not request.user.is_superuser:
                 return JsonResponse({'error': 'Permission denied'}, status=403)
             
-            # Mock online users (implement real session tracking as needed)
-            # In a real implementation, you'd track active sessions
-            recent_cutoff = datetime.now() - timedelta(minutes=15)
-            online_users = User.objects.filter(
-                last_login__gte=recent_cutoff,
+            # Paged with ?offset=&limit=; the full count is in X-Total-Count
+            try:
+                offset = max(int(request.GET.get('offset', 0)), 0)
+                limit = min(max(int(request.GET.get('limit', 100)), 1), 500)
+            except ValueError:
+                return JsonResponse({'error': 'offset and limit must be integers'}, status=400)
+            
+            total, seen = Presence.online_users(offset=offset, limit=limit)
+            users = User.objects.filter(
+                id__in=[user_id for user_id, _ in seen],
                 is_active=True
-            )
+            ).only('id', 'username', 'full_name').in_bulk()
             
             online_data = [
                 {
-                    'id': user.id,
-                    'username': user.username,
-                    'full_name': user.full_name,
-                    'last_activity': user.last_login.isoformat() if user.last_login else None
+                    'id': user_id,
+                    'username': users[user_id].username,
+                    'full_name': users[user_id].full_name,
+                    'last_activity': last_seen.isoformat()
                 }
-                for user in online_users
+                for user_id, last_seen in seen
+                if user_id in users
             ]
             
-            return JsonResponse(online_data, safe=False)
+            response = JsonResponse(online_data, safe=False)
+            response['X-Total-Count'] = total
+            return response
             
         except Exception as e:
             logger.error(f"Error getting online users: {str(e)}")
@@ -0,0 +1,599 @@
+"""
+Process and request instrumentation
+
+Each worker process counts requests per route (a latency histogram, errors,
+database queries and query time), cache hits and misses, and external call
+latencies, and samples its own CPU and resident memory. A daemon thread
+publishes a snapshot of these counters every METRICS['publish_interval']
+seconds to a store shared by all gunicorn workers: a Redis hash when a Redis
+URL is configured, otherwise one JSON file per worker in METRICS['shared_dir'].
+
+collect() merges the snapshots of live workers; the system metrics endpoint
+and the Prometheus exposition (render_prometheus) are both built from it.
+"""
+
+import atexit
+import bisect
+import glob
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = 'medixscan'
+
+
+def get_metrics_config():
+    """METRICS settings with defaults"""
+    config = {
+        'enabled': True,
+        # 'auto' picks 'redis' when redis_url is set, 'file' otherwise; 'local' disables sharing
+        'backend': 'auto',
+        'redis_url': '',
+        'shared_dir': os.path.join(settings.BASE_DIR, 'data', 'metrics'),
+        'publish_interval': 10.0,
+        'worker_ttl': 60,
+        'latency_buckets': DEFAULT_LATENCY_BUCKETS,
+        'prometheus_token': '',
+    }
+    config.update(getattr(settings, 'METRICS', {}))
+    return config
+
+
+def _histogram(size):
+    # Per-bucket (not cumulative) counts; the last slot is the +Inf overflow
+    return {'count': 0, 'sum': 0.0, 'buckets': [0] * (size + 1)}
+
+
+def _observe(histogram, buckets, value):
+    histogram['count'] += 1
+    histogram['sum'] += value
+    histogram['buckets'][bisect.bisect_left(buckets, value)] += 1
+
+
+def _merge_histogram(target, source):
+    target['count'] += source['count']
+    target['sum'] += source['sum']
+    target['buckets'] = [a + b for a, b in zip(target['buckets'], source['buckets'])]
+
+
+def histogram_quantile(histogram, buckets, quantile):
+    """Quantile estimate by linear interpolation within buckets, as Prometheus does"""
+    if not histogram['count']:
+        return None
+    rank = quantile * histogram['count']
+    seen = 0
+    lower = 0.0
+    for index, count in enumerate(histogram['buckets']):
+        if index == len(buckets):
+            # Overflow bucket: the best estimate is the highest finite bound
+            return buckets[-1]
+        upper = buckets[index]
+        if count and seen + count >= rank:
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+        lower = upper
+    return buckets[-1]
+
+
+def _rss_bytes():
+    """Resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # Peak rather than current RSS; kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+def _total_memory_bytes():
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters of one worker process
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self.routes = {}
+        self.caches = {}
+        self.external = {}
+        self.in_flight = 0
+        self._cpu_sample = (time.monotonic(), time.process_time())
+        self.cpu_percent = 0.0
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def observe_request(self, method, route, status_code, duration, queries=0, query_time=0.0):
+        key = f'{method} {route}'
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+            stats = self.routes.get(key)
+            if stats is None:
+                stats = self.routes[key] = {
+                    'method': method,
+                    'route': route,
+                    'latency': _histogram(len(self.buckets)),
+                    'errors': 0,
+                    'db_queries': 0,
+                    'db_time': 0.0,
+                    'db_queries_max': 0,
+                }
+            _observe(stats['latency'], self.buckets, duration)
+            if status_code >= 500:
+                stats['errors'] += 1
+            stats['db_queries'] += queries
+            stats['db_time'] += query_time
+            stats['db_queries_max'] = max(stats['db_queries_max'], queries)
+
+    def observe_cache(self, name, hits, misses):
+        with self._lock:
+            counts = self.caches.setdefault(name, {'hits': 0, 'misses': 0})
+            counts['hits'] += hits
+            counts['misses'] += misses
+
+    def observe_external(self, service, duration, failed=False):
+        with self._lock:
+            stats = self.external.get(service)
+            if stats is None:
+                stats = self.external[service] = {'latency': _histogram(len(self.buckets)), 'errors': 0}
+            _observe(stats['latency'], self.buckets, duration)
+            if failed:
+                stats['errors'] += 1
+
+    def sample_process(self):
+        """CPU use since the previous sample, cumulative CPU time and RSS"""
+        now, cpu = time.monotonic(), time.process_time()
+        with self._lock:
+            last_wall, last_cpu = self._cpu_sample
+            if now - last_wall >= 1.0:
+                self.cpu_percent = round(100.0 * (cpu - last_cpu) / (now - last_wall), 2)
+                self._cpu_sample = (now, cpu)
+            cpu_percent = self.cpu_percent
+        return {'cpu_seconds': cpu, 'cpu_percent': cpu_percent, 'rss_bytes': _rss_bytes()}
+
+    def snapshot(self, worker_id):
+        process = self.sample_process()
+        with self._lock:
+            return json.loads(json.dumps({
+                'worker': worker_id,
+                'host': socket.gethostname(),
+                'pid': os.getpid(),
+                'started': self.started,
+                'updated': time.time(),
+                'buckets': list(self.buckets),
+                'process': process,
+                'in_flight': self.in_flight,
+                'routes': self.routes,
+                'caches': self.caches,
+                'external': self.external,
+            }))
+
+
+class RedisMetricsStore:
+    """Worker snapshots in one Redis hash"""
+
+    KEY = f'{METRIC_PREFIX}:metrics:workers'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def publish(self, worker_id, snapshot):
+        self.client.hset(self.KEY, worker_id, json.dumps(snapshot))
+
+    def remove(self, worker_id):
+        self.client.hdel(self.KEY, worker_id)
+
+    def load(self):
+        snapshots = []
+        for worker_id, payload in self.client.hgetall(self.KEY).items():
+            try:
+                snapshots.append(json.loads(payload))
+            except ValueError:
+                self.client.hdel(self.KEY, worker_id)
+        return snapshots
+
+    def expire(self, worker_ids):
+        if worker_ids:
+            self.client.hdel(self.KEY, *worker_ids)
+
+
+class FileMetricsStore:
+    """Worker snapshots as JSON files in a directory shared by the workers of one host"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, worker_id):
+        return os.path.join(self.directory, worker_id.replace(os.sep, '_').replace(':', '_') + '.json')
+
+    def publish(self, worker_id, snapshot):
+        path = self._path(worker_id)
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'w') as handle:
+            json.dump(snapshot, handle)
+        os.replace(temporary_path, path)
+
+    def remove(self, worker_id):
+        try:
+            os.remove(self._path(worker_id))
+        except OSError:
+            pass
+
+    def load(self):
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def expire(self, worker_ids):
+        for worker_id in worker_ids:
+            self.remove(worker_id)
+
+
+class LocalMetricsStore:
+    """No sharing: only the current process is reported"""
+
+    def publish(self, worker_id, snapshot):
+        pass
+
+    def remove(self, worker_id):
+        pass
+
+    def load(self):
+        return []
+
+    def expire(self, worker_ids):
+        pass
+
+
+class Metrics:
+    """
+    Process-wide metrics: the registry, its publisher thread and the shared store
+    """
+
+    def __init__(self):
+        self._reset()
+        atexit.register(self._unpublish)
+        if hasattr(os, 'register_at_fork'):
+            # Workers forked from a preloaded master start with empty counters
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self.config = None
+        self.registry = None
+        self._store = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+
+    def _ensure_registry(self):
+        if self.registry is None:
+            with self._lock:
+                if self.registry is None:
+                    self.config = get_metrics_config()
+                    self.registry = MetricsRegistry(self.config['latency_buckets'])
+        return self.registry
+
+    @property
+    def enabled(self):
+        self._ensure_registry()
+        return self.config['enabled']
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._ensure_registry()
+            backend = self.config['backend']
+            if backend == 'auto':
+                backend = 'redis' if self.config['redis_url'] else 'file'
+            try:
+                if backend == 'redis':
+                    self._store = RedisMetricsStore(self.config['redis_url'])
+                elif backend == 'file':
+                    self._store = FileMetricsStore(self.config['shared_dir'])
+                else:
+                    self._store = LocalMetricsStore()
+            except Exception as e:
+                logger.warning(f"Metrics store '{backend}' unavailable, reporting this process only: {str(e)}")
+                self._store = LocalMetricsStore()
+        return self._store
+
+    def start_publisher(self):
+        """Publish this worker's snapshot periodically (idempotent)"""
+        self._ensure_registry()
+        if self._thread is not None or not self.config['enabled']:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='metrics-publisher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.config['publish_interval']):
+            self.publish()
+
+    def publish(self):
+        try:
+            self.store.publish(self.worker_id, self._ensure_registry().snapshot(self.worker_id))
+        except Exception as e:
+            logger.warning(f"Publishing metrics failed: {str(e)}")
+
+    def _unpublish(self):
+        if self._store is not None:
+            try:
+                self._store.remove(self.worker_id)
+            except Exception:
+                pass
+
+    # Recording
+
+    def request_started(self):
+        if self._thread is None:
+            # Started on first use so each forked worker runs its own publisher
+            self.start_publisher()
+        self._ensure_registry().request_started()
+
+    def observe_request(self, method, route, status_code, duration, queries=0, query_time=0.0):
+        self._ensure_registry().observe_request(method, route, status_code, duration, queries, query_time)
+
+    def observe_cache(self, name, hits, misses):
+        self._ensure_registry().observe_cache(name, hits, misses)
+
+    def observe_external(self, service, duration, failed=False):
+        self._ensure_registry().observe_external(service, duration, failed)
+
+    # Reading
+
+    def collect(self):
+        """
+        Snapshots of all live workers, this process's taken fresh
+        """
+        registry = self._ensure_registry()
+        current = registry.snapshot(self.worker_id)
+        try:
+            snapshots = self.store.load()
+        except Exception as e:
+            logger.warning(f"Loading shared metrics failed: {str(e)}")
+            snapshots = []
+
+        cutoff = time.time() - self.config['worker_ttl']
+        stale = [s['worker'] for s in snapshots if s.get('updated', 0) < cutoff]
+        if stale:
+            try:
+                self.store.expire(stale)
+            except Exception:
+                pass
+        live = [
+            s for s in snapshots
+            if s['worker'] != self.worker_id and s.get('updated', 0) >= cutoff and s.get('buckets') == current['buckets']
+        ]
+        return [current] + live
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def track_external_call(service):
+    """Time a call to an external service; failures are counted when it raises"""
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        metrics.observe_external(service, time.perf_counter() - started, failed)
+
+
+def aggregate(snapshots):
+    """Merge worker snapshots into per-route, per-cache and per-service totals"""
+    buckets = snapshots[0]['buckets'] if snapshots else list(DEFAULT_LATENCY_BUCKETS)
+    routes, caches, external, workers = {}, {}, {}, []
+    for snapshot in snapshots:
+        process = snapshot['process']
+        workers.append({
+            'worker': snapshot['worker'],
+            'host': snapshot['host'],
+            'pid': snapshot['pid'],
+            'uptime_seconds': round(snapshot['updated'] - snapshot['started'], 1),
+            'cpu_percent': process['cpu_percent'],
+            'cpu_seconds': process['cpu_seconds'],
+            'rss_bytes': process['rss_bytes'],
+            'in_flight': snapshot['in_flight'],
+            'requests': sum(stats['latency']['count'] for stats in snapshot['routes'].values()),
+        })
+        for key, stats in snapshot['routes'].items():
+            merged = routes.get(key)
+            if merged is None:
+                routes[key] = json.loads(json.dumps(stats))
+                continue
+            _merge_histogram(merged['latency'], stats['latency'])
+            merged['errors'] += stats['errors']
+            merged['db_queries'] += stats['db_queries']
+            merged['db_time'] += stats['db_time']
+            merged['db_queries_max'] = max(merged['db_queries_max'], stats['db_queries_max'])
+        for name, counts in snapshot['caches'].items():
+            merged = caches.setdefault(name, {'hits': 0, 'misses': 0})
+            merged['hits'] += counts['hits']
+            merged['misses'] += counts['misses']
+        for service, stats in snapshot['external'].items():
+            merged = external.get(service)
+            if merged is None:
+                external[service] = json.loads(json.dumps(stats))
+                continue
+            _merge_histogram(merged['latency'], stats['latency'])
+            merged['errors'] += stats['errors']
+    return {'buckets': buckets, 'routes': routes, 'caches': caches, 'external': external, 'workers': workers}
+
+
+def _milliseconds(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _latency_summary(histogram, buckets):
+    count = histogram['count']
+    return {
+        'count': count,
+        'avg_ms': _milliseconds(histogram['sum'] / count) if count else None,
+        'p50_ms': _milliseconds(histogram_quantile(histogram, buckets, 0.5)),
+        'p95_ms': _milliseconds(histogram_quantile(histogram, buckets, 0.95)),
+        'p99_ms': _milliseconds(histogram_quantile(histogram, buckets, 0.99)),
+    }
+
+
+def system_metrics():
+    """Aggregated metrics for the admin dashboard"""
+    data = aggregate(metrics.collect())
+    buckets = data['buckets']
+
+    routes = {}
+    overall = _histogram(len(buckets))
+    for key, stats in sorted(data['routes'].items()):
+        count = stats['latency']['count']
+        _merge_histogram(overall, stats['latency'])
+        routes[key] = dict(
+            _latency_summary(stats['latency'], buckets),
+            errors=stats['errors'],
+            db_queries_avg=round(stats['db_queries'] / count, 2) if count else None,
+            db_queries_max=stats['db_queries_max'],
+            db_time_avg_ms=_milliseconds(stats['db_time'] / count) if count else None,
+        )
+
+    caches = {}
+    for name, counts in data['caches'].items():
+        lookups = counts['hits'] + counts['misses']
+        caches[name] = dict(counts, hit_ratio=round(counts['hits'] / lookups, 4) if lookups else None)
+
+    external = {
+        service: dict(_latency_summary(stats['latency'], buckets), errors=stats['errors'])
+        for service, stats in data['external'].items()
+    }
+
+    workers = data['workers']
+    rss_total = sum(worker['rss_bytes'] or 0 for worker in workers)
+    total_memory = _total_memory_bytes()
+    try:
+        disk = shutil.disk_usage(settings.BASE_DIR)
+        disk_usage = round(100.0 * disk.used / disk.total, 1)
+    except OSError:
+        disk_usage = None
+    overall_summary = _latency_summary(overall, buckets)
+
+    return {
+        # Summary figures shown on the dashboard
+        'cpu_usage': round(sum(worker['cpu_percent'] for worker in workers), 1),
+        'memory_usage': round(100.0 * rss_total / total_memory, 1) if total_memory else None,
+        'disk_usage': disk_usage,
+        'active_connections': sum(worker['in_flight'] for worker in workers),
+        'response_time': overall_summary['avg_ms'],
+        'requests': overall_summary,
+        'workers': workers,
+        'routes': routes,
+        'caches': caches,
+        'external': external,
+    }
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _render_histogram(lines, name, labels, histogram, buckets):
+    cumulative = 0
+    for bound, count in zip(list(buckets) + ['+Inf'], histogram['buckets']):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+    lines.append(f'{name}_sum{_labels(**labels)} {histogram["sum"]}')
+    lines.append(f'{name}_count{_labels(**labels)} {histogram["count"]}')
+
+
+def render_prometheus():
+    """All workers' metrics in the Prometheus text exposition format (0.0.4)"""
+    data = aggregate(metrics.collect())
+    buckets = data['buckets']
+    p = METRIC_PREFIX
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    header(f'{p}_http_request_duration_seconds', 'histogram', 'Request latency by route.')
+    for stats in data['routes'].values():
+        _render_histogram(
+            lines, f'{p}_http_request_duration_seconds',
+            {'method': stats['method'], 'route': stats['route']}, stats['latency'], buckets
+        )
+    for name, key, help_text in (
+        ('http_request_errors_total', 'errors', 'Requests answered with a 5xx status.'),
+        ('db_queries_total', 'db_queries', 'Database queries run while serving requests.'),
+        ('db_query_duration_seconds_total', 'db_time', 'Time spent in database queries while serving requests.'),
+    ):
+        header(f'{p}_{name}', 'counter', help_text)
+        for stats in data['routes'].values():
+            lines.append(f'{p}_{name}{_labels(method=stats["method"], route=stats["route"])} {stats[key]}')
+
+    header(f'{p}_cache_requests_total', 'counter', 'Cache lookups by result.')
+    for name, counts in data['caches'].items():
+        lines.append(f'{p}_cache_requests_total{_labels(cache=name, result="hit")} {counts["hits"]}')
+        lines.append(f'{p}_cache_requests_total{_labels(cache=name, result="miss")} {counts["misses"]}')
+
+    header(f'{p}_external_call_duration_seconds', 'histogram', 'External service call latency.')
+    for service, stats in data['external'].items():
+        _render_histogram(lines, f'{p}_external_call_duration_seconds', {'service': service}, stats['latency'], buckets)
+    header(f'{p}_external_call_errors_total', 'counter', 'External service calls that raised.')
+    for service, stats in data['external'].items():
+        lines.append(f'{p}_external_call_errors_total{_labels(service=service)} {stats["errors"]}')
+
+    for name, kind, key, help_text in (
+        ('process_cpu_seconds_total', 'counter', 'cpu_seconds', 'CPU time used by the worker.'),
+        ('process_cpu_percent', 'gauge', 'cpu_percent', 'Recent CPU use of the worker.'),
+        ('process_resident_memory_bytes', 'gauge', 'rss_bytes', 'Resident memory of the worker.'),
+        ('http_requests_in_flight', 'gauge', 'in_flight', 'Requests being served by the worker.'),
+    ):
+        header(f'{p}_{name}', kind, help_text)
+        for worker in data['workers']:
+            if worker[key] is not None:
+                lines.append(f'{p}_{name}{_labels(worker=worker["worker"])} {worker[key]}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,113 @@
+"""
+Request instrumentation: the metrics registry (api/metrics.py) and the
+opt-in SQL profiler (api/query_profiler.py)
+"""
+
+import logging
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .metrics import metrics
+from .query_profiler import QueryProfile, get_query_profiler_config
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """connection.execute_wrapper counting queries and their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status and database work per route
+
+    Requests are labelled with their URL pattern (e.g. 'api/patients/<int:pk>/')
+    rather than the path, so the number of series stays bounded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = metrics.enabled
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        wrappers = []
+        for alias in connections:
+            wrapper = connections[alias].execute_wrapper(counter)
+            wrapper.__enter__()
+            wrappers.append(wrapper)
+
+        metrics.request_started()
+        started = time.perf_counter()
+        status_code = 500
+        try:
+            response = self.get_response(request)
+            status_code = response.status_code
+            return response
+        finally:
+            duration = time.perf_counter() - started
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+            match = getattr(request, 'resolver_match', None)
+            route = match.route if match and match.route else 'unmatched'
+            metrics.observe_request(request.method, route, status_code, duration, counter.count, counter.duration)
+
+
+class QueryProfilerMiddleware:
+    """
+    Records every query of profiled requests and reports them in response headers
+
+    A request is profiled when QUERY_PROFILER['enabled'] is set, or when it
+    carries the profiler header and the user turns out to be staff. Other
+    requests only pay for a header lookup.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_query_profiler_config()
+        self.header = 'HTTP_' + self.config['header'].upper().replace('-', '_')
+
+    def __call__(self, request):
+        always = self.config['enabled']
+        if not always and self.header not in request.META:
+            return self.get_response(request)
+
+        profile = QueryProfile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(profile))
+            response = self.get_response(request)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        # Token users are only known once the view has authenticated them
+        user = getattr(request, 'user', None)
+        is_staff = bool(user is not None and user.is_authenticated and (user.is_staff or user.is_superuser))
+        if not (always or is_staff):
+            return response
+
+        for name, value in profile.headers(self.config).items():
+            response[name] = value
+        if duration_ms >= self.config['slow_request_ms'] or profile.count > self.config['slow_query_count']:
+            logger.warning(
+                f"Slow request {request.method} {request.path}: {duration_ms:.0f} ms, "
+                f"{profile.count} queries in {profile.duration * 1000:.0f} ms\n{profile.report(self.config)}"
+            )
+        return response
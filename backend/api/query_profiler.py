@@ -0,0 +1,122 @@
+"""
+Per-request SQL profiling
+
+QueryProfilerMiddleware (api/middleware.py) records every query of a request
+when QUERY_PROFILER['enabled'] is set, or when a staff user sends the
+QUERY_PROFILER['header'] request header. Queries are grouped by fingerprint
+(the SQL with literals and placeholder lists collapsed), so a statement run
+once per row of a listing shows up as one fingerprint with a high count: the
+usual N+1 pattern.
+
+Profiled responses carry:
+
+    X-Query-Count        number of queries
+    X-Query-Time-Ms      total time spent in the database
+    X-Query-Duplicates   fingerprint=count for statements repeated at least
+                         duplicate_threshold times, most repeated first
+
+Requests slower than slow_request_ms, or with more than slow_query_count
+queries, are logged with their top queries and duplicates.
+"""
+
+import hashlib
+import re
+import time
+
+from django.conf import settings
+
+
+def get_query_profiler_config():
+    """QUERY_PROFILER settings with defaults"""
+    config = {
+        'enabled': False,
+        'header': 'X-Profile-Queries',
+        'duplicate_threshold': 3,
+        'slow_request_ms': 1000,
+        'slow_query_count': 50,
+        'top_queries': 5,
+        'max_header_fingerprints': 10,
+    }
+    config.update(getattr(settings, 'QUERY_PROFILER', {}))
+    return config
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """SQL with literals replaced and IN (...) lists collapsed"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()[:12]
+
+
+class QueryProfile:
+    """
+    connection.execute_wrapper recording the queries of one request
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # fingerprint -> [count, total seconds, sample SQL]
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            key = fingerprint(sql)
+            statement = self.statements.get(key)
+            if statement is None:
+                self.statements[key] = [1, elapsed, sql]
+            else:
+                statement[0] += 1
+                statement[1] += elapsed
+
+    def duplicates(self, threshold):
+        """[(fingerprint, count, seconds, sql)] of statements run at least threshold times"""
+        return sorted(
+            ((key, count, seconds, sql) for key, (count, seconds, sql) in self.statements.items() if count >= threshold),
+            key=lambda item: (-item[1], -item[2])
+        )
+
+    def top(self, limit):
+        """Statements taking the most total time"""
+        return sorted(
+            ((key, count, seconds, sql) for key, (count, seconds, sql) in self.statements.items()),
+            key=lambda item: -item[2]
+        )[:limit]
+
+    def headers(self, config):
+        duplicates = self.duplicates(config['duplicate_threshold'])[:config['max_header_fingerprints']]
+        return {
+            'X-Query-Count': str(self.count),
+            'X-Query-Time-Ms': f'{self.duration * 1000:.2f}',
+            'X-Query-Duplicates': ','.join(f'{key}={count}' for key, count, _, _ in duplicates),
+        }
+
+    def report(self, config):
+        """Multi-line summary for the slow request log"""
+        lines = ['Top queries:']
+        for key, count, seconds, sql in self.top(config['top_queries']):
+            lines.append(f'  [{key}] x{count} {seconds * 1000:.2f} ms: {normalize_sql(sql)[:500]}')
+        duplicates = self.duplicates(config['duplicate_threshold'])
+        if duplicates:
+            lines.append('Repeated queries (possible N+1):')
+            for key, count, seconds, sql in duplicates:
+                lines.append(f'  [{key}] x{count} {seconds * 1000:.2f} ms: {normalize_sql(sql)[:500]}')
+        return '\n'.join(lines)
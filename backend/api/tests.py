@@ -1,3 +1,462 @@
-from django.test import TestCase
+"""
+Query budget regression tests for the API endpoints
 
-# Create your tests here.
+Every endpoint routed through medixscan_project/urls.py, accounts/urls.py,
+accounts/rbac_urls.py, reports/urls.py, api/urls.py and
+patient_management/urls.py either has an entry in ENDPOINT_BUDGETS or is
+listed in UNBUDGETED_ROUTES with the reason it cannot run here. Each budgeted
+endpoint is called once against realistic data volumes, must answer with its
+expected status and must stay within its maximum query count and wall time.
+A failure lists the request's top and repeated query fingerprints (see
+api/query_profiler.py).
+
+Budgets are measured on a cold cache. To re-baseline after an intended
+change, run with QUERY_BUDGET_REPORT=1 to print every endpoint's figures.
+Wall time budgets scale with QUERY_BUDGET_TIME_FACTOR for slow machines.
+"""
+
+import os
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import URLResolver, get_resolver, resolve
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.models import AuditLog, Permission, Role, RolePermission, User, UserRole
+from accounts.rbac_models import (
+    RBACRole, RegistrationNotification, RoleAssignment, UserActivityLog, UserSecurityProfile, UserSession
+)
+from patient_management.models import Patient, PatientAuditLog, PatientExportJob, PatientNote
+from reports.models import ReportAnalysis
+
+from .query_profiler import QueryProfile, get_query_profiler_config
+
+DEFAULT_MAX_MS = 2000
+TIME_FACTOR = float(os.environ.get('QUERY_BUDGET_TIME_FACTOR', 1))
+REPORT = bool(os.environ.get('QUERY_BUDGET_REPORT'))
+
+# Data volumes seeded for every run
+USER_COUNT = 40
+PATIENT_COUNT = 150
+NOTES_PER_PATIENT = 2
+ACTIVITY_LOG_COUNT = 300
+AUDIT_LOG_COUNT = 200
+NOTIFICATION_COUNT = 30
+
+# Route URL modules covered by the suite
+URL_MODULES = (
+    'medixscan_project.urls', 'accounts.urls', 'accounts.rbac_urls',
+    'reports.urls', 'api.urls', 'patient_management.urls',
+)
+
+# Statuses a budgeted call must return, so an early 4xx cannot pass its budget
+DEFAULT_EXPECTED_STATUS = (200, 201)
+
+EndpointBudget = namedtuple(
+    'EndpointBudget', 'name method path max_queries max_ms user data expected_status',
+    defaults=(DEFAULT_MAX_MS, 'admin', None, DEFAULT_EXPECTED_STATUS)
+)
+
+# Paths are formatted with the ids of the seeded objects (see seed_data)
+ENDPOINT_BUDGETS = [
+    # medixscan_project/urls.py
+    EndpointBudget('ping', 'get', '/ping/', 2),
+    EndpointBudget('status', 'get', '/status/', 2),
+    EndpointBudget('simple_debug', 'get', '/simple/', 2),
+    EndpointBudget('home', 'get', '/', 2),
+    EndpointBudget('health', 'get', '/health/', 3),
+    EndpointBudget('test_endpoint', 'get', '/test/', 2),
+
+    # accounts/urls.py
+    EndpointBudget('auth_register', 'post', '/api/auth/register/', 10, user=None, data={
+        'username': 'new_doctor', 'email': 'new.doctor@example.com', 'password': 'New-pass-12345',
+        'password_confirm': 'New-pass-12345', 'first_name': 'New', 'last_name': 'Doctor',
+    }),
+    EndpointBudget('auth_login', 'post', '/api/auth/login/', 8, user=None, data={
+        'email': 'doctor0@example.com', 'password': 'doctor-pass-123',
+    }),
+    EndpointBudget('auth_simple_login', 'post', '/api/auth/simple-login/', 5, user=None, data={
+        'email': 'doctor0@example.com', 'password': 'doctor-pass-123',
+    }),
+    EndpointBudget('auth_logout', 'post', '/api/auth/logout/', 7, user='doctor'),
+    EndpointBudget('auth_emergency_status', 'get', '/api/auth/emergency/status/', 3),
+    EndpointBudget('auth_profile', 'get', '/api/auth/profile/', 3, user='doctor'),
+    EndpointBudget('auth_change_password', 'post', '/api/auth/change-password/', 4, user='doctor', data={
+        'current_password': 'doctor-pass-123', 'new_password': 'Changed-pass-12345',
+    }),
+    EndpointBudget('auth_dashboard', 'get', '/api/auth/dashboard/', 6, user='doctor'),
+    EndpointBudget('auth_create_doctor', 'post', '/api/auth/create-doctor/', 16, data={
+        'username': 'created_doctor', 'email': 'created.doctor@example.com', 'password': 'Created-pass-12345',
+        'password_confirm': 'Created-pass-12345', 'first_name': 'Created', 'last_name': 'Doctor',
+    }),
+    EndpointBudget('auth_assign_role', 'post', '/api/auth/assign-role/', 11, data={
+        'user_id': '{doctor}', 'role_name': 'DOCTOR',
+    }),
+    EndpointBudget('auth_assign_permission', 'post', '/api/auth/assign-permission/', 13, data={
+        'user_id': '{doctor}', 'permission_codename': 'upload_scan',
+    }),
+    EndpointBudget('auth_upload_scan', 'post', '/api/auth/upload-scan/', 5, user='doctor'),
+    EndpointBudget('auth_view_report', 'get', '/api/auth/view-report/', 5, user='doctor'),
+    EndpointBudget('auth_users', 'get', '/api/auth/users/', 7),
+    EndpointBudget('auth_user_detail', 'get', '/api/auth/users/{doctor}/', 12),
+    EndpointBudget('auth_roles', 'get', '/api/auth/roles/', 11),
+    EndpointBudget('auth_role_detail', 'get', '/api/auth/roles/{legacy_role}/', 6),
+    EndpointBudget('auth_permissions', 'get', '/api/auth/permissions/', 6),
+    EndpointBudget('auth_permission_detail', 'get', '/api/auth/permissions/{permission}/', 5),
+    EndpointBudget('auth_audit_logs', 'get', '/api/auth/audit-logs/', 6),
+    EndpointBudget('auth_audit_log_detail', 'get', '/api/auth/audit-logs/{audit_log}/', 5),
+    EndpointBudget('auth_api_root', 'get', '/api/auth/', 2),
+
+    # accounts/rbac_urls.py
+    EndpointBudget('rbac_dashboard_stats', 'get', '/api/rbac/dashboard/stats/', 7),
+    EndpointBudget('rbac_users', 'get', '/api/rbac/users/', 6),
+    EndpointBudget('rbac_users_bulk', 'post', '/api/rbac/users/bulk/', 5, data={
+        'operation': 'deactivate', 'user_ids': '{user_ids}',
+    }),
+    EndpointBudget('rbac_roles', 'get', '/api/rbac/roles/', 5),
+    EndpointBudget('rbac_role_detail', 'get', '/api/rbac/roles/{rbac_role}/', 5),
+    EndpointBudget('rbac_activity_logs', 'get', '/api/rbac/activity-logs/', 4),
+    EndpointBudget('rbac_activity_logs_cursor', 'get', '/api/rbac/activity-logs/?pagination=cursor', 4),
+    EndpointBudget('rbac_security_monitoring', 'get', '/api/rbac/security-monitoring/', 7),
+    EndpointBudget('rbac_registration_notifications', 'get', '/api/rbac/notifications/registrations/', 5),
+    EndpointBudget('rbac_approve_registration', 'post',
+                   '/api/rbac/notifications/registrations/{notification}/approve/', 8),
+    EndpointBudget('rbac_reject_registration', 'post',
+                   '/api/rbac/notifications/registrations/{notification}/reject/', 4,
+                   data={'reason': 'Incomplete license details'}),
+    EndpointBudget('rbac_delete_notification', 'delete',
+                   '/api/rbac/notifications/registrations/{notification}/', 4),
+    EndpointBudget('rbac_notification_stats', 'get', '/api/rbac/notifications/stats/', 4),
+
+    # reports/urls.py
+    EndpointBudget('reports_history', 'get', '/api/reports/history/', 2, user='doctor'),
+    EndpointBudget('reports_download', 'get', '/api/reports/download/{report}/', 2, user='doctor'),
+    EndpointBudget('reports_templates', 'get', '/api/reports/templates/', 2, user='doctor'),
+    EndpointBudget('reports_analytics', 'get', '/api/reports/analytics/', 2, user='doctor'),
+    EndpointBudget('reports_config', 'get', '/api/reports/config/', 2),
+    EndpointBudget('reports_config_update', 'post', '/api/reports/config/update/', 2, data={}),
+    EndpointBudget('reports_config_templates', 'get', '/api/reports/config/templates/', 2),
+    EndpointBudget('reports_config_validate', 'post', '/api/reports/config/validate/', 2, data={}),
+
+    # api/urls.py
+    EndpointBudget('api_test', 'get', '/api/test/', 2),
+    EndpointBudget('api_health', 'get', '/api/health/', 3),
+    EndpointBudget('api_version', 'get', '/api/version/', 2),
+    EndpointBudget('api_metrics', 'get', '/api/metrics/', 2),
+    EndpointBudget('api_history', 'get', '/api/history/', 2, user='doctor'),
+    EndpointBudget('api_dashboard_stats', 'get', '/api/rbac/dashboard-stats/', 10),
+    EndpointBudget('api_users_advanced', 'get', '/api/rbac/users/advanced/', 7),
+    EndpointBudget('api_create_advanced_user', 'post', '/api/rbac/users/create-advanced/', 11, data={
+        'username': 'advanced_doctor', 'email': 'advanced.doctor@example.com', 'password': 'Advanced-pass-12345',
+        'first_name': 'Advanced', 'last_name': 'Doctor', 'roles': ['{legacy_role}'],
+    }),
+    EndpointBudget('api_bulk_update_users', 'post', '/api/rbac/users/bulk-update/', 5, data={
+        'user_ids': '{user_ids}', 'updates': {'department': 'Radiology'},
+    }),
+    # One query per table in the delete cascade, whatever the number of users
+    EndpointBudget('api_bulk_delete_users', 'post', '/api/rbac/users/bulk-delete/', 44, data={
+        'user_ids': '{user_ids}',
+    }),
+    EndpointBudget('api_system_metrics', 'get', '/api/rbac/system-metrics/', 4),
+    EndpointBudget('api_online_users', 'get', '/api/rbac/online-users/', 7),
+    EndpointBudget('api_security_events', 'get', '/api/rbac/security-events/', 4),
+
+    # patient_management/urls.py
+    EndpointBudget('patients', 'get', '/api/patients/', 4, user='doctor'),
+    EndpointBudget('patients_admin', 'get', '/api/patients/', 3),
+    EndpointBudget('patients_cursor', 'get', '/api/patients/?pagination=cursor', 3, user='doctor'),
+    EndpointBudget('patient_create', 'post', '/api/patients/', 3, user='doctor', data={
+        'first_name': 'Ada', 'last_name': 'Budget', 'date_of_birth': '1980-04-02', 'gender': 'FEMALE',
+        'phone': '+15550109999', 'email': 'ada.budget@example.com',
+        'emergency_contact_name': 'Grace Budget', 'emergency_contact_phone': '+15550108888',
+    }),
+    EndpointBudget('patient_bulk_actions', 'post', '/api/patients/bulk_actions/', 7, user='doctor', data={
+        'action': 'update_priority', 'patient_ids': '{patient_ids}', 'data': {'priority': 'HIGH'},
+    }),
+    EndpointBudget('patient_dashboard_stats', 'get', '/api/patients/dashboard_stats/', 4, user='doctor'),
+    EndpointBudget('patient_export', 'post', '/api/patients/export/', 2, user='doctor', data={
+        'format': 'csv',
+    }),
+    EndpointBudget('patient_export_job', 'get', '/api/patients/export-jobs/{export_job}/', 3, user='doctor'),
+    EndpointBudget('patient_search', 'get', '/api/patients/search/?q=Patient', 4, user='doctor'),
+    EndpointBudget('patient_detail', 'get', '/api/patients/{patient}/', 3, user='doctor'),
+    EndpointBudget('patient_update', 'patch', '/api/patients/{patient}/', 4, user='doctor', data={
+        'priority': 'LOW', 'emergency_contact_name': 'Grace Budget', 'emergency_contact_phone': '+15550108888',
+    }),
+    EndpointBudget('patient_delete', 'delete', '/api/patients/{patient}/', 5, user='doctor'),
+    EndpointBudget('patient_notes', 'get', '/api/patients/{patient}/notes/', 6, user='doctor'),
+    EndpointBudget('patient_add_note', 'post', '/api/patients/{patient}/notes/', 4, user='doctor', data={
+        'title': 'Follow-up', 'content': 'Repeat imaging in six weeks.',
+    }),
+    EndpointBudget('patients_api_root', 'get', '/api/', 2),
+]
+
+# Routes not called by the suite, by URL pattern
+UNBUDGETED_ROUTES = {
+    'api/auth/emergency-login/': 'creates or resets hard-coded admin accounts',
+    'api/auth/emergency/approve-admin/': 'creates or resets hard-coded admin accounts',
+    'api/auth/emergency/diagnostic/': 'creates or resets hard-coded admin accounts',
+    'api/auth/emergency/login-test/': 'creates or resets hard-coded admin accounts',
+    'api/auth/token/refresh/': 'needs a signed refresh token (AUTH_SIGNED_TOKENS)',
+    'api/reports/analyze/': 'calls the OpenAI API',
+    'api/reports/vocabulary/': 'loads the external medical vocabulary sources',
+    'api/reports/rag-update/': 'scrapes external RAG sources',
+    'api/reports/test-rag/': 'scrapes external RAG sources',
+    'api/reports/test-free-terminology/': 'queries external terminology services',
+    'api/reports/list-sources/': 'queries external terminology services',
+    'api/auth/login/': 'shadowed by accounts/urls.py (api/auth/login/)',
+    'api/auth/logout/': 'shadowed by accounts/urls.py (api/auth/logout/)',
+    'api/auth/register/': 'shadowed by accounts/urls.py (api/auth/register/)',
+    'api/^patients/bulk-import/$': 'needs an uploaded CSV file',
+    'api/^patients/export-jobs/(?P<job_id>[0-9a-fA-F-]+)/download/$': 'needs a completed export file',
+    '^media/(?P<path>.*)$': 'static file serving (DEBUG only)',
+    '^static/(?P<path>.*)$': 'static file serving (DEBUG only)',
+}
+
+
+def seed_data():
+    """Realistic volumes of users, roles, patients and logs; returns the ids used in paths"""
+    now = timezone.now()
+    admin = User.objects.create_superuser(
+        username='admin', email='admin@example.com', password='admin-pass-123', full_name='Budget Admin',
+        is_approved=True
+    )
+    UserSecurityProfile.objects.create(user=admin, account_status='active')
+
+    legacy_roles = [
+        Role.objects.create(name=name, display_name=label) for name, label in Role.ROLE_CHOICES
+    ]
+    permissions = [
+        Permission.objects.create(
+            name=f'{category} permission {index}', codename=f'{category.lower()}_{index}', category=category
+        )
+        for category, _ in Permission.PERMISSION_CATEGORIES for index in range(4)
+    ]
+    # Checked by the upload-scan and view-report endpoints
+    scan_permissions = [
+        Permission.objects.create(name=codename.replace('_', ' ').title(), codename=codename, category='SCAN')
+        for codename in ('upload_scan', 'view_report')
+    ]
+    RolePermission.objects.bulk_create(
+        RolePermission(role=role, permission=permission)
+        for role in legacy_roles for permission in permissions[::2] + scan_permissions
+    )
+    superuser_role, doctor_role, technician_role = legacy_roles[:3]
+    UserRole.objects.create(user=admin, role=superuser_role)
+
+    parent = None
+    rbac_roles = []
+    for level, name in enumerate(['chief', 'senior_radiologist', 'radiologist', 'resident', 'technician', 'viewer']):
+        parent = RBACRole.objects.create(
+            name=name, display_name=name.replace('_', ' ').title(), security_level=level + 1, parent_role=parent
+        )
+        rbac_roles.append(parent)
+
+    users = []
+    for index in range(USER_COUNT):
+        user = User.objects.create_user(
+            username=f'doctor{index}', email=f'doctor{index}@example.com', password='doctor-pass-123',
+            first_name='Doctor', last_name=f'Number{index}', full_name=f'Doctor Number{index}',
+            is_approved=True
+        )
+        users.append(user)
+    UserSecurityProfile.objects.bulk_create(
+        UserSecurityProfile(user=user, account_status='active') for user in users
+    )
+    UserRole.objects.bulk_create(
+        UserRole(user=user, role=technician_role if index % 4 == 3 else doctor_role)
+        for index, user in enumerate(users)
+    )
+    RoleAssignment.objects.bulk_create(
+        RoleAssignment(user=user, role=rbac_roles[index % len(rbac_roles)], status='active')
+        for index, user in enumerate(users)
+    )
+    UserSession.objects.bulk_create(
+        UserSession(
+            session_key=f'{index:040d}', user=user, ip_address='10.0.0.1', user_agent='budget',
+            expires_at=now + timedelta(minutes=30)
+        )
+        for index, user in enumerate(users[:10])
+    )
+
+    activity_types = ['login', 'logout', 'view', 'update']
+    UserActivityLog.objects.bulk_create(
+        UserActivityLog(
+            user=users[index % USER_COUNT], activity_type=activity_types[index % 4],
+            action=f'Action {index}', description=f'Activity number {index}', ip_address='10.0.0.2',
+            severity='high' if index % 25 == 0 else 'low', success=index % 10 != 0,
+        )
+        for index in range(ACTIVITY_LOG_COUNT)
+    )
+    AuditLog.objects.bulk_create(
+        AuditLog(user=users[index % USER_COUNT], action='UPDATE', resource_type='patient',
+                 resource_id=str(index), ip_address='10.0.0.3')
+        for index in range(AUDIT_LOG_COUNT)
+    )
+    notifications = RegistrationNotification.objects.bulk_create(
+        RegistrationNotification(
+            first_name='Applicant', last_name=f'Number{index}', email=f'applicant{index}@example.com',
+            medical_license=f'LIC-{index}', status=['pending', 'approved', 'rejected'][index % 3]
+        )
+        for index in range(NOTIFICATION_COUNT)
+    )
+
+    doctor = users[0]
+    Token.objects.create(user=doctor)
+    patients = []
+    for index in range(PATIENT_COUNT):
+        patients.append(Patient(
+            doctor=doctor if index % 2 == 0 else users[index % USER_COUNT],
+            first_name='Patient', last_name=f'Number{index}', date_of_birth=date(1950 + index % 50, 1 + index % 12, 1),
+            gender='MALE' if index % 2 else 'FEMALE', phone=f'+155501{index:04d}', phone_digits=f'155501{index:04d}',
+            email=f'patient{index}@example.com', emergency_contact_name=f'Contact Number{index}',
+            emergency_contact_phone='+15550100000',
+        ))
+    Patient.objects.bulk_create(patients)
+    PatientNote.objects.bulk_create(
+        PatientNote(patient=patient, created_by=patient.doctor, title=f'Note {index}', content='Stable.')
+        for patient in patients for index in range(NOTES_PER_PATIENT)
+    )
+    PatientAuditLog.objects.bulk_create(
+        PatientAuditLog(patient=patient, user=patient.doctor, action='VIEW') for patient in patients
+    )
+    export_job = PatientExportJob.objects.create(
+        requested_by=doctor, fingerprint='0' * 64, export_format='csv', status='COMPLETED'
+    )
+    ReportAnalysis.objects.bulk_create(
+        ReportAnalysis(user=doctor, original_text=f'Report {index}', status='completed') for index in range(20)
+    )
+    report = ReportAnalysis.objects.filter(user=doctor).first()
+    own_patients = [patient for patient in patients if patient.doctor_id == doctor.pk]
+
+    return {
+        'admin': admin,
+        'doctor': doctor,
+        'ids': {
+            'doctor': doctor.pk,
+            'user_ids': [user.pk for user in users[-5:]],
+            'legacy_role': doctor_role.pk,
+            'permission': permissions[0].pk,
+            'audit_log': AuditLog.objects.first().pk,
+            'rbac_role': rbac_roles[2].pk,
+            'notification': next(n for n in notifications if n.status == 'pending').pk,
+            'report': report.pk,
+            'export_job': export_job.pk,
+            'patient': own_patients[0].pk,
+            'patient_ids': [str(patient.pk) for patient in own_patients[:20]],
+        },
+    }
+
+
+def _format(value, ids):
+    """Substitute '{name}' placeholders in a path or request payload"""
+    if isinstance(value, str):
+        match = re.fullmatch(r'\{(\w+)\}', value)
+        if match:
+            found = ids[match.group(1)]
+            return found if isinstance(found, list) else str(found)
+        return value.format(**ids)
+    if isinstance(value, list):
+        return [_format(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {key: _format(item, ids) for key, item in value.items()}
+    return value
+
+
+def routes_under_test():
+    """URL patterns (as resolver_match.route) of the covered URL modules"""
+    def walk(patterns, prefix):
+        for pattern in patterns:
+            route = prefix + str(pattern.pattern)
+            if isinstance(pattern, URLResolver):
+                module = getattr(pattern.urlconf_name, '__name__', pattern.urlconf_name)
+                if module in URL_MODULES:
+                    yield from walk(pattern.url_patterns, route)
+            elif '(?P<format>' not in route:
+                # DRF's format suffix variants share their view with the plain route
+                yield route
+    return set(walk(get_resolver().url_patterns, '')) - set(UNBUDGETED_ROUTES)
+
+
+@override_settings(
+    # Presence writes are throttled per session, so they would land on whichever endpoint runs first
+    PRESENCE={'enabled': False},
+    CELERY_TASK_ALWAYS_EAGER=True,
+)
+class EndpointQueryBudgetTests(TestCase):
+    """Every endpoint stays within its query count and wall time budget"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seeded = seed_data()
+        cls.users = {'admin': seeded['admin'], 'doctor': seeded['doctor']}
+        cls.ids = seeded['ids']
+
+    def setUp(self):
+        cache.clear()
+        self.profiler_config = get_query_profiler_config()
+
+    def call(self, budget):
+        client = APIClient(HTTP_HOST='localhost')
+        user = self.users.get(budget.user)
+        if user is not None:
+            client.force_authenticate(user)
+            # Plain Django views (api/enhanced_rbac_api.py) use the session
+            client.force_login(user)
+        path = _format(budget.path, self.ids)
+        data = _format(budget.data, self.ids)
+
+        profile = QueryProfile()
+        wrappers = [connections[alias].execute_wrapper(profile) for alias in connections]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        started = timezone.now()
+        try:
+            response = getattr(client, budget.method)(path, data, format='json' if budget.method != 'get' else None)
+        finally:
+            elapsed_ms = (timezone.now() - started).total_seconds() * 1000
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+        return response, profile, elapsed_ms
+
+    def check_budget(self, budget):
+        response, profile, elapsed_ms = self.call(budget)
+        if REPORT:
+            print(f'{budget.name:36} {response.status_code} {profile.count:4} queries {elapsed_ms:8.1f} ms')
+        expected = budget.expected_status
+        if isinstance(expected, int):
+            expected = (expected,)
+        self.assertIn(
+            response.status_code, expected,
+            f'{budget.name} returned {response.status_code}, expected {" or ".join(map(str, expected))}'
+        )
+
+        max_ms = budget.max_ms * TIME_FACTOR
+        if profile.count > budget.max_queries or elapsed_ms > max_ms:
+            self.fail(
+                f'{budget.name} ({budget.method.upper()} {budget.path}) exceeded its budget: '
+                f'{profile.count} queries (max {budget.max_queries}), '
+                f'{elapsed_ms:.0f} ms (max {max_ms:.0f})\n{profile.report(self.profiler_config)}'
+            )
+
+    def test_every_route_is_budgeted(self):
+        budgeted = {resolve(_format(budget.path, self.ids).split('?')[0]).route for budget in ENDPOINT_BUDGETS}
+        missing = sorted(routes_under_test() - budgeted)
+        self.assertFalse(missing, f'Routes without a query budget (add to ENDPOINT_BUDGETS): {missing}')
+
+
+def _budget_test(budget):
+    def test(self):
+        self.check_budget(budget)
+    test.__doc__ = f'{budget.method.upper()} {budget.path} within {budget.max_queries} queries'
+    return test
+
+
+for _budget in ENDPOINT_BUDGETS:
+    setattr(EndpointQueryBudgetTests, f'test_{_budget.name}', _budget_test(_budget))
@@ -10,6 +10,7 @@ urlpatterns = [
     path('test/', views.TestAPIView.as_view(), name='test'),
     path('health/', views.HealthCheckView.as_view(), name='health'),
     path('version/', views.VersionView.as_view(), name='version'),
+    path('metrics/', views.PrometheusMetricsView.as_view(), name='metrics'),
     
     # Authentication endpoints (soft-coded)
     path('auth/login/', views.LoginView.as_view(), name='login'),
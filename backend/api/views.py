@@ -7,8 +7,12 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.utils import timezone
+from django.http import HttpResponse
+import hmac
 import openai
 
+from .metrics import get_metrics_config, render_prometheus
+
 class TestAPIView(APIView):
     """Test API endpoint"""
     permission_classes = [AllowAny]
@@ -46,6 +50,26 @@ class HealthCheckView(APIView):
             'timestamp': str(timezone.now())
         }, status=status.HTTP_200_OK)
 
+class PrometheusMetricsView(APIView):
+    """Metrics of all workers in the Prometheus text format"""
+    permission_classes = [AllowAny]
+
+    def has_scrape_token(self):
+        token = get_metrics_config()['prometheus_token']
+        header = self.request.META.get('HTTP_AUTHORIZATION', '')
+        return bool(token) and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode())
+
+    def get_authenticators(self):
+        # Scrapers send the configured bearer token instead of user credentials
+        if self.has_scrape_token():
+            return []
+        return super().get_authenticators()
+
+    def get(self, request):
+        if not self.has_scrape_token() and not request.user.is_superuser:
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 class VersionView(APIView):
     """API version endpoint"""
     permission_classes = [AllowAny]
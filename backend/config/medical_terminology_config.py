@@ -142,6 +142,20 @@ class MedicalTerminologyConfig:
             }
         }
         
+        # Basic definitions for built-in terms (lowercase keys)
+        self.TERM_DEFINITIONS = {
+            'lungs': 'Paired respiratory organs responsible for gas exchange',
+            'heart': 'Muscular organ that pumps blood throughout the body',
+            'liver': 'Large organ that processes nutrients and detoxifies blood',
+            'kidneys': 'Paired organs that filter blood and produce urine',
+            'brain': 'Central organ of the nervous system',
+            'mass': 'Abnormal tissue growth or collection of cells',
+            'lesion': 'Area of abnormal tissue change or damage',
+            'nodule': 'Small, rounded growth or mass of tissue',
+            'enhancement': 'Increased signal intensity after contrast administration',
+            'consolidation': 'Replacement of air in lung tissue with fluid or solid material'
+        }
+        
         # Source priority (higher number = higher priority)
         self.SOURCE_PRIORITY = {
             'ncbi_pubmed': 5,
@@ -156,12 +170,53 @@ class MedicalTerminologyConfig:
             'timeout': int(os.getenv('MEDICAL_API_TIMEOUT', '30')),
             'max_retries': int(os.getenv('MEDICAL_API_RETRIES', '3')),
             'cache_duration': int(os.getenv('MEDICAL_CACHE_DURATION', '3600')),  # 1 hour
-            'enable_caching': os.getenv('MEDICAL_ENABLE_CACHING', 'true').lower() == 'true'
+            'enable_caching': os.getenv('MEDICAL_ENABLE_CACHING', 'true').lower() == 'true',
+            # Coalesce concurrent PubMed queries into one esearch + esummary round trip
+            'pubmed_batching': os.getenv('MEDICAL_PUBMED_BATCHING', 'false').lower() == 'true',
+            'pubmed_batch_size': int(os.getenv('MEDICAL_PUBMED_BATCH_SIZE', '10')),
+            'pubmed_batch_window': float(os.getenv('MEDICAL_PUBMED_BATCH_WINDOW', '0.05')),  # seconds
+            # 'title' attributes combined-search hits to queries by title; 'exact'
+            # runs one esearch per query concurrently before the shared esummary
+            'pubmed_batch_attribution': os.getenv('MEDICAL_PUBMED_BATCH_ATTRIBUTION', 'title').lower()
+        }
+        
+        # Local terminology mirror (SQLite FTS5) loaded by the
+        # load_medical_terminology management command
+        self.LOCAL_TERMINOLOGY = {
+            'enabled': os.getenv('MEDICAL_LOCAL_TERMINOLOGY_ENABLED', 'true').lower() == 'true',
+            'db_path': os.getenv(
+                'MEDICAL_LOCAL_TERMINOLOGY_DB',
+                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'medical_terminology.sqlite3')
+            ),
+            # Network sources are only an enrichment tier once the local mirror is loaded
+            'network_enrichment': os.getenv('MEDICAL_NETWORK_ENRICHMENT', 'true').lower() == 'true',
+            'candidate_multiplier': int(os.getenv('MEDICAL_LOCAL_CANDIDATE_MULTIPLIER', '3'))
         }
         
         # User agent for API requests
         self.USER_AGENT = os.getenv('MEDICAL_USER_AGENT', 'MediXScan-RadiologyAI/1.0')
         
+        # Bumped whenever vocabularies, corrections or definitions change so
+        # that derived search indexes are rebuilt
+        self._vocabulary_version = 0
+    
+    @property
+    def vocabulary_version(self) -> int:
+        """Version stamp of the built-in vocabularies"""
+        return self._vocabulary_version
+    
+    def mark_vocabulary_changed(self):
+        """Signal that BUILTIN_VOCABULARIES, TERMINOLOGY_CORRECTIONS or
+        TERM_DEFINITIONS were modified in place"""
+        self._vocabulary_version += 1
+    
+    def add_builtin_terms(self, category: str, subcategory: str, terms: List[str]):
+        """Add terms to a built-in vocabulary subcategory"""
+        subcategories = self.BUILTIN_VOCABULARIES.setdefault(category, {})
+        existing = subcategories.setdefault(subcategory, [])
+        existing.extend(term for term in terms if term not in existing)
+        self.mark_vocabulary_changed()
+    
     def get_active_sources(self) -> Dict:
         """Get currently active and available sources"""
         active_sources = {}
@@ -1 +1,8 @@
 # MediXscan Django Project
+
+try:
+    from .celery import app as celery_app
+except ImportError:  # Celery is only required where background workers run
+    celery_app = None
+
+__all__ = ('celery_app',)
@@ -0,0 +1,16 @@
+"""
+Celery application for MediXscan background jobs
+
+Start a worker with: celery -A medixscan_project worker -l info
+and the periodic jobs with: celery -A medixscan_project beat -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medixscan_project.settings')
+
+app = Celery('medixscan_project')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
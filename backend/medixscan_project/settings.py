@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 import os
 from pathlib import Path
+from datetime import timedelta
 import environ
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -55,6 +56,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so latency and query counts cover the whole stack
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.QueryProfilerMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -62,6 +66,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.PresenceMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -193,7 +198,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -271,6 +276,15 @@ CORS_ALLOW_HEADERS = env.list('CORS_ALLOW_HEADERS', default=[
     'x-client-version',  # Custom header for API versioning
     'x-api-key',
     'cache-control',
+    'x-profile-queries',  # Staff SQL profiling (QUERY_PROFILER)
+])
+
+# Response headers readable by the frontend
+CORS_EXPOSE_HEADERS = env.list('CORS_EXPOSE_HEADERS', default=[
+    'x-total-count',
+    'x-query-count',
+    'x-query-time-ms',
+    'x-query-duplicates',
 ])
 
 # Soft-coded CORS methods configuration
@@ -295,6 +309,135 @@ AWS_SECRET_ACCESS_KEY = env('AWS_SECRET_ACCESS_KEY', default='')
 AWS_STORAGE_BUCKET_NAME = env('AWS_STORAGE_BUCKET_NAME', default='')
 AWS_S3_REGION_NAME = env('AWS_S3_REGION_NAME', default='us-east-1')
 
+# Redis (shared by background jobs and cross-worker state; empty disables)
+REDIS_URL = env('REDIS_URL', default='')
+
+# Shared cache: Redis when configured, so version-stamp invalidations reach
+# every worker process; per-process memory otherwise
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'api.cache_backends.InstrumentedRedisCache',
+            'LOCATION': env('CACHE_REDIS_URL', default=REDIS_URL),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'api.cache_backends.InstrumentedLocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': env.int('LOCMEM_CACHE_MAX_ENTRIES', default=10000)},
+        }
+    }
+
+# Process and request metrics (api/metrics.py): per-worker snapshots are shared
+# through Redis when configured, else as files in shared_dir (one host)
+METRICS = {
+    'enabled': env.bool('METRICS_ENABLED', default=True),
+    'backend': env('METRICS_BACKEND', default='auto'),  # auto, redis, file or local
+    'redis_url': env('METRICS_REDIS_URL', default=REDIS_URL),
+    'shared_dir': env('METRICS_SHARED_DIR', default=str(BASE_DIR / 'data' / 'metrics')),
+    'publish_interval': env.float('METRICS_PUBLISH_INTERVAL', default=10.0),  # seconds
+    'worker_ttl': env.int('METRICS_WORKER_TTL', default=60),  # seconds without a snapshot
+    # Bearer token for /api/metrics/ scrapers; superusers may always read it
+    'prometheus_token': env('METRICS_PROMETHEUS_TOKEN', default=''),
+}
+
+# Compiled user role/permission sets (accounts/permission_cache.py); also bounds
+# staleness across processes when the cache is not shared
+RBAC_PERMISSION_CACHE_TIMEOUT = env.int('RBAC_PERMISSION_CACHE_TIMEOUT', default=300)
+
+# RBAC dashboard and registration statistics (accounts/rbac_stats.py); short,
+# since time-based counts (today's logins, live sessions) are not signalled
+RBAC_STATS_CACHE_TIMEOUT = env.int('RBAC_STATS_CACHE_TIMEOUT', default=30)
+
+# Audit / activity log browsing (accounts/pagination.py): 'page' numbers by
+# default, (timestamp, id) cursors when 'cursor' or when a client passes
+# ?pagination=cursor; cursor pages report a 'none', 'estimate' or 'exact' total
+LOG_PAGINATION = {
+    'mode': env('LOG_PAGINATION_MODE', default='page'),
+    'page_size': env.int('LOG_PAGE_SIZE', default=50),
+    'max_page_size': env.int('LOG_MAX_PAGE_SIZE', default=200),
+    'total': env('LOG_CURSOR_TOTAL', default='estimate'),
+}
+
+# Per-request SQL profiler (api/query_profiler.py): on for every request when
+# enabled, otherwise for staff users sending the header
+QUERY_PROFILER = {
+    'enabled': env.bool('QUERY_PROFILER_ENABLED', default=False),
+    'header': env('QUERY_PROFILER_HEADER', default='X-Profile-Queries'),
+    'duplicate_threshold': env.int('QUERY_PROFILER_DUPLICATE_THRESHOLD', default=3),
+    'slow_request_ms': env.int('QUERY_PROFILER_SLOW_REQUEST_MS', default=1000),
+    'slow_query_count': env.int('QUERY_PROFILER_SLOW_QUERY_COUNT', default=50),
+    'top_queries': env.int('QUERY_PROFILER_TOP_QUERIES', default=5),
+}
+
+# Online users and active sessions (accounts/presence.py): Redis sorted sets
+# when a Redis URL is set, the user_sessions table otherwise
+PRESENCE = {
+    'enabled': env.bool('PRESENCE_ENABLED', default=True),
+    'redis_url': env('PRESENCE_REDIS_URL', default=REDIS_URL),
+    'throttle': env.int('PRESENCE_THROTTLE', default=60),  # seconds between updates per session
+    'online_window': env.int('PRESENCE_ONLINE_WINDOW', default=900),  # seconds
+    'session_timeout': env.int('PRESENCE_SESSION_TIMEOUT', default=1800),  # idle seconds
+    'local_max_entries': env.int('PRESENCE_LOCAL_MAX_ENTRIES', default=10000),
+}
+
+# Token -> user resolution cache (accounts/authentication.py)
+AUTH_TOKEN_CACHE = {
+    'timeout': env.int('AUTH_TOKEN_CACHE_TIMEOUT', default=300),  # shared cache, seconds
+    'local_timeout': env.int('AUTH_TOKEN_LOCAL_CACHE_TIMEOUT', default=30),  # per process, seconds
+    'local_max_entries': env.int('AUTH_TOKEN_LOCAL_CACHE_MAX_ENTRIES', default=1000),
+    'shared': env.bool('AUTH_TOKEN_CACHE_SHARED', default=bool(REDIS_URL)),
+    # Also accept signed simplejwt access tokens ("Bearer <token>"), issued at login;
+    # requires 'shared', so revocations reach every process
+    'signed_tokens': env.bool('AUTH_SIGNED_TOKENS', default=False),
+}
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=env.int('JWT_ACCESS_TOKEN_MINUTES', default=15)),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=env.int('JWT_REFRESH_TOKEN_DAYS', default=1)),
+    'UPDATE_LAST_LOGIN': False,
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.SignedTokenRefreshSerializer',
+}
+
+# Celery background workers (falls back to in-process threads without a broker)
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default=REDIS_URL)
+CELERY_TASK_ACKS_LATE = env.bool('CELERY_TASK_ACKS_LATE', default=True)
+CELERY_WORKER_PREFETCH_MULTIPLIER = env.int('CELERY_WORKER_PREFETCH_MULTIPLIER', default=1)
+CELERY_TASK_ALWAYS_EAGER = env.bool('CELERY_TASK_ALWAYS_EAGER', default=False)
+CELERY_BEAT_SCHEDULE = {
+    'purge-expired-sessions': {
+        'task': 'accounts.tasks.purge_expired_sessions',
+        'schedule': env.float('PRESENCE_PURGE_INTERVAL', default=900.0),  # seconds
+    },
+}
+
+# Audit log writer (accounts/audit.py): 'sync', 'buffered' or 'celery'
+AUDIT_LOG = {
+    'mode': env('AUDIT_LOG_MODE', default='buffered'),
+    'batch_size': env.int('AUDIT_LOG_BATCH_SIZE', default=200),
+    'flush_interval': env.float('AUDIT_LOG_FLUSH_INTERVAL', default=2.0),  # seconds
+    'max_buffer_size': env.int('AUDIT_LOG_MAX_BUFFER_SIZE', default=5000),
+    # Actions always written before the request continues
+    'sync_actions': env.list('AUDIT_LOG_SYNC_ACTIONS', default=[
+        'DELETE', 'PERMISSION_GRANT', 'PERMISSION_REVOKE', 'ROLE_ASSIGN', 'ROLE_REMOVE'
+    ]),
+}
+
+# Monthly audit table partitions (accounts/partitioning.py) and retention;
+# expired months are archived by `manage.py archive_audit_logs`
+AUDIT_PARTITIONING = {
+    'months_ahead': env.int('AUDIT_PARTITION_MONTHS_AHEAD', default=3),
+    # Months kept per model; 0 keeps everything
+    'retention_months': {
+        'accounts.AuditLog': env.int('AUDIT_LOG_RETENTION_MONTHS', default=24),
+        'accounts.UserActivityLog': env.int('USER_ACTIVITY_LOG_RETENTION_MONTHS', default=24),
+        'patient_management.PatientAuditLog': env.int('PATIENT_AUDIT_LOG_RETENTION_MONTHS', default=84),
+    },
+    'archive_dir': env('AUDIT_ARCHIVE_DIR', default=str(BASE_DIR / 'data' / 'audit_archive')),
+    'compress_level': env.int('AUDIT_ARCHIVE_COMPRESS_LEVEL', default=6),
+    'chunk_size': env.int('AUDIT_ARCHIVE_CHUNK_SIZE', default=5000),
+}
+
 # RAG Configuration - Soft Coding Approach
 RAG_SOURCES = {
     'radiologyassistant': {
@@ -358,7 +501,11 @@ RAG_CACHE = {
     'vocabulary_timeout': env('RAG_VOCAB_CACHE_TIMEOUT', default=3600, cast=int),  # 1 hour
     'content_timeout': env('RAG_CONTENT_CACHE_TIMEOUT', default=86400, cast=int),  # 24 hours
     'max_cache_size': env('RAG_MAX_CACHE_SIZE', default=1000, cast=int),
-    'cache_prefix': env('RAG_CACHE_PREFIX', default='rag_')
+    'cache_prefix': env('RAG_CACHE_PREFIX', default='rag_'),
+    'stale_timeout': env('RAG_CONTENT_STALE_TIMEOUT', default=604800, cast=int),  # serve stale for up to 7 days
+    'early_expiration_beta': env('RAG_EARLY_EXPIRATION_BETA', default=1.0, cast=float),
+    'refresh_lock_timeout': env('RAG_REFRESH_LOCK_TIMEOUT', default=900, cast=int),  # 15 minutes
+    'refresh_wait_timeout': env('RAG_REFRESH_WAIT_TIMEOUT', default=30, cast=int)
 }
 
 RAG_ANALYSIS = {
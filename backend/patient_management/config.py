@@ -19,7 +19,15 @@ class PatientConfig:
         'max_page_size': int(os.getenv('PATIENT_MAX_PAGE_SIZE', '100')),
         'search_fields': ['first_name', 'last_name', 'email', 'phone'],
         'ordering_fields': ['created_at', 'updated_at', 'last_name', 'first_name', 'date_of_birth'],
-        'default_ordering': ['-created_at']
+        'default_ordering': ['-created_at'],
+        # 'auto' uses pg_trgm indexed search on PostgreSQL, 'basic' forces icontains scans
+        'search_mode': os.getenv('PATIENT_SEARCH_MODE', 'auto'),
+        'search_rank_results': os.getenv('PATIENT_SEARCH_RANK', 'True').lower() == 'true',
+        # 'page' (page numbers) or 'cursor' (keyset); clients may also opt in with ?pagination=cursor
+        'pagination_mode': os.getenv('PATIENT_PAGINATION_MODE', 'page'),
+        'cursor_ordering': ['-created_at', '-id'],
+        # Total returned with cursor pages: 'none', 'estimate' or 'exact'
+        'cursor_total': os.getenv('PATIENT_CURSOR_TOTAL', 'none')
     }
     
     # Patient Status Configuration
@@ -72,11 +80,15 @@ class PatientConfig:
             'dashboard_stats': 'dashboard-stats/',
             'search': 'search/',
             'export': 'export/',
-            'bulk_actions': 'bulk-actions/'
+            'bulk_actions': 'bulk-actions/',
+            'bulk_import': 'bulk-import/'
         },
         'allowed_methods': ['GET', 'POST', 'PUT', 'PATCH', 'DELETE'],
         'authentication_required': True,
-        'permission_classes': ['IsAuthenticated']
+        'permission_classes': ['IsAuthenticated'],
+        'import_batch_size': int(os.getenv('PATIENT_IMPORT_BATCH_SIZE', '2000')),
+        'import_max_errors': int(os.getenv('PATIENT_IMPORT_MAX_ERRORS', '1000')),  # row errors listed in the report
+        'bulk_action_chunk_size': int(os.getenv('PATIENT_BULK_ACTION_CHUNK_SIZE', '1000'))
     }
     
     # Validation Rules
@@ -108,9 +120,16 @@ class PatientConfig:
             'MEDICAL_REPORTS': 'Medical Reports Summary',
             'ANALYTICS': 'Patient Analytics'
         },
-        'export_formats': ['PDF', 'CSV', 'EXCEL', 'JSON'],
+        'export_formats': ['PDF', 'CSV', 'EXCEL', 'JSON', 'NDJSON'],
         'max_records_per_report': int(os.getenv('REPORT_MAX_RECORDS', '1000')),
-        'cache_duration': int(os.getenv('REPORT_CACHE_DURATION', '3600'))  # seconds
+        'cache_duration': int(os.getenv('REPORT_CACHE_DURATION', '3600')),  # seconds
+        'export_chunk_size': int(os.getenv('EXPORT_CHUNK_SIZE', '2000')),  # rows fetched and encoded per chunk
+        # Background export jobs
+        'export_job_formats': ['csv', 'ndjson'],
+        'export_job_dir': os.getenv('EXPORT_JOB_DIR', os.path.join(settings.BASE_DIR, 'data', 'patient_exports')),
+        'export_job_chunk_size': int(os.getenv('EXPORT_JOB_CHUNK_SIZE', '5000')),
+        'export_job_compress_level': int(os.getenv('EXPORT_JOB_COMPRESS_LEVEL', '6')),
+        'export_job_stale_after': int(os.getenv('EXPORT_JOB_STALE_AFTER', '600'))  # seconds without progress
     }
     
     # Dashboard Configuration
@@ -152,7 +171,11 @@ class PatientConfig:
                 'max_items': 10
             }
         },
-        'refresh_interval': int(os.getenv('DASHBOARD_REFRESH_INTERVAL', '300'))  # seconds
+        'refresh_interval': int(os.getenv('DASHBOARD_REFRESH_INTERVAL', '300')),  # seconds
+        'stats_cache_timeout': int(os.getenv('DASHBOARD_STATS_CACHE_TIMEOUT', '300')),  # seconds
+        # Used instead with a per-process cache (no REDIS_URL): invalidations from
+        # other workers never reach it, so this bounds how stale their changes look
+        'stats_local_cache_timeout': int(os.getenv('DASHBOARD_STATS_LOCAL_CACHE_TIMEOUT', '30'))  # seconds
     }
     
     # Theme Configuration
@@ -213,6 +236,16 @@ class PatientConfig:
         """Get search fields for API"""
         return cls.DATABASE['search_fields']
     
+    @classmethod
+    def get_search_mode(cls):
+        """Get patient text search mode ('auto' or 'basic')"""
+        return cls.DATABASE['search_mode']
+    
+    @classmethod
+    def get_pagination_mode(cls):
+        """Get default pagination mode ('page' or 'cursor')"""
+        return cls.DATABASE['pagination_mode']
+    
     @classmethod
     def get_ordering_fields(cls):
         """Get allowed ordering fields for API"""
@@ -0,0 +1,254 @@
+"""
+Background patient export jobs
+
+A job walks the filtered patients in (created_at, id) keyset order and appends
+each chunk to the output file as its own gzip member, so the file is a valid
+gzip stream after every chunk. The keyset position and byte offset of the
+last committed chunk are checkpointed on the job row; a resumed job truncates
+the file back to that offset and continues from the same position.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .config import PatientConfig
+from .exports import PatientExporter, filter_export_queryset
+from .models import Patient, PatientExportJob
+from .utils import PatientUtils
+
+logger = logging.getLogger(__name__)
+
+
+def export_fingerprint(user, export_format, fields, filters):
+    """
+    Stable hash identifying an export request, used to deduplicate jobs
+    """
+    payload = json.dumps(
+        {
+            'user': str(user.pk),
+            'isolated': PatientConfig.is_doctor_isolation_enabled(),
+            'format': export_format,
+            'fields': list(fields or []),
+            'filters': filters or {},
+        },
+        sort_keys=True,
+        cls=DjangoJSONEncoder
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _is_stale(job):
+    """Whether an in-progress job has stopped making progress"""
+    stale_after = timedelta(seconds=PatientConfig.REPORTS['export_job_stale_after'])
+    return job.updated_at < timezone.now() - stale_after
+
+
+def get_or_create_export_job(user, export_format, fields=None, filters=None):
+    """
+    Return the in-progress job for an identical export, or queue a new one
+
+    A stalled in-progress job is dispatched again and resumes from its
+    checkpoint. Returns (job, created).
+    """
+    filters = json.loads(json.dumps(filters or {}, cls=DjangoJSONEncoder))
+    fingerprint = export_fingerprint(user, export_format, fields, filters)
+
+    existing = PatientExportJob.objects.filter(
+        fingerprint=fingerprint,
+        status__in=PatientExportJob.ACTIVE_STATUSES
+    ).first()
+    if existing is not None:
+        if _is_stale(existing):
+            logger.warning(f"Export job {existing.pk} stalled, resuming from checkpoint")
+            dispatch_export_job(existing.pk)
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            job = PatientExportJob.objects.create(
+                requested_by=user,
+                fingerprint=fingerprint,
+                export_format=export_format,
+                fields=list(fields) if fields else None,
+                filters=filters,
+            )
+    except IntegrityError:
+        # An identical job was queued concurrently
+        return PatientExportJob.objects.get(
+            fingerprint=fingerprint,
+            status__in=PatientExportJob.ACTIVE_STATUSES
+        ), False
+
+    transaction.on_commit(lambda: dispatch_export_job(job.pk))
+    return job, True
+
+
+def dispatch_export_job(job_id):
+    """
+    Hand a job to a Celery worker, or to a background thread without a broker
+    """
+    if getattr(settings, 'CELERY_BROKER_URL', '') or getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        from .tasks import run_patient_export_job
+        run_patient_export_job.delay(str(job_id))
+        return
+
+    thread = threading.Thread(
+        target=_run_export_job_in_thread,
+        args=(job_id,),
+        name=f'patient-export-{job_id}',
+        daemon=True
+    )
+    thread.start()
+
+
+def _run_export_job_in_thread(job_id):
+    """
+    Run a job in a fallback thread, closing the connection the thread opened
+    """
+    close_old_connections()
+    try:
+        run_export_job(job_id)
+    finally:
+        connection.close()
+
+
+def _claim_job(job_id):
+    """
+    Mark a job as running unless another live runner owns it
+    """
+    stale_cutoff = timezone.now() - timedelta(seconds=PatientConfig.REPORTS['export_job_stale_after'])
+    now = timezone.now()
+    claimed = PatientExportJob.objects.filter(
+        Q(status='PENDING') | Q(status='RUNNING', updated_at__lt=stale_cutoff),
+        pk=job_id
+    ).update(status='RUNNING', updated_at=now)
+    if claimed:
+        PatientExportJob.objects.filter(pk=job_id, started_at__isnull=True).update(started_at=now)
+    return bool(claimed)
+
+
+def _job_queryset(job):
+    """Filtered patients for a job, in keyset order"""
+    from .serializers import PatientSearchSerializer
+
+    filters = {}
+    if job.filters:
+        search_serializer = PatientSearchSerializer(data=job.filters)
+        search_serializer.is_valid(raise_exception=True)
+        filters = search_serializer.validated_data
+
+    queryset = PatientUtils.get_patient_queryset(job.requested_by)
+    queryset = filter_export_queryset(queryset, filters)
+    return queryset.order_by('created_at', 'id')
+
+
+def _after_checkpoint(queryset, checkpoint):
+    """Rows after the checkpointed (created_at, id) position"""
+    if not checkpoint or 'created_at' not in checkpoint:
+        return queryset
+    created_at = Patient._meta.get_field('created_at').to_python(checkpoint['created_at'])
+    patient_id = Patient._meta.get_field('id').to_python(checkpoint['id'])
+    return queryset.filter(created_at__gte=created_at).filter(
+        Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=patient_id)
+    )
+
+
+def export_file_path(job):
+    """Output location for a job under the configured export directory"""
+    directory = PatientConfig.REPORTS['export_job_dir']
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{job.pk}.{job.export_format}.gz')
+
+
+def run_export_job(job_id):
+    """
+    Write (or resume) a job's compressed export, checkpointing after each chunk
+    """
+    if not _claim_job(job_id):
+        logger.info(f"Export job {job_id} is finished or owned by another runner")
+        return
+
+    job = PatientExportJob.objects.select_related('requested_by').get(pk=job_id)
+    chunk_size = PatientConfig.REPORTS['export_job_chunk_size']
+    compress_level = PatientConfig.REPORTS['export_job_compress_level']
+
+    try:
+        queryset = _job_queryset(job)
+        exporter = PatientExporter(queryset, fields=job.fields, export_format=job.export_format, chunk_size=chunk_size)
+        columns = list(dict.fromkeys(exporter.columns + ['created_at', 'id']))
+
+        if job.total_rows is None:
+            job.total_rows = queryset.count()
+            PatientExportJob.objects.filter(pk=job.pk).update(total_rows=job.total_rows)
+
+        path = job.file_path or export_file_path(job)
+        checkpoint = job.checkpoint or {}
+        offset = checkpoint.get('offset', 0)
+        rows_written = job.rows_written if checkpoint else 0
+
+        with open(path, 'r+b' if os.path.exists(path) else 'w+b') as handle:
+            # Drop any partial chunk written after the last checkpoint
+            handle.truncate(offset)
+            handle.seek(offset)
+
+            if offset == 0:
+                header = exporter.header()
+                if header:
+                    handle.write(gzip.compress(header.encode('utf-8'), compresslevel=compress_level))
+                checkpoint = {'offset': handle.tell()}
+
+            while True:
+                rows = list(_after_checkpoint(queryset, checkpoint).values(*columns)[:chunk_size])
+                if not rows:
+                    break
+
+                encoded = exporter.encode_records([exporter.record(row) for row in rows])
+                handle.write(gzip.compress(encoded.encode('utf-8'), compresslevel=compress_level))
+                handle.flush()
+                os.fsync(handle.fileno())
+
+                rows_written += len(rows)
+                last = rows[-1]
+                checkpoint = {
+                    'created_at': last['created_at'].isoformat(),
+                    'id': str(last['id']),
+                    'offset': handle.tell(),
+                }
+                PatientExportJob.objects.filter(pk=job.pk).update(
+                    rows_written=rows_written,
+                    checkpoint=checkpoint,
+                    file_path=path,
+                    file_size=checkpoint['offset'],
+                    updated_at=timezone.now()
+                )
+
+            file_size = handle.tell()
+
+        PatientExportJob.objects.filter(pk=job.pk).update(
+            status='COMPLETED',
+            rows_written=rows_written,
+            file_path=path,
+            file_size=file_size,
+            completed_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+        logger.info(f"Export job {job.pk} completed: {rows_written} rows, {file_size} bytes")
+
+    except Exception as e:
+        logger.error(f"Export job {job.pk} failed: {str(e)}")
+        PatientExportJob.objects.filter(pk=job.pk).update(
+            status='FAILED',
+            error=str(e),
+            updated_at=timezone.now()
+        )
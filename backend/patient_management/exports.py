@@ -0,0 +1,222 @@
+"""
+Streaming patient exports
+
+Rows are read with .values() projections over a server-side iterator and
+encoded incrementally, so memory use stays flat regardless of export size.
+"""
+
+import csv
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from .config import PatientConfig
+from .utils import SearchHelper
+
+# Default columns, matching the previous CSV export and the list serializer
+CSV_DEFAULT_FIELDS = ['full_name', 'age', 'gender', 'phone', 'email', 'status', 'priority', 'created_at']
+JSON_DEFAULT_FIELDS = [
+    'id', 'full_name', 'first_name', 'last_name', 'age', 'gender', 'gender_display',
+    'phone', 'email', 'status', 'status_display', 'priority', 'priority_display',
+    'doctor_name', 'last_visit', 'created_at', 'updated_at'
+]
+
+EXPORT_FORMATS = {
+    'csv': {'content_type': 'text/csv', 'extension': 'csv'},
+    'json': {'content_type': 'application/json', 'extension': 'json'},
+    'ndjson': {'content_type': 'application/x-ndjson', 'extension': 'ndjson'},
+}
+
+# Patient fields that may be exported directly
+PATIENT_EXPORT_COLUMNS = [
+    'id', 'first_name', 'last_name', 'middle_name', 'date_of_birth', 'gender',
+    'phone', 'email', 'address', 'city', 'state', 'postal_code', 'country',
+    'emergency_contact_name', 'emergency_contact_phone', 'emergency_contact_relationship',
+    'blood_type', 'allergies', 'medical_history', 'medications',
+    'insurance_provider', 'insurance_number', 'status', 'priority', 'notes',
+    'last_visit', 'next_appointment', 'is_active', 'created_at', 'updated_at'
+]
+
+
+def _full_name(row):
+    if row['middle_name']:
+        return f"{row['first_name']} {row['middle_name']} {row['last_name']}"
+    return f"{row['first_name']} {row['last_name']}"
+
+
+def _age(row):
+    date_of_birth = row['date_of_birth']
+    if not date_of_birth:
+        return None
+    today = timezone.now().date()
+    age = today.year - date_of_birth.year
+    if (today.month, today.day) < (date_of_birth.month, date_of_birth.day):
+        age -= 1
+    return age
+
+
+def _display(field, choices):
+    return lambda row: choices.get(row[field], row[field])
+
+
+def _full_address(row):
+    parts = [row['address'], row['city'], row['state'], row['postal_code'], row['country']]
+    return ', '.join([part for part in parts if part])
+
+
+# Computed fields: (columns they read, function of the projected row)
+COMPUTED_FIELDS = {
+    'full_name': (['first_name', 'middle_name', 'last_name'], _full_name),
+    'age': (['date_of_birth'], _age),
+    'is_critical': (['priority'], lambda row: row['priority'] == 'CRITICAL'),
+    'gender_display': (['gender'], _display('gender', PatientConfig.GENDER_OPTIONS)),
+    'status_display': (['status'], _display('status', PatientConfig.PATIENT_STATUS)),
+    'priority_display': (['priority'], _display('priority', PatientConfig.PRIORITY_LEVELS)),
+    'blood_type_display': (['blood_type'], _display('blood_type', PatientConfig.BLOOD_TYPES)),
+    'doctor_name': (
+        ['doctor__first_name', 'doctor__last_name'],
+        lambda row: f"{row['doctor__first_name']} {row['doctor__last_name']}".strip()
+    ),
+    'full_address': (['address', 'city', 'state', 'postal_code', 'country'], _full_address),
+}
+
+
+def filter_export_queryset(queryset, filters):
+    """
+    Apply validated PatientSearchSerializer filters to an export queryset
+    """
+    if not filters:
+        return queryset
+    if filters.get('q'):
+        queryset = SearchHelper.search(queryset, filters['q'], rank=False)
+    queryset = SearchHelper.apply_filters(queryset, filters)
+    if filters.get('ordering') in PatientConfig.get_ordering_fields():
+        queryset = queryset.order_by(filters['ordering'], 'id')
+    return queryset
+
+
+class PatientExporter:
+    """
+    Incremental CSV, JSON array or NDJSON encoder over a patient queryset
+    """
+
+    def __init__(self, queryset, fields=None, export_format='csv', chunk_size=None):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+
+        self.export_format = export_format
+        self.fields = list(fields) if fields else (
+            CSV_DEFAULT_FIELDS if export_format == 'csv' else JSON_DEFAULT_FIELDS
+        )
+        if export_format != 'csv':
+            # JSON records only carry fields that exist; CSV keeps blank columns
+            self.fields = [
+                field for field in self.fields
+                if field in COMPUTED_FIELDS or field in PATIENT_EXPORT_COLUMNS
+            ]
+        self.chunk_size = chunk_size or PatientConfig.REPORTS['export_chunk_size']
+        self.queryset = queryset.values(*self.columns)
+        self._datetime_field = serializers.DateTimeField()
+
+    @property
+    def columns(self):
+        """Database columns read for the requested fields"""
+        columns = []
+        for field in self.fields:
+            if field in COMPUTED_FIELDS:
+                columns.extend(COMPUTED_FIELDS[field][0])
+            elif field in PATIENT_EXPORT_COLUMNS:
+                columns.append(field)
+        return list(dict.fromkeys(columns)) or ['id']
+
+    @property
+    def content_type(self):
+        return EXPORT_FORMATS[self.export_format]['content_type']
+
+    def filename(self, prefix='patients'):
+        extension = EXPORT_FORMATS[self.export_format]['extension']
+        return f"{prefix}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+    def records(self, queryset=None):
+        """Projected rows as {field: value}, unknown fields mapped to None"""
+        queryset = self.queryset if queryset is None else queryset
+        for row in queryset.iterator(chunk_size=self.chunk_size):
+            yield self.record(row)
+
+    def record(self, row):
+        """Export record for one projected row"""
+        record = {}
+        for field in self.fields:
+            if field in COMPUTED_FIELDS:
+                record[field] = COMPUTED_FIELDS[field][1](row)
+            else:
+                record[field] = row.get(field)
+        return record
+
+    def _json_value(self, value):
+        if isinstance(value, datetime):
+            return self._datetime_field.to_representation(value)
+        if isinstance(value, date):
+            return value.isoformat()
+        if isinstance(value, (uuid.UUID, Decimal)):
+            return str(value)
+        return value
+
+    def _json_record(self, record):
+        return json.dumps(
+            {field: self._json_value(value) for field, value in record.items()},
+            default=str
+        )
+
+    def header(self):
+        """Leading content, written once per export"""
+        if self.export_format == 'csv':
+            return self.encode_rows([[field.replace('_', ' ').title() for field in self.fields]])
+        if self.export_format == 'json':
+            return '['
+        return ''
+
+    def footer(self):
+        """Trailing content, written once per export"""
+        return ']' if self.export_format == 'json' else ''
+
+    def encode_rows(self, rows):
+        """Encode pre-built CSV rows"""
+        buffer = StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+    def encode_records(self, records, first=True):
+        """Encode a batch of records in the export format"""
+        if self.export_format == 'csv':
+            return self.encode_rows(
+                [str(value) if value is not None else '' for value in record.values()]
+                for record in records
+            )
+        if self.export_format == 'json':
+            encoded = ','.join(self._json_record(record) for record in records)
+            return encoded if first or not encoded else ',' + encoded
+        return ''.join(self._json_record(record) + '\n' for record in records)
+
+    def chunks(self, queryset=None, first=True):
+        """Encoded body in chunks of chunk_size records"""
+        batch = []
+        for record in self.records(queryset):
+            batch.append(record)
+            if len(batch) >= self.chunk_size:
+                yield self.encode_records(batch, first=first)
+                first = False
+                batch = []
+        if batch:
+            yield self.encode_records(batch, first=first)
+
+    def stream(self):
+        """Header, encoded body and footer"""
+        yield self.header()
+        yield from self.chunks()
+        yield self.footer()
@@ -0,0 +1,278 @@
+"""
+Bulk patient import
+
+Input rows are stream-parsed from CSV or NDJSON, validated a batch at a time
+column by column against the Patient model's own field rules, inserted with
+bulk_create and audited with one bulk insert per batch. Invalid rows are
+skipped and reported with their row number and field errors.
+"""
+
+import codecs
+import csv
+import json
+import logging
+import time
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+
+from .config import PatientConfig
+from .models import Patient, PatientAuditLog
+from .signals import patients_bulk_changed
+from .utils import AuditLogger
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# Model fields that are never taken from the import file
+EXCLUDED_FIELDS = {'id', 'doctor', 'is_active'}
+
+
+def detect_import_format(filename, default='csv'):
+    """Import format from a file name extension"""
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.endswith(('.csv', '.txt')):
+        return 'csv'
+    return default
+
+
+def _normalize_column(name):
+    return (name or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def parse_import_rows(stream, import_format='csv'):
+    """
+    Stream (row_number, row) pairs from a binary or text file object
+
+    Row numbers are 1-based data rows (the CSV header is not counted). NDJSON
+    lines that are not JSON objects yield an error marker instead of a row.
+    """
+    if import_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {import_format}")
+
+    if isinstance(stream.read(0), bytes):
+        stream = codecs.getreader('utf-8-sig')(stream)
+
+    if import_format == 'csv':
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if not header:
+            return
+        columns = [_normalize_column(column) for column in header]
+        for row_number, values in enumerate(reader, start=1):
+            if not any(values):
+                continue
+            yield row_number, dict(zip(columns, values))
+        return
+
+    for row_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"Invalid JSON: {str(e)}")
+            continue
+        if not isinstance(row, dict):
+            yield row_number, ValueError('Each line must be a JSON object')
+            continue
+        yield row_number, {_normalize_column(key): value for key, value in row.items()}
+
+
+class PatientRowValidator:
+    """
+    Column-wise validation of import batches using the Patient field definitions
+
+    Applies the same rules as PatientCreateSerializer: required and blank
+    fields, lengths and regex validators from the model, choices, email
+    format, date of birth range and the configured required contacts.
+    """
+
+    def __init__(self):
+        self.fields = [
+            field for field in Patient._meta.concrete_fields
+            if field.editable and field.name not in EXCLUDED_FIELDS
+        ]
+        self.field_names = {field.name for field in self.fields}
+        self.choices = {
+            field.name: {str(key).upper(): key for key, _ in field.choices}
+            for field in self.fields if field.choices
+        }
+        today = timezone.now().date()
+        self.today = today
+        self.min_age = PatientConfig.VALIDATION['min_age']
+        self.max_age = PatientConfig.VALIDATION['max_age']
+
+    def _is_required(self, field):
+        return not field.blank and field.default is models.NOT_PROVIDED
+
+    def _age(self, date_of_birth):
+        age = self.today.year - date_of_birth.year
+        if (self.today.month, self.today.day) < (date_of_birth.month, date_of_birth.day):
+            age -= 1
+        return age
+
+    def _clean_value(self, field, raw):
+        """Coerce and validate one value, raising ValidationError"""
+        value = raw.strip() if isinstance(raw, str) else raw
+        if value in (None, ''):
+            if self._is_required(field):
+                raise ValidationError('This field is required.')
+            if field.default is not models.NOT_PROVIDED:
+                return field.get_default()
+            return None if field.null else ''
+
+        if field.choices:
+            key = self.choices[field.name].get(str(value).upper())
+            if key is None:
+                raise ValidationError(f'"{value}" is not a valid choice.')
+            return key
+
+        value = field.to_python(value)
+        if isinstance(field, models.DateTimeField) and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        field.run_validators(value)
+
+        if field.name == 'date_of_birth':
+            if value > self.today:
+                raise ValidationError('Date of birth cannot be in the future.')
+            age = self._age(value)
+            if age < self.min_age:
+                raise ValidationError(f'Age cannot be less than {self.min_age} years.')
+            if age > self.max_age:
+                raise ValidationError(f'Age cannot be more than {self.max_age} years.')
+        return value
+
+    def validate_batch(self, rows):
+        """
+        Validate a list of (row_number, row) pairs
+
+        Returns (cleaned, errors): cleaned is a list of (row_number, values)
+        and errors a list of {'row': n, 'errors': {field: [messages]}}.
+        """
+        cleaned = [{} for _ in rows]
+        row_errors = [{} for _ in rows]
+
+        for index, (_, row) in enumerate(rows):
+            if isinstance(row, Exception):
+                row_errors[index]['non_field_errors'] = [str(row)]
+
+        for field in self.fields:
+            name = field.name
+            for index, (_, row) in enumerate(rows):
+                if row_errors[index].get('non_field_errors'):
+                    continue
+                try:
+                    cleaned[index][name] = self._clean_value(field, row.get(name))
+                except ValidationError as e:
+                    row_errors[index][name] = list(dict.fromkeys(e.messages))
+
+        valid = []
+        errors = []
+        for index, (row_number, _) in enumerate(rows):
+            if row_errors[index]:
+                errors.append({'row': row_number, 'errors': row_errors[index]})
+            else:
+                valid.append((row_number, cleaned[index]))
+        return valid, errors
+
+
+class PatientImporter:
+    """
+    Batched bulk import of patients for one doctor
+    """
+
+    def __init__(self, doctor, request=None, batch_size=None, dry_run=False, max_errors=None):
+        self.doctor = doctor
+        self.request = request
+        self.batch_size = batch_size or PatientConfig.API['import_batch_size']
+        self.dry_run = dry_run
+        self.max_errors = max_errors if max_errors is not None else PatientConfig.API['import_max_errors']
+        self.validator = PatientRowValidator()
+        self.import_id = str(uuid.uuid4())
+
+    def _insert_batch(self, valid):
+        """Create one batch of patients and their audit entries in a transaction"""
+        patients = []
+        for _, values in valid:
+            patient = Patient(doctor=self.doctor, **values)
+            patient.phone_digits = Patient.normalize_phone(patient.phone)
+            patients.append(patient)
+
+        with transaction.atomic():
+            Patient.objects.bulk_create(patients, batch_size=self.batch_size)
+
+            if PatientConfig.is_audit_enabled():
+                ip_address, user_agent = AuditLogger.get_request_meta(self.request)
+                PatientAuditLog.objects.bulk_create(
+                    [
+                        PatientAuditLog(
+                            patient=patient,
+                            user=self.doctor,
+                            action='CREATE',
+                            changes={'source': 'bulk_import', 'import_id': self.import_id, 'row': row_number},
+                            ip_address=ip_address,
+                            user_agent=user_agent
+                        )
+                        for patient, (row_number, _) in zip(patients, valid)
+                    ],
+                    batch_size=self.batch_size
+                )
+        return len(patients)
+
+    def run(self, rows):
+        """
+        Import (row_number, row) pairs and return the import report
+        """
+        started = time.monotonic()
+        report = {
+            'import_id': self.import_id,
+            'dry_run': self.dry_run,
+            'total_rows': 0,
+            'created': 0,
+            'failed': 0,
+            'errors': [],
+            'errors_truncated': False,
+            'ignored_columns': [],
+        }
+        ignored_columns = set()
+
+        def process(batch):
+            valid, errors = self.validator.validate_batch(batch)
+            report['failed'] += len(errors)
+            room = self.max_errors - len(report['errors'])
+            report['errors'].extend(errors[:max(room, 0)])
+            if len(errors) > room:
+                report['errors_truncated'] = True
+            if valid and not self.dry_run:
+                report['created'] += self._insert_batch(valid)
+            elif valid:
+                report['created'] += len(valid)
+
+        batch = []
+        for row_number, row in rows:
+            report['total_rows'] += 1
+            if isinstance(row, dict):
+                ignored_columns.update(key for key in row if key not in self.validator.field_names)
+            batch.append((row_number, row))
+            if len(batch) >= self.batch_size:
+                process(batch)
+                batch = []
+        if batch:
+            process(batch)
+
+        if report['created'] and not self.dry_run:
+            patients_bulk_changed.send(sender=Patient, doctor_ids=[self.doctor.pk])
+
+        report['ignored_columns'] = sorted(column for column in ignored_columns if column)
+        report['duration_seconds'] = round(time.monotonic() - started, 3)
+        logger.info(
+            f"Patient import {self.import_id} for {self.doctor}: "
+            f"{report['created']} created, {report['failed']} failed in {report['duration_seconds']}s"
+        )
+        return report
@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from patient_management.imports import IMPORT_FORMATS, PatientImporter, detect_import_format, parse_import_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import patients for a doctor from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import')
+        parser.add_argument(
+            '--doctor',
+            required=True,
+            help='Username or email of the doctor the patients belong to',
+        )
+        parser.add_argument(
+            '--format',
+            choices=IMPORT_FORMATS,
+            help='Input format (detected from the file extension by default)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows validated and inserted per batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate only, without creating patients',
+        )
+        parser.add_argument(
+            '--report',
+            help='Write the full JSON import report (including every row error) to this path',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'File not found: {path}')
+
+        User = get_user_model()
+        doctor = User.objects.filter(username=options['doctor']).first() or \
+            User.objects.filter(email=options['doctor']).first()
+        if doctor is None:
+            raise CommandError(f"Doctor not found: {options['doctor']}")
+
+        import_format = options['format'] or detect_import_format(path)
+        importer = PatientImporter(
+            doctor,
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            max_errors=sys.maxsize if options['report'] else None
+        )
+
+        self.stdout.write(f"=== IMPORTING PATIENTS FROM {path} FOR {doctor} ===\n")
+        with open(path, 'rb') as handle:
+            report = importer.run(parse_import_rows(handle, import_format))
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2, default=str)
+
+        for error in report['errors'][:20]:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']}: {error['errors']}"))
+        if report['failed'] > 20:
+            self.stdout.write(f"... {report['failed'] - 20} more row errors")
+
+        verb = 'Validated' if options['dry_run'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['created']} of {report['total_rows']} rows "
+            f"({report['failed']} failed) in {report['duration_seconds']}s"
+        ))
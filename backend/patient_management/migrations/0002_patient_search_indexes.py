@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:08
+
+import re
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# Expressions match the SQL Django emits for __icontains / __contains on
+# PostgreSQL, so the planner can use these indexes for the patient search.
+TRIGRAM_INDEXES = {
+    "patient_first_name_trgm": 'UPPER(("first_name")::text) gin_trgm_ops',
+    "patient_last_name_trgm": 'UPPER(("last_name")::text) gin_trgm_ops',
+    "patient_email_trgm": 'UPPER(("email")::text) gin_trgm_ops',
+    "patient_phone_digits_trgm": '(("phone_digits")::text) gin_trgm_ops',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, expression in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" '
+            f'ON "patient_management_patient" USING gin ({expression})'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def backfill_phone_digits(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "UPDATE \"patient_management_patient\" "
+            "SET \"phone_digits\" = regexp_replace(\"phone\", '\\D', '', 'g')"
+        )
+        return
+
+    Patient = apps.get_model("patient_management", "Patient")
+    batch = []
+    for patient in Patient.objects.only("id", "phone").iterator(chunk_size=2000):
+        patient.phone_digits = re.sub(r"\D", "", patient.phone or "")
+        batch.append(patient)
+        if len(batch) >= 2000:
+            Patient.objects.bulk_update(batch, ["phone_digits"])
+            batch = []
+    if batch:
+        Patient.objects.bulk_update(batch, ["phone_digits"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("patient_management", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="patient",
+            name="phone_digits",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                help_text="Digits of the primary phone number, maintained for search",
+                max_length=20,
+            ),
+        ),
+        migrations.RunPython(backfill_phone_digits, migrations.RunPython.noop),
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
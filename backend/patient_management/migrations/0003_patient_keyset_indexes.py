@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("patient_management", "0002_patient_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(fields=["doctor", "is_active", "created_at", "id"], name="patient_man_doctor__12f186_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="patient",
+            index=models.Index(fields=["is_active", "created_at", "id"], name="patient_man_is_acti_420069_idx"),
+        ),
+    ]
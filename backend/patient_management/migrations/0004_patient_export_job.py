@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('patient_management', '0003_patient_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientExportJob',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('fingerprint', models.CharField(help_text='Hash of the requester scope, format, fields and filters', max_length=64)),
+                ('export_format', models.CharField(max_length=10)),
+                ('fields', models.JSONField(blank=True, null=True)),
+                ('filters', models.JSONField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True)),
+                ('rows_written', models.PositiveIntegerField(default=0)),
+                ('checkpoint', models.JSONField(blank=True, help_text='Keyset position and byte offset of the last committed chunk', null=True)),
+                ('file_path', models.CharField(blank=True, default='', max_length=500)),
+                ('file_size', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patient_export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'patient_management_export_job',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['requested_by', 'created_at'], name='patient_man_request_a6da5f_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='patientexportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['PENDING', 'RUNNING'])), fields=('fingerprint',), name='unique_active_patient_export_job'),
+        ),
+    ]
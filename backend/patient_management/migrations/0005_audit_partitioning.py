@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:31
+
+from django.db import migrations, models
+
+from accounts.partitioning import partition_table, unpartition_table
+
+
+def partition_audit_log(apps, schema_editor):
+    partition_table(schema_editor, "patient_management_audit_log", "created_at")
+
+
+def unpartition_audit_log(apps, schema_editor):
+    unpartition_table(schema_editor, "patient_management_audit_log")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_management', '0004_patient_export_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patientauditlog',
+            index=models.Index(fields=['-created_at'], name='patient_man_created_6e04e4_idx'),
+        ),
+        migrations.RunPython(partition_audit_log, unpartition_audit_log),
+    ]
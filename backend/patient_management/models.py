@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator, MinLengthValidator, EmailValidator
 from django.utils import timezone
 from .config import PatientConfig
+import re
 import uuid
 
 User = get_user_model()
@@ -70,6 +71,14 @@ class Patient(TimestampedModel):
         help_text="Primary phone number"
     )
     
+    phone_digits = models.CharField(
+        max_length=20,
+        blank=True,
+        default='',
+        editable=False,
+        help_text="Digits of the primary phone number, maintained for search"
+    )
+    
     email = models.EmailField(
         blank=not PatientConfig.VALIDATION['email_required'],
         null=not PatientConfig.VALIDATION['email_required'],
@@ -236,11 +245,27 @@ class Patient(TimestampedModel):
             models.Index(fields=['last_name', 'first_name']),
             models.Index(fields=['created_at']),
             models.Index(fields=['date_of_birth']),
+            # Keyset pagination over (-created_at, -id)
+            models.Index(fields=['doctor', 'is_active', 'created_at', 'id']),
+            models.Index(fields=['is_active', 'created_at', 'id']),
         ]
         
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.get_status_display()})"
     
+    @staticmethod
+    def normalize_phone(value):
+        """Strip a phone number down to its digits"""
+        return re.sub(r'\D', '', value or '')
+    
+    def save(self, *args, **kwargs):
+        """Keep the normalized phone digits in sync with the phone number"""
+        self.phone_digits = self.normalize_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'phone_digits'}
+        super().save(*args, **kwargs)
+    
     @property
     def full_name(self):
         """Get patient's full name"""
@@ -337,6 +362,76 @@ class PatientAuditLog(TimestampedModel):
     class Meta:
         db_table = 'patient_management_audit_log'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
     
     def __str__(self):
         return f"{self.action} - {self.patient.full_name} by {self.user.username}"
+
+
+class PatientExportJob(TimestampedModel):
+    """
+    Background patient export written in compressed chunks with a resumable checkpoint
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+    ACTIVE_STATUSES = ['PENDING', 'RUNNING']
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='patient_export_jobs'
+    )
+    fingerprint = models.CharField(
+        max_length=64,
+        help_text="Hash of the requester scope, format, fields and filters"
+    )
+    export_format = models.CharField(max_length=10)
+    fields = models.JSONField(blank=True, null=True)
+    filters = models.JSONField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    total_rows = models.PositiveIntegerField(blank=True, null=True)
+    rows_written = models.PositiveIntegerField(default=0)
+    checkpoint = models.JSONField(
+        blank=True,
+        null=True,
+        help_text="Keyset position and byte offset of the last committed chunk"
+    )
+    file_path = models.CharField(max_length=500, blank=True, default='')
+    file_size = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'patient_management_export_job'
+        ordering = ['-created_at']
+        constraints = [
+            # At most one in-progress job per identical export request
+            models.UniqueConstraint(
+                fields=['fingerprint'],
+                condition=models.Q(status__in=['PENDING', 'RUNNING']),
+                name='unique_active_patient_export_job'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['requested_by', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.export_format} export {self.id} ({self.status})"
+    
+    @property
+    def progress(self):
+        """Completed fraction between 0 and 1, when the total is known"""
+        if self.status == 'COMPLETED':
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return min(self.rows_written / self.total_rows, 1.0)
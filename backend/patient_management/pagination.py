@@ -0,0 +1,226 @@
+"""
+Keyset (cursor) pagination for patient management endpoints
+
+Pages are addressed by the ordering values of the last row seen instead of an
+OFFSET, so fetching page N costs the same as fetching page 1 and rows do not
+shift when new records are inserted.
+"""
+
+import base64
+import json
+import logging
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .config import PatientConfig
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_count(queryset):
+    """
+    Row estimate for a queryset from the PostgreSQL planner, exact count elsewhere
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+    except Exception as e:
+        logger.warning(f"Planner row estimate failed, counting instead: {str(e)}")
+        return queryset.count()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite, unique ordering such as (-created_at, -id)
+
+    The cursor is an opaque token holding the ordering values of the boundary
+    row and the direction of travel. Every ordering should end in a unique
+    column and be backed by a matching composite index.
+    """
+    page_size = 25
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    total_query_param = 'include_total'
+    ordering = ('-created_at', '-id')
+    # 'none', 'estimate' or 'exact'
+    default_total = 'none'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        """Requested page size, bounded by max_page_size"""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """Ordering as a list of (field, descending) pairs"""
+        return [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_ordering(request, queryset, view)
+        self.total = self._get_total(queryset, request)
+
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = bool(cursor and cursor['reverse'])
+
+        queryset = queryset.order_by(*[
+            ('-' if descending != reverse else '') + field
+            for field, descending in self.fields
+        ])
+        if cursor:
+            queryset = queryset.filter(self._after(cursor['values'], reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.next_values = self._row_values(rows[-1]) if rows and self.has_next else None
+        self.previous_values = self._row_values(rows[0]) if rows and self.has_previous else None
+        return rows
+
+    def _after(self, values, reverse):
+        """Rows strictly after the boundary values in the direction of travel"""
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+
+        # Redundant bound on the leading column lets the index drive a range scan
+        field, descending = self.fields[0]
+        leading = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{field}__{leading}': values[0]}) & condition
+
+    def _row_values(self, row):
+        """Ordering values of a row, as JSON-safe strings"""
+        values = []
+        for field, _ in self.fields:
+            value = getattr(row, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return values
+
+    def _get_total(self, queryset, request):
+        """Optional exact or estimated total, skipped by default"""
+        mode = request.query_params.get(self.total_query_param, self.default_total)
+        if mode == 'exact':
+            return {'total': queryset.count(), 'total_is_estimate': False}
+        if mode == 'estimate':
+            estimated = connections[queryset.db].vendor == 'postgresql'
+            return {'total': estimate_count(queryset), 'total_is_estimate': estimated}
+        return None
+
+    def encode_cursor(self, values, reverse):
+        """Opaque URL-safe token for a boundary row"""
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request, model):
+        """Parse the cursor query parameter into typed ordering values"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            raw_values = payload['v']
+            if len(raw_values) != len(self.fields):
+                raise ValueError('cursor does not match ordering')
+            values = [
+                model._meta.get_field(field).to_python(value)
+                for (field, _), value in zip(self.fields, raw_values)
+            ]
+        except (TypeError, ValueError, KeyError, FieldDoesNotExist, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return {'values': values, 'reverse': bool(payload.get('r'))}
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.next_values, False))
+
+    def get_previous_link(self):
+        if self.previous_values is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.previous_values, True))
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.total is not None:
+            response.update(self.total)
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'total': {'type': 'integer'},
+                'total_is_estimate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+
+class PatientCursorPagination(KeysetPagination):
+    """
+    Soft-coded cursor pagination for patient list and search
+    """
+    page_size = PatientConfig.DATABASE['default_page_size']
+    max_page_size = PatientConfig.DATABASE['max_page_size']
+    ordering = tuple(PatientConfig.DATABASE['cursor_ordering'])
+    default_total = PatientConfig.DATABASE['cursor_total']
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Honour an explicit search ordering on a non-null field, tie-broken by id
+        """
+        ordering_field = request.query_params.get('ordering', '')
+        field = ordering_field.lstrip('-')
+        if field in PatientConfig.get_ordering_fields():
+            try:
+                nullable = queryset.model._meta.get_field(field).null
+            except FieldDoesNotExist:
+                nullable = True
+            if not nullable:
+                descending = ordering_field.startswith('-')
+                return [(field, descending), ('id', descending)]
+        return super().get_ordering(request, queryset, view)
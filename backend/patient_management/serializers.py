@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Patient, PatientNote, PatientAuditLog
+from .models import Patient, PatientNote, PatientAuditLog, PatientExportJob
 from .config import PatientConfig
 import re
 
@@ -228,7 +228,7 @@ class PatientExportSerializer(serializers.Serializer):
     Serializer for patient export parameters
     """
     format = serializers.ChoiceField(
-        choices=[('csv', 'CSV'), ('excel', 'Excel'), ('json', 'JSON')],
+        choices=[('csv', 'CSV'), ('excel', 'Excel'), ('json', 'JSON'), ('ndjson', 'NDJSON')],
         default='csv',
         help_text="Export format"
     )
@@ -238,6 +238,36 @@ class PatientExportSerializer(serializers.Serializer):
         help_text="Fields to include in export"
     )
     filters = PatientSearchSerializer(required=False)
+    mode = serializers.ChoiceField(
+        choices=[('stream', 'Stream'), ('job', 'Background job')],
+        default='stream',
+        help_text="Stream the file in the response or write it in a background job"
+    )
+
+
+class PatientExportJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for background export job status
+    """
+    progress = serializers.ReadOnlyField()
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = PatientExportJob
+        fields = [
+            'id', 'status', 'export_format', 'fields', 'filters', 'total_rows',
+            'rows_written', 'progress', 'file_size', 'error', 'download_url',
+            'created_at', 'started_at', 'completed_at'
+        ]
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        if obj.status != 'COMPLETED':
+            return None
+        request = self.context.get('request')
+        from django.urls import reverse
+        path = reverse('patient_management:patient-export-job-download', kwargs={'job_id': obj.pk})
+        return request.build_absolute_uri(path) if request else path
 
 
 class BulkActionSerializer(serializers.Serializer):
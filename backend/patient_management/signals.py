@@ -0,0 +1,62 @@
+"""
+Patient management signals
+
+Queryset-level writes (bulk actions, imports) bypass the model save/delete
+signals, so they send patients_bulk_changed with the affected doctor ids.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from accounts.audit import audit_entries_written
+from .models import Patient, PatientAuditLog
+from .utils import DashboardStats
+
+# Sent with doctor_ids: iterable of doctor primary keys whose patients changed
+patients_bulk_changed = Signal()
+
+# Audit actions that record reads; they leave the cached dashboards as they are
+READ_ONLY_AUDIT_ACTIONS = {'VIEW', 'EXPORT'}
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def invalidate_dashboard_on_patient_change(sender, instance, **kwargs):
+    """Drop cached dashboard statistics for the patient's doctor"""
+    DashboardStats.invalidate([instance.doctor_id])
+
+
+@receiver(post_save, sender=PatientAuditLog)
+def invalidate_dashboard_on_audit_entry(sender, instance, created, **kwargs):
+    """Recent activities are part of the cached dashboard"""
+    if not created or instance.action in READ_ONLY_AUDIT_ACTIONS:
+        return
+    if PatientAuditLog.patient.is_cached(instance):
+        doctor_ids = [instance.patient.doctor_id]
+    else:
+        doctor_ids = Patient.objects.filter(pk=instance.patient_id).values_list('doctor_id', flat=True)
+    DashboardStats.invalidate(doctor_ids)
+
+
+@receiver(audit_entries_written, sender=PatientAuditLog)
+def invalidate_dashboard_on_audit_batch(sender, entries, **kwargs):
+    """Audit entries from the batched writer are inserted without post_save"""
+    doctor_ids = set()
+    uncached = set()
+    for entry in entries:
+        if entry.action in READ_ONLY_AUDIT_ACTIONS:
+            continue
+        if PatientAuditLog.patient.is_cached(entry):
+            doctor_ids.add(entry.patient.doctor_id)
+        else:
+            uncached.add(entry.patient_id)
+    if uncached:
+        doctor_ids.update(Patient.objects.filter(pk__in=uncached).values_list('doctor_id', flat=True))
+    if doctor_ids:
+        DashboardStats.invalidate(doctor_ids)
+
+
+@receiver(patients_bulk_changed)
+def invalidate_dashboard_on_bulk_change(sender, doctor_ids, **kwargs):
+    """Drop cached dashboard statistics after queryset-level writes"""
+    DashboardStats.invalidate(doctor_ids)
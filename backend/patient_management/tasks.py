@@ -0,0 +1,13 @@
+"""
+Celery tasks for patient management
+"""
+
+from celery import shared_task
+
+from .export_jobs import run_export_job
+
+
+@shared_task(acks_late=True, ignore_result=True)
+def run_patient_export_job(job_id):
+    """Write or resume a background patient export"""
+    run_export_job(job_id)
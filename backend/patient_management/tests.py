@@ -1,3 +1,144 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from accounts.models import User
+from . import export_jobs
+from .config import PatientConfig
+from .imports import PatientImporter
+from .models import Patient, PatientAuditLog
+from .utils import DashboardStats, PatientUtils, SearchHelper
+
+
+def create_patient(doctor, first_name, last_name, email, phone):
+    return Patient.objects.create(
+        doctor=doctor, first_name=first_name, last_name=last_name, email=email, phone=phone,
+        date_of_birth=date(1980, 1, 1), gender='MALE',
+        emergency_contact_name='Contact', emergency_contact_phone='+15550100000',
+    )
+
+
+class IndexedSearchQueryTests(TestCase):
+    """Phone digit matching of SearchHelper.build_search_query in indexed mode"""
+
+    @classmethod
+    def setUpTestData(cls):
+        doctor = User.objects.create_user(username='doctor', email='doctor@example.com', password='doctor-pass-123')
+        cls.john = create_patient(doctor, 'John', 'Doe', 'john.doe1@x.com', '+1 (555) 010-2000')
+        cls.room = create_patient(doctor, 'Room', 'Five', 'room@example.com', '+1 (555) 010-3000')
+        # Phone numbers contain the digits of the other patients' search terms
+        for index in range(5):
+            create_patient(doctor, 'Other', f'Patient{index}', f'other{index}@example.com', f'+1 555 015 {index}151')
+
+    def search(self, term):
+        return set(Patient.objects.filter(SearchHelper.build_search_query(term, indexed=True)))
+
+    def test_email_with_digit_does_not_match_phones(self):
+        self.assertEqual(self.search('john.doe1@x.com'), {self.john})
+
+    def test_name_with_digit_does_not_match_phones(self):
+        self.assertEqual(self.search('Room 5'), set())
+
+    def test_formatted_phone_matches_digits(self):
+        self.assertEqual(self.search('555.010.2000'), {self.john})
+        self.assertEqual(self.search('(555) 010-3000'), {self.room})
+
+    def test_short_digit_terms_are_not_phone_searches(self):
+        self.assertEqual(self.search('15'), set())
+
+
+class DashboardStatsCacheTests(TestCase):
+    """Version stamps of the cached dashboard statistics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(username='doctor', email='doctor@example.com', password='doctor-pass-123')
+        cls.other = User.objects.create_user(username='other', email='other@example.com', password='other-pass-123')
+        cls.patient = create_patient(cls.doctor, 'Own', 'Patient', 'own@example.com', '+15550102000')
+        cls.other_patient = create_patient(cls.other, 'Other', 'Patient', 'other@example.com', '+15550103000')
+
+    def setUp(self):
+        cache.clear()
+
+    def dashboard(self, user):
+        """Dashboard statistics and whether they were served from the cache"""
+        with mock.patch.object(DashboardStats, 'compute', wraps=DashboardStats.compute) as compute:
+            stats = DashboardStats.get(user, PatientUtils.get_patient_queryset(user))
+        return stats, not compute.called
+
+    def test_other_doctors_changes_keep_the_cached_dashboard(self):
+        with mock.patch.dict(PatientConfig.SECURITY, doctor_data_isolation=True):
+            self.dashboard(self.doctor)
+            self.other_patient.first_name = 'Changed'
+            self.other_patient.save()
+            self.assertTrue(self.dashboard(self.doctor)[1])
+
+            self.patient.first_name = 'Changed'
+            self.patient.save()
+            self.assertFalse(self.dashboard(self.doctor)[1])
+
+    def test_all_patients_view_follows_every_doctor(self):
+        with mock.patch.dict(PatientConfig.SECURITY, doctor_data_isolation=False):
+            self.dashboard(self.doctor)
+            self.other_patient.first_name = 'Changed'
+            self.other_patient.save()
+            self.assertFalse(self.dashboard(self.doctor)[1])
+
+    def test_read_only_audit_entries_keep_the_cached_dashboard(self):
+        self.dashboard(self.doctor)
+        PatientAuditLog.objects.create(patient=self.patient, user=self.doctor, action='VIEW')
+        self.assertTrue(self.dashboard(self.doctor)[1])
+
+        entry = PatientAuditLog(patient_id=self.patient.pk, user=self.doctor, action='UPDATE')
+        with self.assertNumQueries(2):  # the doctor id lookup and the insert
+            entry.save()
+        self.assertFalse(self.dashboard(self.doctor)[1])
+
+    def test_per_process_cache_uses_the_short_timeout(self):
+        with mock.patch.dict(PatientConfig.DASHBOARD, stats_cache_timeout=300, stats_local_cache_timeout=30):
+            self.assertEqual(DashboardStats.cache_timeout(), 30)
+            with mock.patch('django.core.cache.caches', {'default': object()}):
+                self.assertEqual(DashboardStats.cache_timeout(), 300)
+
+
+class PatientImportTests(TestCase):
+    """Bulk import batches larger than one INSERT's parameter limit"""
+
+    def test_import_creates_patients_and_audit_entries(self):
+        doctor = User.objects.create_user(username='doctor', email='doctor@example.com', password='doctor-pass-123')
+        rows = [
+            (index, {
+                'first_name': 'Imported', 'last_name': f'Patient{index}', 'date_of_birth': '1980-01-01',
+                'gender': 'FEMALE', 'phone': f'+1555020{index:04d}', 'email': f'imported{index}@example.com',
+                'emergency_contact_name': 'Contact', 'emergency_contact_phone': '+15550100000',
+            })
+            for index in range(1, 121)
+        ]
+
+        report = PatientImporter(doctor, batch_size=100).run(rows)
+
+        self.assertEqual((report['created'], report['failed']), (120, 0), report['errors'])
+        self.assertEqual(Patient.objects.filter(doctor=doctor).count(), 120)
+        self.assertEqual(Patient.objects.get(last_name='Patient7').phone_digits, '15550200007')
+        if PatientConfig.is_audit_enabled():
+            self.assertEqual(PatientAuditLog.objects.filter(action='CREATE', patient__doctor=doctor).count(), 120)
+
+
+@override_settings(CELERY_BROKER_URL='', CELERY_TASK_ALWAYS_EAGER=False)
+class ExportJobThreadTests(SimpleTestCase):
+    """The thread fallback closes the connection it opened"""
+
+    def test_thread_connection_is_closed_after_the_job(self):
+        with mock.patch.object(export_jobs, 'run_export_job', side_effect=RuntimeError('failed')) as run, \
+                mock.patch.object(export_jobs.connection, 'close') as close, \
+                mock.patch.object(export_jobs.threading, 'Thread') as thread:
+            export_jobs.dispatch_export_job('job-1')
+            target = thread.call_args.kwargs['target']
+            with self.assertRaises(RuntimeError):
+                target(*thread.call_args.kwargs['args'])
+
+        run.assert_called_once_with('job-1')
+        close.assert_called()
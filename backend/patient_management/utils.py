@@ -1,7 +1,10 @@
+from django.db import transaction
 from django.utils import timezone
-from .models import PatientAuditLog
+from accounts.audit import audit_writer
+from .models import Patient, PatientAuditLog
 from .config import PatientConfig
 import json
+import re
 
 
 class PatientUtils:
@@ -9,6 +12,69 @@ class PatientUtils:
     Utility functions for patient management
     """
     
+    @staticmethod
+    def get_patient_queryset(user):
+        """
+        Active patients visible to a user under the doctor data isolation setting
+        """
+        if PatientConfig.is_doctor_isolation_enabled():
+            # Doctor can only see their own patients
+            return Patient.objects.filter(doctor=user, is_active=True)
+        # Admin can see all patients
+        return Patient.objects.filter(is_active=True)
+    
+    @staticmethod
+    def bulk_update(queryset, patient_ids, values, user, audit_action, request=None, chunk_size=None):
+        """
+        Update the patients of queryset listed in patient_ids in one transaction
+        
+        Ids are processed in chunks: each chunk locks and reads its visible
+        rows, updates them in one statement and, with auditing enabled, records
+        one audit entry per patient through a single bulk_create.
+        Returns (number of patients updated, ids of their doctors).
+        """
+        chunk_size = chunk_size or PatientConfig.API['bulk_action_chunk_size']
+        audited_fields = [field for field in values if field != 'updated_at']
+        audit_enabled = PatientConfig.is_audit_enabled()
+        ip_address, user_agent = AuditLogger.get_request_meta(request)
+        patient_ids = list(dict.fromkeys(patient_ids))
+        
+        updated = 0
+        doctor_ids = set()
+        with transaction.atomic():
+            for start in range(0, len(patient_ids), chunk_size):
+                rows = list(
+                    queryset.filter(id__in=patient_ids[start:start + chunk_size])
+                    .select_for_update()
+                    .values('id', 'doctor_id', *audited_fields)
+                )
+                if not rows:
+                    continue
+                
+                updated += Patient.objects.filter(id__in=[row['id'] for row in rows]).update(**values)
+                doctor_ids.update(row['doctor_id'] for row in rows)
+                
+                if audit_enabled:
+                    PatientAuditLog.objects.bulk_create([
+                        PatientAuditLog(
+                            patient_id=row['id'],
+                            user=user,
+                            action=audit_action,
+                            changes={
+                                'source': 'bulk_action',
+                                **{
+                                    field: {'old': row[field], 'new': values[field]}
+                                    for field in audited_fields
+                                }
+                            },
+                            ip_address=ip_address,
+                            user_agent=user_agent
+                        )
+                        for row in rows
+                    ], batch_size=chunk_size)
+        
+        return updated, doctor_ids
+    
     @staticmethod
     def get_patient_data(patient):
         """
@@ -156,6 +222,21 @@ class AuditLogger:
     Audit logging utility for patient management
     """
     
+    @staticmethod
+    def get_request_meta(request):
+        """
+        Client IP address and user agent of a request, (None, None) without one
+        """
+        if not request:
+            return None, None
+        
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            ip_address = x_forwarded_for.split(',')[0]
+        else:
+            ip_address = request.META.get('REMOTE_ADDR')
+        return ip_address, request.META.get('HTTP_USER_AGENT', '')
+    
     @staticmethod
     def log_action(patient, user, action, changes=None, request=None):
         """
@@ -164,30 +245,17 @@ class AuditLogger:
         if not PatientConfig.is_audit_enabled():
             return None
         
-        ip_address = None
-        user_agent = None
-        
-        if request:
-            # Get IP address
-            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-            if x_forwarded_for:
-                ip_address = x_forwarded_for.split(',')[0]
-            else:
-                ip_address = request.META.get('REMOTE_ADDR')
-            
-            # Get user agent
-            user_agent = request.META.get('HTTP_USER_AGENT', '')
+        ip_address, user_agent = AuditLogger.get_request_meta(request)
         
-        audit_log = PatientAuditLog.objects.create(
+        # Queued and written in batches unless the action requires a sync write
+        return audit_writer.write(PatientAuditLog(
             patient=patient,
             user=user,
             action=action,
             changes=changes,
             ip_address=ip_address,
             user_agent=user_agent
-        )
-        
-        return audit_log
+        ))
     
     @staticmethod
     def get_recent_activities(user, limit=10):
@@ -222,62 +290,298 @@ class AuditLogger:
         return activities
 
 
+class DashboardStats:
+    """
+    Single-query dashboard statistics with a per-doctor cache
+    
+    Cached entries are keyed on a per-doctor version stamp (plus a global one
+    for the unisolated, all-patients view) that the patient signals bump
+    whenever patient data changes.
+    
+    The stamps only reach every worker through a shared cache. With the
+    per-process LocMem cache, a change made in one worker is not seen by the
+    others' cached dashboards, so entries then expire after the shorter
+    stats_local_cache_timeout.
+    """
+    
+    CACHE_PREFIX = 'patient_dashboard_stats'
+    
+    # Age buckets in the same order as the dashboard's Case expression
+    AGE_GROUPS = [('18-30', 30), ('30-50', 50), ('50-70', 70)]
+    OLDEST_AGE_GROUP = '70+'
+    
+    @staticmethod
+    def _version_key(scope):
+        return f"{DashboardStats.CACHE_PREFIX}:version:{scope}"
+    
+    @staticmethod
+    def compute(queryset, today=None):
+        """
+        Compute all counts and breakdowns in one conditional-aggregation query
+        """
+        from django.db.models import Count, Q
+        
+        today = today or timezone.now().date()
+        aggregates = {
+            'total_patients': Count('id'),
+            'active_patients': Count('id', filter=Q(status='ACTIVE')),
+            'inactive_patients': Count('id', filter=Q(status='INACTIVE')),
+            'critical_patients': Count('id', filter=Q(priority='CRITICAL')),
+            'new_patients_today': Count('id', filter=Q(created_at__date=today)),
+        }
+        
+        breakdowns = {
+            'by_gender': ('gender', PatientConfig.GENDER_OPTIONS),
+            'by_priority': ('priority', PatientConfig.PRIORITY_LEVELS),
+            'by_status': ('status', PatientConfig.PATIENT_STATUS),
+        }
+        # Breakdown counts get positional aliases, mapped back to (breakdown, value)
+        buckets = {}
+        for name, (field, choices) in breakdowns.items():
+            for key in choices:
+                alias = f'bucket_{len(buckets)}'
+                buckets[alias] = (name, key)
+                aggregates[alias] = Count('id', filter=Q(**{field: key}))
+        
+        younger_bound = None
+        for label, years in DashboardStats.AGE_GROUPS:
+            bound = today - timezone.timedelta(days=years * 365)
+            condition = Q(date_of_birth__gte=bound)
+            if younger_bound is not None:
+                condition &= Q(date_of_birth__lt=younger_bound)
+            alias = f'bucket_{len(buckets)}'
+            buckets[alias] = ('by_age_group', label)
+            aggregates[alias] = Count('id', filter=condition)
+            younger_bound = bound
+        
+        counts = queryset.order_by().aggregate(**aggregates)
+        
+        stats = {key: counts[key] for key in (
+            'total_patients', 'active_patients', 'inactive_patients',
+            'critical_patients', 'new_patients_today'
+        )}
+        stats['appointments_today'] = 0  # Replace with actual query when an appointment model exists
+        
+        for name in list(breakdowns) + ['by_age_group']:
+            stats[name] = {}
+        for alias, (name, value) in buckets.items():
+            if counts[alias]:
+                stats[name][value] = counts[alias]
+        
+        # Everything older than the last bucket, including unknown birth dates
+        oldest = stats['total_patients'] - sum(stats['by_age_group'].values())
+        if oldest:
+            stats['by_age_group'][DashboardStats.OLDEST_AGE_GROUP] = oldest
+        
+        return stats
+    
+    @staticmethod
+    def recent_activities(user, limit=10):
+        """
+        Latest audit entries for the doctor's patients, shaped for the dashboard
+        """
+        if not PatientConfig.is_audit_enabled():
+            return []
+        
+        recent_logs = PatientAuditLog.objects.filter(
+            patient__doctor=user
+        ).select_related('patient', 'user')[:limit]
+        
+        return [
+            {
+                'id': log.id,
+                'action': log.action,
+                'patient_name': log.patient.full_name,
+                'user': log.user.get_full_name() or log.user.username,
+                'timestamp': log.created_at
+            }
+            for log in recent_logs
+        ]
+    
+    @staticmethod
+    def get(user, queryset):
+        """
+        Cached dashboard statistics for a user, computed on a miss
+        """
+        from django.core.cache import cache
+        
+        today = timezone.now().date()
+        # Recent activities always follow the user's own patients; the counts
+        # follow every patient unless doctor isolation is enabled
+        scopes = [user.pk]
+        if not PatientConfig.is_doctor_isolation_enabled():
+            scopes.append('all')
+        version_keys = [DashboardStats._version_key(scope) for scope in scopes]
+        versions = cache.get_many(version_keys)
+        stamps = ':'.join(str(versions.get(key, 0)) for key in version_keys)
+        cache_key = f"{DashboardStats.CACHE_PREFIX}:{user.pk}:{today.isoformat()}:{stamps}"
+        
+        stats = cache.get(cache_key)
+        if stats is None:
+            stats = DashboardStats.compute(queryset, today=today)
+            stats['recent_activities'] = DashboardStats.recent_activities(
+                user, limit=PatientConfig.DASHBOARD['widgets']['recent_activities']['max_items']
+            )
+            cache.set(cache_key, stats, DashboardStats.cache_timeout())
+        return stats
+    
+    @staticmethod
+    def cache_timeout():
+        """
+        Cache lifetime of dashboard statistics, short when the cache is per-process
+        """
+        from django.core.cache import caches
+        from django.core.cache.backends.locmem import LocMemCache
+        
+        if isinstance(caches['default'], LocMemCache):
+            return PatientConfig.DASHBOARD['stats_local_cache_timeout']
+        return PatientConfig.DASHBOARD['stats_cache_timeout']
+    
+    @staticmethod
+    def invalidate(doctor_ids):
+        """
+        Bump the version stamps of the given doctors and of the all-patients view
+        """
+        import time
+        from django.core.cache import cache
+        
+        version = time.time_ns()
+        scopes = {doctor_id for doctor_id in doctor_ids if doctor_id is not None} | {'all'}
+        cache.set_many(
+            {DashboardStats._version_key(scope): version for scope in scopes},
+            timeout=None
+        )
+
+
 class ReportGenerator:
     """
     Report generation utility
     """
     
+    CACHE_PREFIX = 'patient_summary_report'
+    
+    # (label, minimum age in years, maximum age in years)
+    AGE_GROUPS = [
+        ('Children (0-17)', None, 18),
+        ('Young Adults (18-29)', 18, 30),
+        ('Adults (30-59)', 30, 60),
+        ('Seniors (60+)', 60, None),
+    ]
+    
     @staticmethod
-    def generate_patient_summary(queryset):
+    def _summary_aggregates(today):
         """
-        Generate patient summary report data
+        Conditional counts for every breakdown, keyed by positional alias
         """
-        total_patients = queryset.count()
-        
-        # Status breakdown
-        status_breakdown = {}
-        for status_key, status_label in PatientConfig.PATIENT_STATUS.items():
-            count = queryset.filter(status=status_key).count()
-            status_breakdown[status_label] = count
-        
-        # Priority breakdown
-        priority_breakdown = {}
-        for priority_key, priority_label in PatientConfig.PRIORITY_LEVELS.items():
-            count = queryset.filter(priority=priority_key).count()
-            priority_breakdown[priority_label] = count
-        
-        # Gender breakdown
-        gender_breakdown = {}
-        for gender_key, gender_label in PatientConfig.GENDER_OPTIONS.items():
-            count = queryset.filter(gender=gender_key).count()
-            gender_breakdown[gender_label] = count
-        
-        # Age group breakdown
-        age_groups = {
-            'Children (0-17)': queryset.filter(
-                date_of_birth__gte=timezone.now().date() - timezone.timedelta(days=18*365)
-            ).count(),
-            'Young Adults (18-29)': queryset.filter(
-                date_of_birth__gte=timezone.now().date() - timezone.timedelta(days=30*365),
-                date_of_birth__lt=timezone.now().date() - timezone.timedelta(days=18*365)
-            ).count(),
-            'Adults (30-59)': queryset.filter(
-                date_of_birth__gte=timezone.now().date() - timezone.timedelta(days=60*365),
-                date_of_birth__lt=timezone.now().date() - timezone.timedelta(days=30*365)
-            ).count(),
-            'Seniors (60+)': queryset.filter(
-                date_of_birth__lt=timezone.now().date() - timezone.timedelta(days=60*365)
-            ).count(),
-        }
+        from django.db.models import Count, Q
         
-        return {
-            'total_patients': total_patients,
-            'status_breakdown': status_breakdown,
-            'priority_breakdown': priority_breakdown,
-            'gender_breakdown': gender_breakdown,
-            'age_group_breakdown': age_groups,
-            'generated_at': timezone.now()
+        aggregates = {'total_patients': Count('id')}
+        buckets = {}
+        
+        breakdowns = [
+            ('status_breakdown', 'status', PatientConfig.PATIENT_STATUS),
+            ('priority_breakdown', 'priority', PatientConfig.PRIORITY_LEVELS),
+            ('gender_breakdown', 'gender', PatientConfig.GENDER_OPTIONS),
+        ]
+        for name, field, choices in breakdowns:
+            for key, label in choices.items():
+                alias = f'bucket_{len(buckets)}'
+                buckets[alias] = (name, label)
+                aggregates[alias] = Count('id', filter=Q(**{field: key}))
+        
+        for label, min_years, max_years in ReportGenerator.AGE_GROUPS:
+            condition = Q()
+            if min_years is not None:
+                condition &= Q(date_of_birth__lt=today - timezone.timedelta(days=min_years * 365))
+            if max_years is not None:
+                condition &= Q(date_of_birth__gte=today - timezone.timedelta(days=max_years * 365))
+            alias = f'bucket_{len(buckets)}'
+            buckets[alias] = ('age_group_breakdown', label)
+            aggregates[alias] = Count('id', filter=condition)
+        
+        return aggregates, buckets
+    
+    @staticmethod
+    def _summary_from_counts(counts, buckets):
+        """
+        Shape one aggregate row into the summary breakdown dictionaries
+        """
+        summary = {
+            'total_patients': counts['total_patients'],
+            'status_breakdown': {},
+            'priority_breakdown': {},
+            'gender_breakdown': {},
+            'age_group_breakdown': {},
         }
+        for alias, (name, label) in buckets.items():
+            summary[name][label] = counts[alias] or 0
+        return summary
+    
+    @staticmethod
+    def _summary_cache_key(queryset, today):
+        """
+        Cache key for a summary queryset, tied to the all-patients data version
+        """
+        import hashlib
+        from django.core.cache import cache
+        
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f"{sql}|{params!r}".encode('utf-8')).hexdigest()
+        version = cache.get(DashboardStats._version_key('all'), 0)
+        return f"{ReportGenerator.CACHE_PREFIX}:{digest}:{today.isoformat()}:{version}"
+    
+    @staticmethod
+    def generate_patient_summary(queryset, doctors=None, date_from=None, date_to=None,
+                                 by_doctor=False, use_cache=True):
+        """
+        Generate patient summary report data
+        
+        Every breakdown is computed in a single conditional-aggregation query
+        (grouped by doctor when by_doctor is set), optionally restricted to a
+        set of doctors and a created_at date range. Results are cached for
+        PatientConfig.REPORTS['cache_duration'] seconds and invalidated by any
+        patient change.
+        """
+        from django.core.cache import cache
+        
+        if doctors is not None:
+            queryset = queryset.filter(doctor__in=doctors)
+        if date_from is not None:
+            queryset = queryset.filter(created_at__gte=date_from)
+        if date_to is not None:
+            queryset = queryset.filter(created_at__lte=date_to)
+        queryset = queryset.order_by()
+        
+        today = timezone.now().date()
+        cache_key = None
+        if use_cache:
+            cache_key = ReportGenerator._summary_cache_key(queryset, today) + (':by_doctor' if by_doctor else '')
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        aggregates, buckets = ReportGenerator._summary_aggregates(today)
+        
+        if by_doctor:
+            rows = list(queryset.values('doctor').annotate(**aggregates).order_by('doctor'))
+            doctor_summaries = {}
+            totals = {alias: 0 for alias in aggregates}
+            for row in rows:
+                doctor_summaries[str(row['doctor'])] = ReportGenerator._summary_from_counts(row, buckets)
+                for alias in aggregates:
+                    totals[alias] += row[alias] or 0
+            summary = ReportGenerator._summary_from_counts(totals, buckets)
+            summary['by_doctor'] = doctor_summaries
+        else:
+            summary = ReportGenerator._summary_from_counts(queryset.aggregate(**aggregates), buckets)
+        
+        summary['date_from'] = date_from
+        summary['date_to'] = date_to
+        summary['generated_at'] = timezone.now()
+        
+        if cache_key:
+            cache.set(cache_key, summary, PatientConfig.REPORTS['cache_duration'])
+        return summary
     
     @staticmethod
     def export_to_csv(queryset, fields=None):
@@ -322,22 +626,93 @@ class SearchHelper:
     Helper for advanced search functionality
     """
     
+    # Fields matched by digits only, through the normalized phone column
+    PHONE_FIELDS = {'phone': 'phone_digits'}
+    # Terms searched on phone digits: phone punctuation only, enough digits to be selective
+    PHONE_TERM = re.compile(r'[\d\s+().-]+')
+    PHONE_MIN_DIGITS = 4
+    
+    @staticmethod
+    def phone_digits_term(search_term):
+        """Digits of a term that looks like a phone number, else None"""
+        if not SearchHelper.PHONE_TERM.fullmatch(search_term or ''):
+            return None
+        digits = Patient.normalize_phone(search_term)
+        return digits if len(digits) >= SearchHelper.PHONE_MIN_DIGITS else None
+    
     @staticmethod
-    def build_search_query(search_term, search_fields=None):
+    def use_indexed_search(using=None):
+        """
+        Whether text search can rely on the pg_trgm indexes on this database
+        """
+        from django.db import connections, DEFAULT_DB_ALIAS
+        
+        if PatientConfig.get_search_mode() != 'auto':
+            return False
+        return connections[using or DEFAULT_DB_ALIAS].vendor == 'postgresql'
+    
+    @staticmethod
+    def build_search_query(search_term, search_fields=None, indexed=None):
         """
         Build Q object for search across multiple fields
+        
+        In indexed mode phone fields are matched on their normalized digits so
+        that '(555) 123-4567' and '555.123.4567' find the same patient; every
+        lookup is served by a trigram GIN index on PostgreSQL. Only terms that
+        look like phone numbers are matched against phone digits, so the digit
+        in 'john.doe1@x.com' does not match every phone containing a 1.
         """
         from django.db.models import Q
         
         if not search_fields:
             search_fields = PatientConfig.get_search_fields()
+        if indexed is None:
+            indexed = SearchHelper.use_indexed_search()
         
         q_objects = Q()
         for field in search_fields:
+            if indexed and field in SearchHelper.PHONE_FIELDS:
+                digits = SearchHelper.phone_digits_term(search_term)
+                if digits:
+                    q_objects |= Q(**{f"{SearchHelper.PHONE_FIELDS[field]}__contains": digits})
+                continue
             q_objects |= Q(**{f"{field}__icontains": search_term})
         
         return q_objects
     
+    @staticmethod
+    def search(queryset, search_term, search_fields=None, rank=None):
+        """
+        Filter a patient queryset by a text search term
+        
+        Falls back to plain icontains filters on databases without pg_trgm.
+        When indexed, results are annotated with search_rank (best trigram
+        similarity across the name and email fields) for relevance ordering.
+        """
+        indexed = SearchHelper.use_indexed_search(queryset.db)
+        queryset = queryset.filter(
+            SearchHelper.build_search_query(search_term, search_fields, indexed=indexed)
+        )
+        
+        if rank is None:
+            rank = PatientConfig.DATABASE['search_rank_results']
+        if not (indexed and rank):
+            return queryset
+        
+        from django.contrib.postgres.search import TrigramSimilarity
+        from django.db.models.functions import Greatest
+        
+        if not search_fields:
+            search_fields = PatientConfig.get_search_fields()
+        similarities = [
+            TrigramSimilarity(field, search_term)
+            for field in search_fields if field not in SearchHelper.PHONE_FIELDS
+        ]
+        if not similarities:
+            return queryset
+        search_rank = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+        return queryset.annotate(search_rank=search_rank).order_by('-search_rank', *PatientConfig.DATABASE['default_ordering'])
+    
     @staticmethod
     def apply_filters(queryset, filters):
         """
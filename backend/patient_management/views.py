@@ -2,24 +2,30 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q, Count, Case, When, IntegerField, CharField
-from django.db import models
+from rest_framework.parsers import MultiPartParser, FormParser
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse, FileResponse
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
 from django.contrib.auth import get_user_model
-from datetime import datetime, timedelta
-import csv
-import json
+from datetime import timedelta
+import os
 from io import StringIO
 
-from .models import Patient, PatientNote, PatientAuditLog
+from .models import Patient, PatientNote, PatientExportJob
 from .serializers import (
     PatientListSerializer, PatientDetailSerializer, PatientCreateSerializer, 
     PatientUpdateSerializer, PatientNoteSerializer, PatientDashboardStatsSerializer,
-    PatientSearchSerializer, PatientExportSerializer, BulkActionSerializer
+    PatientSearchSerializer, PatientExportSerializer, BulkActionSerializer,
+    PatientExportJobSerializer
 )
 from .config import PatientConfig
-from .utils import PatientUtils, AuditLogger
+from .utils import PatientUtils, AuditLogger, SearchHelper, DashboardStats
+from .signals import patients_bulk_changed
+from .pagination import PatientCursorPagination
+from .exports import EXPORT_FORMATS, PatientExporter, filter_export_queryset
+from .export_jobs import get_or_create_export_job
+from .imports import IMPORT_FORMATS, PatientImporter, detect_import_format, parse_import_rows
 
 User = get_user_model()
 
@@ -40,21 +46,26 @@ class PatientViewSet(viewsets.ModelViewSet):
     pagination_class = PatientPagination
     permission_classes = [permissions.IsAuthenticated]
     
+    @property
+    def paginator(self):
+        """
+        Page-number pagination by default, keyset pagination when opted in
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params if self.request else {}
+            use_cursor = (
+                PatientConfig.get_pagination_mode() == 'cursor'
+                or params.get('pagination') == 'cursor'
+                or 'cursor' in params
+            )
+            self._paginator = PatientCursorPagination() if use_cursor else self.pagination_class()
+        return self._paginator
+    
     def get_queryset(self):
         """
         Get patients based on doctor data isolation setting
         """
-        if PatientConfig.is_doctor_isolation_enabled():
-            # Doctor can only see their own patients
-            return Patient.objects.filter(
-                doctor=self.request.user,
-                is_active=True
-            ).select_related('doctor')
-        else:
-            # Admin can see all patients
-            return Patient.objects.filter(
-                is_active=True
-            ).select_related('doctor')
+        return PatientUtils.get_patient_queryset(self.request.user).select_related('doctor')
     
     def get_serializer_class(self):
         """
@@ -115,7 +126,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         try:
             instance = self.get_object()
             patient_name = f"{instance.first_name} {instance.last_name}"
-            patient_id = instance.patient_id
+            patient_id = str(instance.id)
             
             # Get deletion configuration from request or use default
             deletion_type = request.data.get('deletion_type', 'soft') if hasattr(request, 'data') else 'soft'
@@ -187,80 +198,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         """
         Get dashboard statistics
         """
-        queryset = self.get_queryset()
-        today = timezone.now().date()
-        
-        # Basic counts
-        total_patients = queryset.count()
-        active_patients = queryset.filter(status='ACTIVE').count()
-        inactive_patients = queryset.filter(status='INACTIVE').count()
-        critical_patients = queryset.filter(priority='CRITICAL').count()
-        new_patients_today = queryset.filter(created_at__date=today).count()
-        
-        # Mock appointments data (replace with actual appointment model when available)
-        appointments_today = 0  # Replace with actual query
-        
-        # Group by gender
-        by_gender = queryset.values('gender').annotate(
-            count=Count('id')
-        ).order_by('gender')
-        gender_stats = {item['gender']: item['count'] for item in by_gender}
-        
-        # Group by age
-        by_age_group = queryset.annotate(
-            age_group=Case(
-                When(date_of_birth__gte=datetime.now().date() - timedelta(days=30*365), then='18-30'),
-                When(date_of_birth__gte=datetime.now().date() - timedelta(days=50*365), then='30-50'),
-                When(date_of_birth__gte=datetime.now().date() - timedelta(days=70*365), then='50-70'),
-                default='70+',
-                output_field=models.CharField()
-            )
-        ).values('age_group').annotate(count=Count('id'))
-        age_stats = {item['age_group']: item['count'] for item in by_age_group}
-        
-        # Group by priority
-        by_priority = queryset.values('priority').annotate(
-            count=Count('id')
-        ).order_by('priority')
-        priority_stats = {item['priority']: item['count'] for item in by_priority}
-        
-        # Group by status
-        by_status = queryset.values('status').annotate(
-            count=Count('id')
-        ).order_by('status')
-        status_stats = {item['status']: item['count'] for item in by_status}
-        
-        # Recent activities (from audit log if enabled)
-        recent_activities = []
-        if PatientConfig.is_audit_enabled():
-            recent_logs = PatientAuditLog.objects.filter(
-                patient__doctor=request.user
-            ).select_related('patient', 'user')[:10]
-            
-            recent_activities = [
-                {
-                    'id': log.id,
-                    'action': log.action,
-                    'patient_name': log.patient.full_name,
-                    'user': log.user.get_full_name() or log.user.username,
-                    'timestamp': log.created_at
-                }
-                for log in recent_logs
-            ]
-        
-        stats_data = {
-            'total_patients': total_patients,
-            'active_patients': active_patients,
-            'inactive_patients': inactive_patients,
-            'critical_patients': critical_patients,
-            'new_patients_today': new_patients_today,
-            'appointments_today': appointments_today,
-            'by_gender': gender_stats,
-            'by_age_group': age_stats,
-            'by_priority': priority_stats,
-            'by_status': status_stats,
-            'recent_activities': recent_activities
-        }
+        stats_data = DashboardStats.get(request.user, self.get_queryset())
         
         serializer = PatientDashboardStatsSerializer(stats_data)
         return Response(serializer.data)
@@ -278,12 +216,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         
         # Text search
         if 'q' in params:
-            search_query = params['q']
-            search_fields = PatientConfig.get_search_fields()
-            q_objects = Q()
-            for field in search_fields:
-                q_objects |= Q(**{f"{field}__icontains": search_query})
-            queryset = queryset.filter(q_objects)
+            queryset = SearchHelper.search(queryset, params['q'])
         
         # Filter by status
         if 'status' in params:
@@ -341,27 +274,96 @@ class PatientViewSet(viewsets.ModelViewSet):
         fields = params.get('fields', None)
         filters = params.get('filters', {})
         
-        # Apply filters
-        queryset = self.get_queryset()
-        if filters:
-            search_serializer = PatientSearchSerializer(data=filters)
-            search_serializer.is_valid(raise_exception=True)
-            # Apply same filtering logic as search
-            # ... (filtering code similar to search action)
-        
-        # Limit records for export
-        max_records = PatientConfig.REPORTS['max_records_per_report']
-        queryset = queryset[:max_records]
-        
-        if export_format == 'csv':
-            return self._export_csv(queryset, fields)
-        elif export_format == 'json':
-            return self._export_json(queryset, fields)
-        else:
+        if export_format not in EXPORT_FORMATS:
             return Response(
                 {'error': 'Unsupported export format'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        if params.get('mode') == 'job':
+            if export_format not in PatientConfig.REPORTS['export_job_formats']:
+                return Response(
+                    {'error': 'Unsupported export format for background jobs'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            job, created = get_or_create_export_job(request.user, export_format, fields, filters)
+            return Response(
+                PatientExportJobSerializer(job, context={'request': request}).data,
+                status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+            )
+        
+        queryset = filter_export_queryset(self.get_queryset(), filters)
+        exporter = PatientExporter(queryset, fields=fields, export_format=export_format)
+        
+        response = StreamingHttpResponse(exporter.stream(), content_type=exporter.content_type)
+        response['Content-Disposition'] = f'attachment; filename="{exporter.filename()}"'
+        return response
+    
+    def _get_export_job(self, request, job_id):
+        """
+        Export job owned by the requesting user (staff may see any job)
+        """
+        jobs = PatientExportJob.objects.all()
+        if not request.user.is_staff:
+            jobs = jobs.filter(requested_by=request.user)
+        try:
+            return jobs.get(pk=job_id)
+        except (PatientExportJob.DoesNotExist, ValidationError):
+            raise NotFound('Export job not found')
+    
+    @action(detail=False, methods=['get'], url_path=r'export-jobs/(?P<job_id>[0-9a-fA-F-]+)')
+    def export_job(self, request, job_id=None):
+        """
+        Background export job status and progress
+        """
+        job = self._get_export_job(request, job_id)
+        return Response(PatientExportJobSerializer(job, context={'request': request}).data)
+    
+    @action(detail=False, methods=['get'], url_path=r'export-jobs/(?P<job_id>[0-9a-fA-F-]+)/download')
+    def export_job_download(self, request, job_id=None):
+        """
+        Download the compressed file of a finished export job
+        """
+        job = self._get_export_job(request, job_id)
+        if job.status != 'COMPLETED' or not os.path.exists(job.file_path):
+            return Response(
+                {'error': 'Export is not ready', 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        filename = f"patients_{job.created_at.strftime('%Y%m%d_%H%M%S')}.{job.export_format}.gz"
+        return FileResponse(
+            open(job.file_path, 'rb'),
+            as_attachment=True,
+            filename=filename,
+            content_type='application/gzip'
+        )
+    
+    @action(detail=False, methods=['post'], url_path='bulk-import', parser_classes=[MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        """
+        Import patients from an uploaded CSV or NDJSON file
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'A CSV or NDJSON file is required in the "file" field'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        import_format = request.data.get('format') or detect_import_format(upload.name)
+        if import_format not in IMPORT_FORMATS:
+            return Response(
+                {'error': 'Unsupported import format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        importer = PatientImporter(request.user, request=request, dry_run=dry_run)
+        report = importer.run(parse_import_rows(upload, import_format))
+        
+        response_status = status.HTTP_201_CREATED if report['created'] and not dry_run else status.HTTP_200_OK
+        return Response(report, status=response_status)
     
     @action(detail=False, methods=['post'])
     def bulk_actions(self, request):
@@ -376,27 +378,36 @@ class PatientViewSet(viewsets.ModelViewSet):
         patient_ids = params['patient_ids']
         action_data = params.get('data', {})
         
-        # Get patients (with permission check)
-        queryset = self.get_queryset().filter(id__in=patient_ids)
+        # Only patients visible to the user are touched
+        queryset = self.get_queryset()
         
         if action_type == 'update_status':
             new_status = action_data.get('status')
             if new_status in [choice[0] for choice in PatientConfig.get_status_choices()]:
-                queryset.update(status=new_status, updated_at=timezone.now())
-                count = queryset.count()
-                return Response({'message': f'Updated status for {count} patients'})
+                count, doctor_ids = PatientUtils.bulk_update(
+                    queryset, patient_ids, {'status': new_status, 'updated_at': timezone.now()},
+                    user=request.user, audit_action='UPDATE', request=request
+                )
+                patients_bulk_changed.send(sender=Patient, doctor_ids=doctor_ids)
+                return Response({'message': f'Updated status for {count} patients', 'count': count})
         
         elif action_type == 'update_priority':
             new_priority = action_data.get('priority')
             if new_priority in [choice[0] for choice in PatientConfig.get_priority_choices()]:
-                queryset.update(priority=new_priority, updated_at=timezone.now())
-                count = queryset.count()
-                return Response({'message': f'Updated priority for {count} patients'})
+                count, doctor_ids = PatientUtils.bulk_update(
+                    queryset, patient_ids, {'priority': new_priority, 'updated_at': timezone.now()},
+                    user=request.user, audit_action='UPDATE', request=request
+                )
+                patients_bulk_changed.send(sender=Patient, doctor_ids=doctor_ids)
+                return Response({'message': f'Updated priority for {count} patients', 'count': count})
         
         elif action_type == 'delete':
-            count = queryset.count()
-            queryset.update(is_active=False, updated_at=timezone.now())
-            return Response({'message': f'Deleted {count} patients'})
+            count, doctor_ids = PatientUtils.bulk_update(
+                queryset, patient_ids, {'is_active': False, 'updated_at': timezone.now()},
+                user=request.user, audit_action='DELETE', request=request
+            )
+            patients_bulk_changed.send(sender=Patient, doctor_ids=doctor_ids)
+            return Response({'message': f'Deleted {count} patients', 'count': count})
         
         return Response(
             {'error': 'Invalid bulk action'},
@@ -420,59 +431,3 @@ class PatientViewSet(viewsets.ModelViewSet):
             serializer.is_valid(raise_exception=True)
             serializer.save(patient=patient, created_by=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-    
-    def _export_csv(self, queryset, fields=None):
-        """
-        Export patients data as CSV
-        """
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="patients_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-        
-        if not fields:
-            fields = ['full_name', 'age', 'gender', 'phone', 'email', 'status', 'priority', 'created_at']
-        
-        writer = csv.writer(response)
-        
-        # Write header
-        header = []
-        for field in fields:
-            header.append(field.replace('_', ' ').title())
-        writer.writerow(header)
-        
-        # Write data
-        for patient in queryset:
-            row = []
-            for field in fields:
-                if hasattr(patient, field):
-                    value = getattr(patient, field)
-                    if callable(value):
-                        value = value()
-                    row.append(str(value) if value is not None else '')
-                else:
-                    row.append('')
-            writer.writerow(row)
-        
-        return response
-    
-    def _export_json(self, queryset, fields=None):
-        """
-        Export patients data as JSON
-        """
-        serializer = PatientListSerializer(queryset, many=True)
-        data = serializer.data
-        
-        if fields:
-            # Filter fields
-            filtered_data = []
-            for item in data:
-                filtered_item = {field: item.get(field) for field in fields if field in item}
-                filtered_data.append(filtered_item)
-            data = filtered_data
-        
-        response = HttpResponse(
-            json.dumps(data, indent=2, default=str),
-            content_type='application/json'
-        )
-        response['Content-Disposition'] = f'attachment; filename="patients_{timezone.now().strftime("%Y%m%d_%H%M%S")}.json"'
-        
-        return response
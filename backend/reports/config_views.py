@@ -90,6 +90,10 @@ def get_config_templates(request):
             'vocabulary_timeout': 3600,
             'content_timeout': 86400,
             'max_cache_size': 1000,
+            'stale_timeout': 604800,
+            'early_expiration_beta': 1.0,
+            'refresh_lock_timeout': 900,
+            'refresh_wait_timeout': 30,
             'description': 'Cache configuration for performance optimization'
         },
         'analysis': {
@@ -160,11 +164,18 @@ def validate_config(request):
         if 'cache' in config_to_validate:
             cache_config = config_to_validate['cache']
             
-            for timeout_field in ['vocabulary_timeout', 'content_timeout']:
+            for timeout_field in ['vocabulary_timeout', 'content_timeout', 'stale_timeout',
+                                  'refresh_lock_timeout', 'refresh_wait_timeout']:
                 if timeout_field in cache_config:
                     if not isinstance(cache_config[timeout_field], int) or cache_config[timeout_field] < 0:
                         validation_results['errors'].append(f'{timeout_field} must be a non-negative integer')
                         validation_results['valid'] = False
+            
+            if 'early_expiration_beta' in cache_config:
+                beta = cache_config['early_expiration_beta']
+                if not isinstance(beta, (int, float)) or beta < 0:
+                    validation_results['errors'].append('early_expiration_beta must be a non-negative number')
+                    validation_results['valid'] = False
         
         # Validate analysis configuration
         if 'analysis' in config_to_validate:
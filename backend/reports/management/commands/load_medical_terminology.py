@@ -0,0 +1,81 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.local_terminology_store import (
+    LocalTerminologyStore, local_terminology_store, parse_mesh_descriptors,
+    parse_vocabulary_file, builtin_vocabulary_records
+)
+
+
+class Command(BaseCommand):
+    help = 'Load MeSH descriptors and downloaded vocabularies into the local SQLite FTS5 terminology mirror'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mesh',
+            help='Path to a MeSH descriptor XML dump (e.g. desc2025.xml)',
+        )
+        parser.add_argument(
+            '--vocabulary',
+            nargs=2,
+            action='append',
+            metavar=('SOURCE', 'PATH'),
+            default=[],
+            help='Load a CSV/TSV/NDJSON vocabulary file under the given source name (repeatable)',
+        )
+        parser.add_argument(
+            '--include-builtin',
+            action='store_true',
+            help='Also index the built-in vocabularies',
+        )
+        parser.add_argument(
+            '--db-path',
+            help='Override MEDICAL_LOCAL_TERMINOLOGY_DB for this run',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Records inserted per batch',
+        )
+
+    def handle(self, *args, **options):
+        store = LocalTerminologyStore(options['db_path']) if options['db_path'] else local_terminology_store
+
+        if not options['mesh'] and not options['vocabulary'] and not options['include_builtin']:
+            raise CommandError('Nothing to load: pass --mesh, --vocabulary and/or --include-builtin')
+
+        self.stdout.write(f"=== LOADING LOCAL TERMINOLOGY INTO {store.db_path} ===\n")
+
+        if options['mesh']:
+            self._check_file(options['mesh'])
+            count = store.load(
+                'mesh',
+                parse_mesh_descriptors(options['mesh']),
+                origin=os.path.basename(options['mesh']),
+                batch_size=options['batch_size']
+            )
+            self.stdout.write(f"MeSH descriptors: {count}")
+
+        for source, path in options['vocabulary']:
+            self._check_file(path)
+            if source == 'mesh':
+                raise CommandError("Source name 'mesh' is reserved for --mesh")
+            count = store.load(
+                source,
+                parse_vocabulary_file(path),
+                origin=os.path.basename(path),
+                batch_size=options['batch_size']
+            )
+            self.stdout.write(f"{source}: {count}")
+
+        if options['include_builtin']:
+            count = store.load('builtin', builtin_vocabulary_records(), origin='medical_terminology_config')
+            self.stdout.write(f"Built-in vocabulary: {count}")
+
+        self.stdout.write(self.style.SUCCESS("Local terminology mirror loaded."))
+
+    def _check_file(self, path):
+        if not os.path.isfile(path):
+            raise CommandError(f'File not found: {path}')
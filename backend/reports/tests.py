@@ -1,3 +1,145 @@
-from django.test import TestCase
+import asyncio
+from unittest.mock import patch
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from services.free_medical_terminology_service import FreeMedicalTerminologyService
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.status = 200
+        self.payload = payload
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def json(self):
+        return self.payload
+
+
+class FakePubMedSession:
+    """esearch returns the IDs listed per term; esummary the requested or stored documents"""
+
+    def __init__(self, ids_by_term, titles):
+        self.ids_by_term = ids_by_term
+        self.titles = titles
+        self.requests = []
+        self.history = {}
+
+    def post(self, url, data):
+        self.requests.append((url.rsplit('/', 1)[-1], data))
+        if url.endswith('esearch.fcgi'):
+            ids = self.ids_by_term.get(data['term'], [])
+            if data.get('usehistory') != 'y':
+                return FakeResponse({'esearchresult': {'idlist': ids}})
+            self.history['env-1'] = ids
+            return FakeResponse({'esearchresult': {'idlist': ids, 'querykey': '1', 'webenv': 'env-1'}})
+        ids = self.history[data['WebEnv']] if 'WebEnv' in data else data['id'].split(',')
+        result = {doc_id: {'title': self.titles[doc_id]} for doc_id in ids}
+        result['uids'] = ids
+        return FakeResponse({'result': result})
+
+
+class PubMedBatchTests(SimpleTestCase):
+    """Batched PubMed lookups return what each query's own search returns"""
+
+    def fetch(self, queries, ids_by_term, titles, attribution, max_results=20):
+        service = FreeMedicalTerminologyService()
+        service.session = FakePubMedSession(ids_by_term, titles)
+        with patch.dict(service.config.API_CONFIG, {'pubmed_batch_attribution': attribution}):
+            results = asyncio.run(service._fetch_pubmed_batch(queries, max_results))
+        return results, service.session.requests
+
+    def test_combined_search_costs_two_requests(self):
+        queries = ['pneumothorax', 'pleural effusion', 'nodule']
+        term = (
+            '(("pneumothorax"[Title/Abstract]) OR ("pleural effusion"[Title/Abstract]) '
+            'OR ("nodule"[Title/Abstract])) AND radiology'
+        )
+        titles = {
+            '1': 'Tension pneumothorax on chest CT',
+            '2': 'Malignant pleural effusion',
+            '3': 'Pneumothorax after pleural effusion drainage',
+            '4': 'Abstract-only match',
+        }
+        results, requests = self.fetch(queries, {term: ['1', '2', '3', '4']}, titles, 'title')
+
+        self.assertEqual([name for name, _ in requests], ['esearch.fcgi', 'esummary.fcgi'])
+        self.assertEqual(requests[0][1]['usehistory'], 'y')
+        self.assertEqual(requests[1][1]['WebEnv'], 'env-1')
+        self.assertEqual({item['id'] for item in results['pneumothorax']}, {'1', '3'})
+        self.assertEqual({item['id'] for item in results['pleural effusion']}, {'2', '3'})
+        self.assertEqual(results['nodule'], [])
+
+    def test_requests_are_timed_as_external_calls(self):
+        with patch('api.metrics.metrics.observe_external') as observe:
+            self.fetch(['nodule'], {}, {}, 'exact')
+
+        self.assertEqual([call.args[0] for call in observe.call_args_list], ['ncbi_pubmed'])
+
+    def test_exact_attribution_keeps_each_query_own_results(self):
+        titles = {str(doc_id): f'Unrelated title {doc_id}' for doc_id in range(40)}
+        broad = [str(doc_id) for doc_id in range(20)]
+        service = FreeMedicalTerminologyService
+        results, requests = self.fetch(
+            ['pneumothorax', 'nodule'],
+            {service._pubmed_term('pneumothorax'): broad, service._pubmed_term('nodule'): ['30', '31']},
+            titles, 'exact'
+        )
+
+        # Abstract-only matches are kept; the broad query is capped on its own
+        self.assertEqual({item['id'] for item in results['pneumothorax']}, set(broad[:10]))
+        self.assertEqual({item['id'] for item in results['nodule']}, {'30', '31'})
+        self.assertEqual([name for name, _ in requests], ['esearch.fcgi', 'esearch.fcgi', 'esummary.fcgi'])
+
+    def test_embedded_quotes_do_not_break_the_phrase(self):
+        term = FreeMedicalTerminologyService._pubmed_term('"ground glass" opacity')
+        self.assertEqual(term, '("ground glass opacity"[Title/Abstract]) AND radiology')
+
+
+class MeshLocalFirstTests(SimpleTestCase):
+    """Local MeSH hits never wait on the MeSH Browser API"""
+
+    def setUp(self):
+        self.service = FreeMedicalTerminologyService()
+        self.local = [{
+            'source_id': 'D010996', 'term': 'Pleural Effusion', 'definition': '', 'tree_numbers': [],
+            'synonyms': [], 'relevance_score': 1.0, 'url': 'https://meshb.nlm.nih.gov/record/ui?ui=D010996'
+        }]
+        self.api = [{
+            'mesh_id': 'D016066', 'term': 'Pleural Effusion, Malignant', 'definition': '', 'category': 'mesh_heading',
+            'tree_numbers': [], 'synonyms': [], 'relevance_score': 0.8, 'url': ''
+        }]
+
+    def search(self, local):
+        with patch.object(self.service, 'search_local_terminology', return_value=local), \
+                patch.object(self.service, '_local_store_active', return_value=True), \
+                patch.object(self.service, '_fetch_mesh_api', return_value=self.api) as fetch, \
+                patch.object(self.service, '_start_mesh_enrichment') as enrich:
+            results = asyncio.run(self.service.search_mesh_terms('pleural effusion'))
+        return results, fetch, enrich
+
+    def test_local_hits_are_returned_and_enriched_in_background(self):
+        results, fetch, enrich = self.search(self.local)
+
+        self.assertEqual([item['mesh_id'] for item in results], ['D010996'])
+        fetch.assert_not_called()
+        enrich.assert_called_once_with('pleural effusion', 15, results)
+
+    def test_api_is_awaited_without_local_hits(self):
+        results, fetch, enrich = self.search([])
+
+        self.assertEqual([item['mesh_id'] for item in results], ['D016066'])
+        enrich.assert_not_called()
+
+    def test_enrichment_merges_into_the_cached_entry(self):
+        local_results, _, _ = self.search(self.local)
+        with patch.object(self.service, '_fetch_mesh_api', return_value=self.api):
+            asyncio.run(self.service._enrich_mesh_terms('pleural effusion', 15, local_results))
+
+        cached = asyncio.run(self.service.search_mesh_terms('pleural effusion'))
+        self.assertEqual([item['mesh_id'] for item in cached], ['D010996', 'D016066'])
@@ -6,6 +6,7 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from django.conf import settings
 from services.rag_service import radiology_rag_service
 from services.advanced_rag_fallback import advanced_rag_fallback
+from api.metrics import track_external_call
 import openai
 import time
 import json
@@ -301,15 +302,16 @@ class AnalyzeReportView(APIView):
             Format the response as JSON with clear categories.
             """
             
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a medical AI assistant specializing in radiology report analysis."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1500,
-                temperature=0.3
-            )
+            with track_external_call('openai'):
+                response = openai.ChatCompletion.create(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {"role": "system", "content": "You are a medical AI assistant specializing in radiology report analysis."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=1500,
+                    temperature=0.3
+                )
             
             return {
                 'ai_feedback': response.choices[0].message.content,
@@ -398,13 +400,9 @@ class RAGContentUpdateView(APIView):
             
             logger.info(f"Force updating RAG content, max_pages: {max_pages}")
             
-            # Clear cache and fetch fresh content
-            from django.core.cache import cache
-            cache_key = f"radiology_content_{max_pages}"
-            cache.delete(cache_key)
-            
-            # Fetch fresh content
-            content = radiology_rag_service.fetch_medical_terminology(max_pages=max_pages)
+            # Mark every cached crawl stale and fetch fresh content
+            radiology_rag_service.invalidate_medical_terminology()
+            content = radiology_rag_service.fetch_medical_terminology(max_pages=max_pages, force_refresh=True)
             
             return Response({
                 'message': 'RAG content updated successfully',
@@ -12,7 +12,9 @@ import asyncio
 import openai
 from django.conf import settings
 from .free_medical_terminology_service import free_medical_terminology_service
+from .vocabulary_index import VocabularyMatcher
 from config.ai_settings import get_openai_config, get_medical_config, is_feature_enabled, get_system_message
+from api.metrics import track_external_call
 from typing import Dict, List, Optional
 from collections import defaultdict
 
@@ -25,6 +27,7 @@ class AdvancedRAGFallback:
         self.medical_vocabulary = self._initialize_medical_vocabulary()
         self.correction_rules = self._initialize_correction_rules()
         self.clinical_patterns = self._initialize_clinical_patterns()
+        self.term_matchers = self._initialize_term_matchers()
         
     def _initialize_medical_vocabulary(self) -> Dict:
         """Initialize comprehensive medical vocabulary"""
@@ -69,6 +72,16 @@ class AdvancedRAGFallback:
             }
         }
     
+    def _initialize_term_matchers(self) -> Dict[str, VocabularyMatcher]:
+        """Compile one multi-term matcher per vocabulary group"""
+        matchers = {}
+        for group in ['anatomical_terms', 'pathological_terms', 'imaging_terms']:
+            terms = [term for terms in self.medical_vocabulary[group].values() for term in terms]
+            # Terms are matched as written against the lowercased report
+            matchers[group] = VocabularyMatcher(terms, ignore_case=False)
+        matchers['abbreviations'] = VocabularyMatcher(list(self.medical_vocabulary['abbreviations']), ignore_case=False)
+        return matchers
+    
     def _initialize_correction_rules(self) -> List[Dict]:
         """Initialize common medical report correction rules"""
         return [
@@ -128,48 +141,70 @@ class AdvancedRAGFallback:
     
     async def fetch_external_medical_terms(self, query: str) -> Dict:
         """Fetch medical terms from free external sources"""
+        return (await self.fetch_external_medical_terms_many([query]))[query]
+    
+    async def fetch_external_medical_terms_many(self, queries: List[str]) -> Dict[str, Dict]:
+        """Fetch medical terms for several queries concurrently in one service session
+        
+        Running the searches together lets the terminology service batch
+        their PubMed requests into shared round trips.
+        """
+        empty_terms = {'anatomical': [], 'pathological': [], 'imaging': [], 'abbreviations': []}
         try:
-            logger.info(f"Fetching external medical terms for: {query}")
+            logger.info(f"Fetching external medical terms for: {', '.join(queries)}")
             
             async with free_medical_terminology_service as service:
                 # Search multiple free sources
-                external_results = await service.comprehensive_search(query, max_results_per_source=5)
-                
-                # Process and combine results
-                combined_terms = {
-                    'anatomical': [],
-                    'pathological': [],
-                    'imaging': [],
-                    'abbreviations': []
-                }
-                
-                for source, results in external_results.items():
-                    for result in results:
-                        term_data = {
-                            'term': result.get('term', ''),
-                            'source': source,
-                            'relevance': result.get('relevance_score', 0),
-                            'definition': result.get('definition', ''),
-                            'url': result.get('url', '')
-                        }
-                        
-                        # Categorize based on result category or content
-                        category = result.get('category', 'pathological')
-                        if category in ['radiology_anatomy', 'anatomy']:
-                            combined_terms['anatomical'].append(term_data)
-                        elif category in ['pathological_findings', 'pathology']:
-                            combined_terms['pathological'].append(term_data)
-                        elif category in ['imaging_terminology', 'imaging']:
-                            combined_terms['imaging'].append(term_data)
-                        else:
-                            combined_terms['pathological'].append(term_data)
-                
-                logger.info(f"Fetched {sum(len(terms) for terms in combined_terms.values())} external terms")
-                return combined_terms
+                search_results = await asyncio.gather(
+                    *[service.comprehensive_search(query, max_results_per_source=5) for query in queries],
+                    return_exceptions=True
+                )
+            
+            combined = {}
+            for query, external_results in zip(queries, search_results):
+                if isinstance(external_results, Exception):
+                    logger.error(f"Failed to fetch external medical terms for {query}: {str(external_results)}")
+                    combined[query] = {category: [] for category in empty_terms}
+                else:
+                    combined[query] = self._combine_external_results(external_results)
+            return combined
                 
         except Exception as e:
             logger.error(f"Failed to fetch external medical terms: {str(e)}")
-            return {'anatomical': [], 'pathological': [], 'imaging': [], 'abbreviations': []}
+            return {query: {category: [] for category in empty_terms} for query in queries}
+    
+    def _combine_external_results(self, external_results: Dict) -> Dict:
+        """Process and combine results from all sources by category"""
+        combined_terms = {
+            'anatomical': [],
+            'pathological': [],
+            'imaging': [],
+            'abbreviations': []
+        }
+        
+        for source, results in external_results.items():
+            for result in results:
+                term_data = {
+                    'term': result.get('term', ''),
+                    'source': source,
+                    'relevance': result.get('relevance_score', 0),
+                    'definition': result.get('definition', ''),
+                    'url': result.get('url', '')
+                }
+                
+                # Categorize based on result category or content
+                category = result.get('category', 'pathological')
+                if category in ['radiology_anatomy', 'anatomy']:
+                    combined_terms['anatomical'].append(term_data)
+                elif category in ['pathological_findings', 'pathology']:
+                    combined_terms['pathological'].append(term_data)
+                elif category in ['imaging_terminology', 'imaging']:
+                    combined_terms['imaging'].append(term_data)
+                else:
+                    combined_terms['pathological'].append(term_data)
+        
+        logger.info(f"Fetched {sum(len(terms) for terms in combined_terms.values())} external terms")
+        return combined_terms
     
     def enhance_report_analysis_with_external(self, report_text: str) -> Dict:
         """Enhanced analysis that attempts to fetch external medical terms first"""
@@ -185,11 +220,12 @@ class AdvancedRAGFallback:
                     loop = asyncio.new_event_loop()
                     asyncio.set_event_loop(loop)
                     
-                    for query in potential_queries[:3]:  # Limit to top 3 queries
-                        external_result = loop.run_until_complete(
-                            self.fetch_external_medical_terms(query)
-                        )
-                        
+                    # Limit to top 3 queries, searched together so upstream requests can be batched
+                    external_results = loop.run_until_complete(
+                        self.fetch_external_medical_terms_many(potential_queries[:3])
+                    )
+                    
+                    for external_result in external_results.values():
                         # Merge external results
                         for category, terms in external_result.items():
                             if category not in external_terms:
@@ -286,11 +322,15 @@ class AdvancedRAGFallback:
             }
             
             report_lower = report_text.lower()
+            found = {
+                group: set(matcher.matched_terms(report_text if group == 'abbreviations' else report_lower))
+                for group, matcher in self.term_matchers.items()
+            }
             
             # Detect anatomical terms
             for category, terms in self.medical_vocabulary['anatomical_terms'].items():
                 for term in terms:
-                    if re.search(rf'\b{re.escape(term)}\b', report_lower):
+                    if term in found['anatomical_terms']:
                         analysis['detected_terms']['anatomical'].append({
                             'term': term,
                             'category': category,
@@ -300,7 +340,7 @@ class AdvancedRAGFallback:
             # Detect pathological terms
             for category, terms in self.medical_vocabulary['pathological_terms'].items():
                 for term in terms:
-                    if re.search(rf'\b{re.escape(term)}\b', report_lower):
+                    if term in found['pathological_terms']:
                         analysis['detected_terms']['pathological'].append({
                             'term': term,
                             'category': category,
@@ -310,7 +350,7 @@ class AdvancedRAGFallback:
             # Detect imaging terms
             for category, terms in self.medical_vocabulary['imaging_terms'].items():
                 for term in terms:
-                    if re.search(rf'\b{re.escape(term)}\b', report_lower):
+                    if term in found['imaging_terms']:
                         analysis['detected_terms']['imaging'].append({
                             'term': term,
                             'category': category,
@@ -319,7 +359,7 @@ class AdvancedRAGFallback:
             
             # Detect abbreviations
             for abbrev, full_form in self.medical_vocabulary['abbreviations'].items():
-                if re.search(rf'\b{re.escape(abbrev)}\b', report_text):
+                if abbrev in found['abbreviations']:
                     analysis['detected_terms']['abbreviations'].append({
                         'abbreviation': abbrev,
                         'definition': full_form,
@@ -514,19 +554,20 @@ class AdvancedRAGFallback:
                 primary_model = openai_config['PRIMARY_MODEL']
                 max_tokens = openai_config['MAX_TOKENS'].get(primary_model, 2000)
                 
-                response = openai.ChatCompletion.create(
-                    model=primary_model,
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": get_system_message('MEDICAL_EXPERT') + " " + get_system_message('JSON_RESPONSE')
-                        },
-                        {"role": "user", "content": analysis_prompt}
-                    ],
-                    max_tokens=max_tokens,
-                    temperature=openai_config['TEMPERATURE'],
-                    timeout=openai_config['TIMEOUT']
-                )
+                with track_external_call('openai'):
+                    response = openai.ChatCompletion.create(
+                        model=primary_model,
+                        messages=[
+                            {
+                                "role": "system", 
+                                "content": get_system_message('MEDICAL_EXPERT') + " " + get_system_message('JSON_RESPONSE')
+                            },
+                            {"role": "user", "content": analysis_prompt}
+                        ],
+                        max_tokens=max_tokens,
+                        temperature=openai_config['TEMPERATURE'],
+                        timeout=openai_config['TIMEOUT']
+                    )
                 
                 logger.info(f"Successfully used primary model: {primary_model}")
                 
@@ -539,19 +580,20 @@ class AdvancedRAGFallback:
                     fallback_model = openai_config['FALLBACK_MODEL']
                     fallback_tokens = openai_config['MAX_TOKENS'].get(fallback_model, 1500)
                     
-                    response = openai.ChatCompletion.create(
-                        model=fallback_model,
-                        messages=[
-                            {
-                                "role": "system", 
-                                "content": get_system_message('FALLBACK_ANALYSIS') + " " + get_system_message('JSON_RESPONSE')
-                            },
-                            {"role": "user", "content": analysis_prompt}
-                        ],
-                        max_tokens=fallback_tokens,
-                        temperature=openai_config['TEMPERATURE'],
-                        timeout=openai_config['TIMEOUT']
-                    )
+                    with track_external_call('openai'):
+                        response = openai.ChatCompletion.create(
+                            model=fallback_model,
+                            messages=[
+                                {
+                                    "role": "system", 
+                                    "content": get_system_message('FALLBACK_ANALYSIS') + " " + get_system_message('JSON_RESPONSE')
+                                },
+                                {"role": "user", "content": analysis_prompt}
+                            ],
+                            max_tokens=fallback_tokens,
+                            temperature=openai_config['TEMPERATURE'],
+                            timeout=openai_config['TIMEOUT']
+                        )
                     
                     logger.info(f"Successfully used fallback model: {fallback_model}")
                     
@@ -565,18 +607,19 @@ class AdvancedRAGFallback:
                         backup_model = openai_config['BACKUP_MODEL']
                         backup_tokens = openai_config['MAX_TOKENS'].get(backup_model, 1000)
                         
-                        response = openai.ChatCompletion.create(
-                            model=backup_model,
-                            messages=[
-                                {
-                                    "role": "system", 
-                                    "content": get_system_message('FALLBACK_ANALYSIS')
-                                },
-                                {"role": "user", "content": analysis_prompt}
-                            ],
-                            max_tokens=backup_tokens,
-                            temperature=openai_config['TEMPERATURE']
-                        )
+                        with track_external_call('openai'):
+                            response = openai.ChatCompletion.create(
+                                model=backup_model,
+                                messages=[
+                                    {
+                                        "role": "system", 
+                                        "content": get_system_message('FALLBACK_ANALYSIS')
+                                    },
+                                    {"role": "user", "content": analysis_prompt}
+                                ],
+                                max_tokens=backup_tokens,
+                                temperature=openai_config['TEMPERATURE']
+                            )
                         
                         logger.info(f"Successfully used backup model: {backup_model}")
                     else:
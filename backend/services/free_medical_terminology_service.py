@@ -7,13 +7,16 @@ import asyncio
 import aiohttp
 import time
 import json
-import re
+import threading
 from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlencode, quote
 import logging
 from datetime import datetime, timedelta
 
+from api.metrics import track_external_call
 from config.medical_terminology_config import medical_terminology_config
+from .vocabulary_index import get_vocabulary_index, get_vocabulary_matcher
+from .local_terminology_store import local_terminology_store
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +25,20 @@ class FreeMedicalTerminologyService:
     
     def __init__(self):
         self.config = medical_terminology_config
+        self.local_store = local_terminology_store
         self.session = None
         self.cache = {}
         self.rate_limiters = {}
         
+        # Pending PubMed queries awaiting a batched round trip
+        self._pubmed_pending = {}
+        self._pubmed_flush_handle = None
+        self._pubmed_loop = None
+        
+        # MeSH queries whose local hits are being enriched in the background
+        self._mesh_enriching = set()
+        self._mesh_enriching_lock = threading.Lock()
+        
         # Initialize rate limiters
         for source, limit in self.config.get_rate_limits().items():
             self.rate_limiters[source] = {
@@ -63,6 +76,12 @@ class FreeMedicalTerminologyService:
         self.rate_limiters[source] = rate_info
         return True
     
+    async def _wait_for_rate_limit(self, source: str):
+        """Wait until a request to this source fits in its rate limit"""
+        limit = max(self.rate_limiters.get(source, {}).get('limit', 1), 1)
+        while not self._check_rate_limit(source):
+            await asyncio.sleep(1.0 / limit)
+    
     def _get_cache_key(self, source: str, query: str, params: Dict = None) -> str:
         """Generate cache key"""
         cache_data = f"{source}:{query}"
@@ -92,35 +111,69 @@ class FreeMedicalTerminologyService:
                 'timestamp': time.time()
             }
     
+    def _local_store_active(self) -> bool:
+        """Check if the local terminology mirror is enabled and loaded"""
+        return self.config.LOCAL_TERMINOLOGY['enabled'] and self.local_store.is_available()
+    
+    def _network_enrichment_allowed(self) -> bool:
+        """Network sources are always used without a local mirror, optionally with one"""
+        return not self._local_store_active() or self.config.LOCAL_TERMINOLOGY['network_enrichment']
+    
+    def search_local_terminology(self, query: str, max_results: int = 10, source: Optional[str] = None) -> List[Dict]:
+        """Search the local terminology mirror (MeSH and downloaded vocabularies)"""
+        if not self._local_store_active():
+            return []
+        
+        candidates = self.local_store.search(
+            query,
+            max_results=max_results * self.config.LOCAL_TERMINOLOGY['candidate_multiplier'],
+            source=source
+        )
+        for record in candidates:
+            record['relevance_score'] = max(
+                self._calculate_relevance(query, name) for name in [record['term'], *record['synonyms']]
+            )
+        
+        # Sort by relevance
+        candidates.sort(key=lambda x: x['relevance_score'], reverse=True)
+        return candidates[:max_results]
+    
     async def search_ncbi_pubmed(self, query: str, max_results: int = 20) -> List[Dict]:
         """Search NCBI PubMed for medical terms and articles"""
-        if not self._check_rate_limit('ncbi_pubmed'):
-            await asyncio.sleep(1.0)
+        if not self._network_enrichment_allowed():
+            return []
         
         cache_key = self._get_cache_key('ncbi_pubmed', query, {'max_results': max_results})
         
         if self._is_cache_valid(cache_key):
             return self.cache[cache_key]['data']
         
+        if self.config.API_CONFIG['pubmed_batching']:
+            return await self._enqueue_pubmed_query(query, max_results)
+        
+        if not self._check_rate_limit('ncbi_pubmed'):
+            await asyncio.sleep(1.0)
+        
         try:
             # First, search for IDs
             search_url = self.config.FREE_SOURCES['ncbi_pubmed']['base_url'] + 'esearch.fcgi'
             search_params = {
                 'db': 'pubmed',
-                'term': f'("{query}"[Title/Abstract]) AND radiology',
+                'term': self._pubmed_term(query),
                 'retmax': max_results,
                 'retmode': 'json',
                 'tool': 'medixscan',
                 'email': 'noreply@medixscan.com'
             }
             
-            async with self.session.get(search_url, params=search_params) as response:
-                if response.status != 200:
-                    logger.error(f"PubMed search failed: {response.status}")
-                    return []
-                
-                search_data = await response.json()
-                id_list = search_data.get('esearchresult', {}).get('idlist', [])
+            with track_external_call('ncbi_pubmed'):
+                async with self.session.get(search_url, params=search_params) as response:
+                    if response.status != 200:
+                        logger.error(f"PubMed search failed: {response.status}")
+                        return []
+                    
+                    search_data = await response.json()
+                    id_list = search_data.get('esearchresult', {}).get('idlist', [])
             
             if not id_list:
                 logger.info(f"No PubMed results found for: {query}")
@@ -136,39 +189,308 @@ class FreeMedicalTerminologyService:
                 'email': 'noreply@medixscan.com'
             }
             
-            async with self.session.get(summary_url, params=summary_params) as response:
-                if response.status != 200:
-                    logger.error(f"PubMed summary failed: {response.status}")
-                    return []
-                
-                summary_data = await response.json()
-                results = []
-                
-                for doc_id, doc_data in summary_data.get('result', {}).items():
-                    if doc_id == 'uids':
-                        continue
+            with track_external_call('ncbi_pubmed'):
+                async with self.session.get(summary_url, params=summary_params) as response:
+                    if response.status != 200:
+                        logger.error(f"PubMed summary failed: {response.status}")
+                        return []
                     
-                    results.append({
-                        'id': doc_id,
-                        'title': doc_data.get('title', ''),
-                        'authors': doc_data.get('authors', []),
-                        'source': doc_data.get('source', ''),
-                        'pubdate': doc_data.get('pubdate', ''),
-                        'keywords': self._extract_medical_terms(doc_data.get('title', '')),
-                        'relevance_score': self._calculate_relevance(query, doc_data.get('title', '')),
-                        'url': f"https://pubmed.ncbi.nlm.nih.gov/{doc_id}/"
-                    })
-                
-                # Sort by relevance
-                results.sort(key=lambda x: x['relevance_score'], reverse=True)
+                    summary_data = await response.json()
+            
+            results = []
+            for doc_id, doc_data in summary_data.get('result', {}).items():
+                if doc_id == 'uids':
+                    continue
                 
-                self._cache_data(cache_key, results)
-                return results
+                results.append(self._format_pubmed_result(query, doc_id, doc_data))
+            
+            # Sort by relevance
+            results.sort(key=lambda x: x['relevance_score'], reverse=True)
+            
+            self._cache_data(cache_key, results)
+            return results
         
         except Exception as e:
             logger.error(f"PubMed search error: {str(e)}")
             return []
     
+    @staticmethod
+    def _pubmed_phrase(query: str) -> str:
+        """Title/Abstract clause for a query phrase; embedded quotes would end the phrase early"""
+        phrase = ' '.join(query.replace('"', ' ').split())
+        return f'("{phrase}"[Title/Abstract])'
+    
+    @classmethod
+    def _pubmed_term(cls, query: str) -> str:
+        """esearch term for a single query"""
+        return f'{cls._pubmed_phrase(query)} AND radiology'
+    
+    def _format_pubmed_result(self, query: str, doc_id: str, doc_data: Dict, relevance: Optional[float] = None) -> Dict:
+        """Shape an esummary document as a search result for query"""
+        title = doc_data.get('title', '')
+        return {
+            'id': doc_id,
+            'title': title,
+            'authors': doc_data.get('authors', []),
+            'source': doc_data.get('source', ''),
+            'pubdate': doc_data.get('pubdate', ''),
+            'keywords': self._extract_medical_terms(title),
+            'relevance_score': self._calculate_relevance(query, title) if relevance is None else relevance,
+            'url': f"https://pubmed.ncbi.nlm.nih.gov/{doc_id}/"
+        }
+    
+    async def search_ncbi_pubmed_batch(self, queries: List[str], max_results: int = 20) -> Dict[str, List[Dict]]:
+        """Search NCBI PubMed for several queries, sharing esearch/esummary round trips per batch"""
+        results = {}
+        pending = []
+        
+        for query in dict.fromkeys(queries):
+            cache_key = self._get_cache_key('ncbi_pubmed', query, {'max_results': max_results})
+            if self._is_cache_valid(cache_key):
+                results[query] = self.cache[cache_key]['data']
+            else:
+                pending.append(query)
+        
+        if not self._network_enrichment_allowed():
+            results.update({query: [] for query in pending})
+            return results
+        
+        batch_size = max(self.config.API_CONFIG['pubmed_batch_size'], 1)
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            batch_results = await self._fetch_pubmed_batch(batch, max_results)
+            
+            for query in batch:
+                query_results = batch_results.get(query)
+                if query_results is None:
+                    results[query] = []
+                    continue
+                self._cache_data(
+                    self._get_cache_key('ncbi_pubmed', query, {'max_results': max_results}),
+                    query_results
+                )
+                results[query] = query_results
+        
+        return results
+    
+    async def _fetch_pubmed_batch(self, queries: List[str], max_results: int) -> Dict[str, List[Dict]]:
+        """Fetch one batch with the configured attribution strategy
+        
+        Queries missing from the returned dict failed upstream and are not cached.
+        """
+        if self.config.API_CONFIG['pubmed_batch_attribution'] == 'exact':
+            return await self._fetch_pubmed_batch_exact(queries, max_results)
+        return await self._fetch_pubmed_batch_combined(queries, max_results)
+    
+    async def _fetch_pubmed_batch_combined(self, queries: List[str], max_results: int) -> Dict[str, List[Dict]]:
+        """Run one OR-joined esearch on the history server and one esummary over its WebEnv
+        
+        Two requests per batch whatever its size. Each document is attributed to
+        the queries whose title it is relevant to, so a hit that matched a query
+        only in its abstract is dropped.
+        """
+        base_url = self.config.FREE_SOURCES['ncbi_pubmed']['base_url']
+        per_query_limit = min(max_results, 10)  # Same cap as the single-query summary
+        
+        try:
+            joined_terms = ' OR '.join(self._pubmed_phrase(query) for query in queries)
+            search_params = {
+                'db': 'pubmed',
+                'term': f'({joined_terms}) AND radiology',
+                'retmax': max_results * len(queries),
+                'usehistory': 'y',
+                'retmode': 'json',
+                'tool': 'medixscan',
+                'email': 'noreply@medixscan.com'
+            }
+            
+            await self._wait_for_rate_limit('ncbi_pubmed')
+            with track_external_call('ncbi_pubmed'):
+                async with self.session.post(base_url + 'esearch.fcgi', data=search_params) as response:
+                    if response.status != 200:
+                        logger.error(f"PubMed batch search failed: {response.status}")
+                        return {}
+                    
+                    search_result = (await response.json()).get('esearchresult', {})
+            
+            if not search_result.get('idlist'):
+                logger.info(f"No PubMed results found for batch of {len(queries)} queries")
+                return {query: [] for query in queries}
+            
+            # Summaries for the union of IDs straight from the history server
+            summary_params = {
+                'db': 'pubmed',
+                'query_key': search_result.get('querykey'),
+                'WebEnv': search_result.get('webenv'),
+                'retmax': len(search_result['idlist']),
+                'retmode': 'json',
+                'tool': 'medixscan',
+                'email': 'noreply@medixscan.com'
+            }
+            
+            await self._wait_for_rate_limit('ncbi_pubmed')
+            with track_external_call('ncbi_pubmed'):
+                async with self.session.post(base_url + 'esummary.fcgi', data=summary_params) as response:
+                    if response.status != 200:
+                        logger.error(f"PubMed batch summary failed: {response.status}")
+                        return {}
+                    
+                    summary_data = await response.json()
+        
+        except Exception as e:
+            logger.error(f"PubMed batch search error: {str(e)}")
+            return {}
+        
+        documents = [
+            (doc_id, doc_data) for doc_id, doc_data in summary_data.get('result', {}).items()
+            if doc_id != 'uids'
+        ]
+        
+        results = {}
+        for query in queries:
+            query_results = []
+            for doc_id, doc_data in documents:
+                relevance = self._calculate_relevance(query, doc_data.get('title', ''))
+                if relevance > 0:
+                    query_results.append(self._format_pubmed_result(query, doc_id, doc_data, relevance))
+            
+            # Sort by relevance
+            query_results.sort(key=lambda x: x['relevance_score'], reverse=True)
+            results[query] = query_results[:per_query_limit]
+        
+        return results
+    
+    async def _search_pubmed_ids(self, query: str, max_results: int) -> Optional[List[str]]:
+        """esearch IDs for one query, or None when the request failed"""
+        search_params = {
+            'db': 'pubmed',
+            'term': self._pubmed_term(query),
+            'retmax': max_results,
+            'retmode': 'json',
+            'tool': 'medixscan',
+            'email': 'noreply@medixscan.com'
+        }
+        
+        await self._wait_for_rate_limit('ncbi_pubmed')
+        with track_external_call('ncbi_pubmed'):
+            async with self.session.post(
+                self.config.FREE_SOURCES['ncbi_pubmed']['base_url'] + 'esearch.fcgi', data=search_params
+            ) as response:
+                if response.status != 200:
+                    logger.error(f"PubMed search failed for {query!r}: {response.status}")
+                    return None
+                
+                search_data = await response.json()
+                return search_data.get('esearchresult', {}).get('idlist', [])
+    
+    async def _fetch_pubmed_batch_exact(self, queries: List[str], max_results: int) -> Dict[str, List[Dict]]:
+        """Run every query's esearch concurrently, then one esummary for the union of their top IDs
+        
+        Each query keeps exactly the documents its own esearch returned, capped
+        like the single-query path. That costs N + 1 requests for N queries
+        instead of 2N, so this saves at most half the round trips; the
+        esearches only overlap in time, within the rate limit.
+        """
+        base_url = self.config.FREE_SOURCES['ncbi_pubmed']['base_url']
+        per_query_limit = min(max_results, 10)  # Same cap as the single-query summary
+        
+        try:
+            id_lists = await asyncio.gather(
+                *(self._search_pubmed_ids(query, max_results) for query in queries)
+            )
+            ids_by_query = {
+                query: ids[:per_query_limit]
+                for query, ids in zip(queries, id_lists) if ids is not None
+            }
+            
+            union_ids = list(dict.fromkeys(doc_id for ids in ids_by_query.values() for doc_id in ids))
+            if not union_ids:
+                if ids_by_query:
+                    logger.info(f"No PubMed results found for batch of {len(queries)} queries")
+                return {query: [] for query in ids_by_query}
+            
+            # One summary request for every query of the batch
+            summary_params = {
+                'db': 'pubmed',
+                'id': ','.join(union_ids),
+                'retmode': 'json',
+                'tool': 'medixscan',
+                'email': 'noreply@medixscan.com'
+            }
+            
+            await self._wait_for_rate_limit('ncbi_pubmed')
+            with track_external_call('ncbi_pubmed'):
+                async with self.session.post(base_url + 'esummary.fcgi', data=summary_params) as response:
+                    if response.status != 200:
+                        logger.error(f"PubMed batch summary failed: {response.status}")
+                        return {}
+                    
+                    summary_data = await response.json()
+        
+        except Exception as e:
+            logger.error(f"PubMed batch search error: {str(e)}")
+            return {}
+        
+        documents = summary_data.get('result', {})
+        results = {}
+        for query, ids in ids_by_query.items():
+            query_results = [
+                self._format_pubmed_result(query, doc_id, documents[doc_id])
+                for doc_id in ids if doc_id in documents
+            ]
+            
+            # Sort by relevance
+            query_results.sort(key=lambda x: x['relevance_score'], reverse=True)
+            results[query] = query_results
+        
+        return results
+    
+    async def _enqueue_pubmed_query(self, query: str, max_results: int) -> List[Dict]:
+        """Queue a PubMed query to be sent with other pending queries"""
+        loop = asyncio.get_running_loop()
+        if self._pubmed_loop is not loop:
+            # Batches never span event loops
+            self._pubmed_pending = {}
+            self._pubmed_flush_handle = None
+            self._pubmed_loop = loop
+        
+        future = loop.create_future()
+        self._pubmed_pending.setdefault((query, max_results), []).append(future)
+        
+        if len(self._pubmed_pending) >= self.config.API_CONFIG['pubmed_batch_size']:
+            loop.create_task(self._flush_pubmed_queries())
+        elif self._pubmed_flush_handle is None:
+            self._pubmed_flush_handle = loop.call_later(
+                self.config.API_CONFIG['pubmed_batch_window'],
+                lambda: loop.create_task(self._flush_pubmed_queries())
+            )
+        
+        return await future
+    
+    async def _flush_pubmed_queries(self):
+        """Send every pending PubMed query and resolve the waiting callers"""
+        if self._pubmed_flush_handle is not None:
+            self._pubmed_flush_handle.cancel()
+            self._pubmed_flush_handle = None
+        
+        pending, self._pubmed_pending = self._pubmed_pending, {}
+        
+        queries_by_limit = {}
+        for query, max_results in pending:
+            queries_by_limit.setdefault(max_results, []).append(query)
+        
+        for max_results, queries in queries_by_limit.items():
+            try:
+                batch_results = await self.search_ncbi_pubmed_batch(queries, max_results)
+            except Exception as e:
+                logger.error(f"PubMed batch flush error: {str(e)}")
+                batch_results = {}
+            
+            for query in queries:
+                for future in pending[(query, max_results)]:
+                    if not future.done():
+                        future.set_result(batch_results.get(query, []))
+    
     async def search_radiopaedia(self, query: str, max_results: int = 10) -> List[Dict]:
         """Search Radiopaedia for radiology cases and articles"""
         if not self._check_rate_limit('radiopaedia'):
@@ -187,20 +509,18 @@ class FreeMedicalTerminologyService:
             results = []
             query_lower = query.lower()
             
-            # Search through built-in radiology vocabularies
-            for category_name, category_data in self.config.BUILTIN_VOCABULARIES.items():
-                for subcategory, terms in category_data.items():
-                    for term in terms:
-                        if query_lower in term.lower() or term.lower() in query_lower:
-                            results.append({
-                                'term': term,
-                                'category': category_name,
-                                'subcategory': subcategory,
-                                'source': 'radiopaedia_equivalent',
-                                'definition': self._get_term_definition(term),
-                                'relevance_score': self._calculate_relevance(query, term),
-                                'url': f"https://radiopaedia.org/search?q={quote(term)}"
-                            })
+            # Search built-in radiology vocabularies through the n-gram index
+            index = get_vocabulary_index(self.config)
+            for entry in index.substring_matches(query_lower):
+                results.append({
+                    'term': entry.term,
+                    'category': entry.category,
+                    'subcategory': entry.subcategory,
+                    'source': 'radiopaedia_equivalent',
+                    'definition': entry.definition,
+                    'relevance_score': self._calculate_relevance(query, entry.term),
+                    'url': f"https://radiopaedia.org/search?q={quote(entry.term)}"
+                })
             
             # Sort by relevance and limit results
             results.sort(key=lambda x: x['relevance_score'], reverse=True)
@@ -214,15 +534,42 @@ class FreeMedicalTerminologyService:
             return []
     
     async def search_mesh_terms(self, query: str, max_results: int = 15) -> List[Dict]:
-        """Search MeSH (Medical Subject Headings) terms"""
-        if not self._check_rate_limit('mesh_terms'):
-            await asyncio.sleep(1.0)
+        """Search MeSH (Medical Subject Headings) terms
         
+        Local mirror hits are returned straight away; with network enrichment
+        allowed, the MeSH Browser API results are merged into the cached entry
+        by a background thread. The API is only awaited when the mirror has no
+        hit for the query.
+        """
         cache_key = self._get_cache_key('mesh_terms', query, {'max_results': max_results})
         
         if self._is_cache_valid(cache_key):
             return self.cache[cache_key]['data']
         
+        results = [
+            self._format_mesh_result(record)
+            for record in self.search_local_terminology(query, max_results, source='mesh')
+        ]
+        
+        if results or not self._network_enrichment_allowed():
+            self._cache_data(cache_key, results)
+            if results and len(results) < max_results and self._network_enrichment_allowed():
+                self._start_mesh_enrichment(query, max_results, results)
+            return results
+        
+        if not self._check_rate_limit('mesh_terms'):
+            await asyncio.sleep(1.0)
+        
+        api_results = await self._fetch_mesh_api(self.session, query, max_results)
+        if api_results is None:
+            return results
+        
+        results = self._merge_mesh_results(results, api_results, max_results)
+        self._cache_data(cache_key, results)
+        return results
+    
+    async def _fetch_mesh_api(self, session, query: str, max_results: int) -> Optional[List[Dict]]:
+        """MeSH Browser API results for a query, or None when the request failed"""
         try:
             # MeSH Browser API (free)
             search_url = "https://meshb.nlm.nih.gov/api/search"
@@ -233,36 +580,94 @@ class FreeMedicalTerminologyService:
                 'resultFormat': 'json'
             }
             
-            async with self.session.get(search_url, params=params) as response:
-                if response.status != 200:
-                    logger.error(f"MeSH search failed: {response.status}")
-                    return []
-                
-                mesh_data = await response.json()
-                results = []
-                
-                # Process MeSH results
-                for item in mesh_data.get('results', [])[:max_results]:
-                    results.append({
-                        'mesh_id': item.get('ui', ''),
-                        'term': item.get('name', ''),
-                        'definition': item.get('scopeNote', ''),
-                        'category': 'mesh_heading',
-                        'tree_numbers': item.get('treeNumbers', []),
-                        'synonyms': item.get('synonyms', []),
-                        'relevance_score': self._calculate_relevance(query, item.get('name', '')),
-                        'url': f"https://meshb.nlm.nih.gov/record/ui?ui={item.get('ui', '')}"
-                    })
-                
-                # Sort by relevance
-                results.sort(key=lambda x: x['relevance_score'], reverse=True)
-                
-                self._cache_data(cache_key, results)
-                return results
+            with track_external_call('mesh'):
+                async with session.get(search_url, params=params) as response:
+                    if response.status != 200:
+                        logger.error(f"MeSH search failed: {response.status}")
+                        return None
+                    
+                    mesh_data = await response.json()
+            
+            return [
+                {
+                    'mesh_id': item.get('ui', ''),
+                    'term': item.get('name', ''),
+                    'definition': item.get('scopeNote', ''),
+                    'category': 'mesh_heading',
+                    'tree_numbers': item.get('treeNumbers', []),
+                    'synonyms': item.get('synonyms', []),
+                    'relevance_score': self._calculate_relevance(query, item.get('name', '')),
+                    'url': f"https://meshb.nlm.nih.gov/record/ui?ui={item.get('ui', '')}"
+                }
+                for item in mesh_data.get('results', [])[:max_results]
+            ]
         
         except Exception as e:
             logger.error(f"MeSH search error: {str(e)}")
-            return []
+            return None
+    
+    @staticmethod
+    def _merge_mesh_results(results: List[Dict], api_results: List[Dict], max_results: int) -> List[Dict]:
+        """Local results plus the API results they do not already hold"""
+        known_ids = {result['mesh_id'] for result in results}
+        merged = results + [result for result in api_results if result['mesh_id'] not in known_ids]
+        
+        # Sort by relevance
+        merged.sort(key=lambda x: x['relevance_score'], reverse=True)
+        return merged[:max_results]
+    
+    def _start_mesh_enrichment(self, query: str, max_results: int, results: List[Dict]):
+        """Merge MeSH Browser API results into a cached local entry off the request path"""
+        key = (query, max_results)
+        with self._mesh_enriching_lock:
+            if key in self._mesh_enriching:
+                return
+            self._mesh_enriching.add(key)
+        
+        thread = threading.Thread(
+            target=self._run_mesh_enrichment,
+            args=(query, max_results, results),
+            name='mesh-enrichment',
+            daemon=True
+        )
+        thread.start()
+    
+    def _run_mesh_enrichment(self, query: str, max_results: int, results: List[Dict]):
+        try:
+            asyncio.run(self._enrich_mesh_terms(query, max_results, results))
+        except Exception as e:
+            logger.error(f"MeSH enrichment error: {str(e)}")
+        finally:
+            with self._mesh_enriching_lock:
+                self._mesh_enriching.discard((query, max_results))
+    
+    async def _enrich_mesh_terms(self, query: str, max_results: int, results: List[Dict]):
+        """Fetch API results in a session of this thread's loop and cache the merged entry"""
+        await self._wait_for_rate_limit('mesh_terms')
+        async with aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.config.API_CONFIG['timeout']),
+            headers={'User-Agent': self.config.USER_AGENT}
+        ) as session:
+            api_results = await self._fetch_mesh_api(session, query, max_results)
+        
+        if api_results:
+            self._cache_data(
+                self._get_cache_key('mesh_terms', query, {'max_results': max_results}),
+                self._merge_mesh_results(results, api_results, max_results)
+            )
+    
+    def _format_mesh_result(self, record: Dict) -> Dict:
+        """Shape a local MeSH record like a MeSH Browser API result"""
+        return {
+            'mesh_id': record['source_id'],
+            'term': record['term'],
+            'definition': record['definition'],
+            'category': 'mesh_heading',
+            'tree_numbers': record['tree_numbers'],
+            'synonyms': record['synonyms'],
+            'relevance_score': record['relevance_score'],
+            'url': record['url']
+        }
     
     def search_builtin_vocabulary(self, query: str, max_results: int = 20) -> List[Dict]:
         """Search built-in medical vocabulary"""
@@ -272,23 +677,19 @@ class FreeMedicalTerminologyService:
             return self.cache[cache_key]['data']
         
         results = []
-        query_lower = query.lower()
-        
-        # Search all built-in vocabularies
-        for category_name, category_data in self.config.BUILTIN_VOCABULARIES.items():
-            for subcategory, terms in category_data.items():
-                for term in terms:
-                    relevance = self._calculate_relevance(query, term)
-                    if relevance > 0.1:  # Only include reasonably relevant terms
-                        results.append({
-                            'term': term,
-                            'category': category_name,
-                            'subcategory': subcategory,
-                            'source': 'builtin_vocabulary',
-                            'definition': self._get_term_definition(term),
-                            'relevance_score': relevance,
-                            'corrections': self._get_term_corrections(term)
-                        })
+        
+        # Only candidate terms from the token/n-gram postings are scored
+        index = get_vocabulary_index(self.config)
+        for entry, relevance in index.search(query, min_score=0.1):  # Only include reasonably relevant terms
+            results.append({
+                'term': entry.term,
+                'category': entry.category,
+                'subcategory': entry.subcategory,
+                'source': 'builtin_vocabulary',
+                'definition': entry.definition,
+                'relevance_score': relevance,
+                'corrections': [dict(correction) for correction in entry.corrections]
+            })
         
         # Sort by relevance and limit results
         results.sort(key=lambda x: x['relevance_score'], reverse=True)
@@ -319,6 +720,13 @@ class FreeMedicalTerminologyService:
         # Always include built-in vocabulary
         results['builtin_vocabulary'] = self.search_builtin_vocabulary(query, max_results_per_source)
         
+        # Downloaded vocabularies from the local mirror (MeSH is served by search_mesh_terms)
+        if self._local_store_active():
+            results['local_terminology'] = [
+                record for record in self.search_local_terminology(query, max_results_per_source * 2)
+                if record['source'] != 'mesh'
+            ][:max_results_per_source]
+        
         # Execute async tasks
         if tasks:
             completed_tasks = await asyncio.gather(*[task[1] for task in tasks], return_exceptions=True)
@@ -335,17 +743,14 @@ class FreeMedicalTerminologyService:
     
     def _extract_medical_terms(self, text: str) -> List[str]:
         """Extract medical terms from text"""
-        medical_terms = []
-        text_lower = text.lower()
-        
-        # Check against all built-in terms
-        all_terms = self.config.get_all_builtin_terms()
-        
-        for term in all_terms:
-            if re.search(rf'\b{re.escape(term.lower())}\b', text_lower):
-                medical_terms.append(term)
-        
-        return medical_terms
+        return get_vocabulary_matcher(self.config).matched_terms(text)
+    
+    def find_medical_terms(self, text: str) -> List[Dict]:
+        """Find every built-in medical term occurrence in text with its offsets"""
+        return [
+            {'term': match.term, 'start': match.start, 'end': match.end}
+            for match in get_vocabulary_matcher(self.config).find_all(text)
+        ]
     
     def _calculate_relevance(self, query: str, text: str) -> float:
         """Calculate relevance score between query and text"""
@@ -382,38 +787,13 @@ class FreeMedicalTerminologyService:
     def _get_term_definition(self, term: str) -> str:
         """Get definition for a medical term"""
         # This would ideally connect to medical dictionaries
-        # For now, provide basic definitions based on term categories
-        
-        definitions = {
-            'lungs': 'Paired respiratory organs responsible for gas exchange',
-            'heart': 'Muscular organ that pumps blood throughout the body',
-            'liver': 'Large organ that processes nutrients and detoxifies blood',
-            'kidneys': 'Paired organs that filter blood and produce urine',
-            'brain': 'Central organ of the nervous system',
-            'mass': 'Abnormal tissue growth or collection of cells',
-            'lesion': 'Area of abnormal tissue change or damage',
-            'nodule': 'Small, rounded growth or mass of tissue',
-            'enhancement': 'Increased signal intensity after contrast administration',
-            'consolidation': 'Replacement of air in lung tissue with fluid or solid material'
-        }
-        
-        return definitions.get(term.lower(), f'Medical term: {term}')
+        # For now, provide basic definitions from the configured definitions
+        return self.config.TERM_DEFINITIONS.get(term.lower(), f'Medical term: {term}')
     
-    def _get_term_corrections(self, term: str) -> List[str]:
+    def _get_term_corrections(self, term: str) -> List[Dict]:
         """Get suggested corrections for a term"""
-        corrections = []
-        
-        # Check all correction categories
-        for correction_type, correction_dict in self.config.TERMINOLOGY_CORRECTIONS.items():
-            if term.lower() in correction_dict:
-                corrections.append({
-                    'type': correction_type,
-                    'original': term,
-                    'corrected': correction_dict[term.lower()],
-                    'reason': f'{correction_type.replace("_", " ").title()} improvement'
-                })
-        
-        return corrections
+        index = get_vocabulary_index(self.config)
+        return [dict(correction) for correction in index.corrections_for(term)]
     
     def get_service_status(self) -> Dict:
         """Get status of all medical terminology sources"""
@@ -442,10 +822,19 @@ class FreeMedicalTerminologyService:
             'available': True,
             'free': True,
             'description': 'Built-in medical vocabularies',
-            'total_terms': len(self.config.get_all_builtin_terms()),
+            'total_terms': get_vocabulary_matcher(self.config).term_count,
             'categories': len(self.config.BUILTIN_VOCABULARIES)
         }
         
+        # Local terminology mirror status
+        status['sources']['local_terminology'] = {
+            **self.local_store.get_stats(),
+            'available': self._local_store_active(),
+            'free': True,
+            'description': 'Local SQLite FTS5 mirror of MeSH and downloaded vocabularies',
+            'network_enrichment': self.config.LOCAL_TERMINOLOGY['network_enrichment']
+        }
+        
         return status
 
 # Global service instance
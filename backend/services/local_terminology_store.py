@@ -0,0 +1,309 @@
+"""
+Local Medical Terminology Store
+SQLite FTS5 mirror of MeSH descriptors and downloaded vocabularies for
+offline, low-latency terminology lookups
+"""
+
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, Iterator, List, Optional
+import logging
+
+from config.medical_terminology_config import medical_terminology_config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    term TEXT NOT NULL,
+    term_lower TEXT NOT NULL,
+    definition TEXT NOT NULL DEFAULT '',
+    category TEXT NOT NULL DEFAULT '',
+    tree_numbers TEXT NOT NULL DEFAULT '[]',
+    synonyms TEXT NOT NULL DEFAULT '[]',
+    url TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS terms_term_lower_idx ON terms (term_lower);
+CREATE UNIQUE INDEX IF NOT EXISTS terms_source_id_idx ON terms (source, source_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS terms_fts USING fts5(
+    term, synonyms,
+    content='terms', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    record_count INTEGER NOT NULL,
+    origin TEXT NOT NULL,
+    loaded_at REAL NOT NULL
+);
+"""
+
+MESH_RECORD_URL = 'https://meshb.nlm.nih.gov/record/ui?ui={}'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def parse_mesh_descriptors(path: str) -> Iterator[Dict]:
+    """Stream DescriptorRecord elements from a MeSH descriptor XML dump (descYYYY.xml)"""
+    for _, element in ET.iterparse(path, events=('end',)):
+        if element.tag != 'DescriptorRecord':
+            continue
+
+        descriptor_ui = element.findtext('DescriptorUI', default='').strip()
+        name = element.findtext('DescriptorName/String', default='').strip()
+        tree_numbers = [node.text.strip() for node in element.findall('TreeNumberList/TreeNumber') if node.text]
+
+        scope_note = ''
+        synonyms = []
+        for concept in element.findall('ConceptList/Concept'):
+            if concept.get('PreferredConceptYN') == 'Y' and not scope_note:
+                scope_note = (concept.findtext('ScopeNote') or '').strip()
+            for term_string in concept.findall('TermList/Term/String'):
+                text = (term_string.text or '').strip()
+                if text and text != name and text not in synonyms:
+                    synonyms.append(text)
+
+        element.clear()
+
+        if descriptor_ui and name:
+            yield {
+                'source_id': descriptor_ui,
+                'term': name,
+                'definition': scope_note,
+                'category': 'mesh_heading',
+                'tree_numbers': tree_numbers,
+                'synonyms': synonyms,
+                'url': MESH_RECORD_URL.format(descriptor_ui)
+            }
+
+
+def parse_vocabulary_file(path: str) -> Iterator[Dict]:
+    """Stream records from a downloaded vocabulary in CSV/TSV or JSON lines format
+
+    Expected columns/keys: term (required), id, definition, category,
+    synonyms ('|' separated in CSV) and url.
+    """
+    if path.endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as handle:
+            for line_number, line in enumerate(handle, start=1):
+                if line.strip():
+                    yield _normalize_vocabulary_row(json.loads(line), line_number)
+        return
+
+    delimiter = '\t' if path.endswith(('.tsv', '.tab')) else ','
+    with open(path, encoding='utf-8', newline='') as handle:
+        for line_number, row in enumerate(csv.DictReader(handle, delimiter=delimiter), start=1):
+            synonyms = row.get('synonyms') or ''
+            row['synonyms'] = [item.strip() for item in synonyms.split('|') if item.strip()]
+            yield _normalize_vocabulary_row(row, line_number)
+
+
+def _normalize_vocabulary_row(row: Dict, line_number: int) -> Dict:
+    """Coerce a vocabulary row into the store record shape"""
+    term = (row.get('term') or '').strip()
+    return {
+        'source_id': str(row.get('id') or line_number),
+        'term': term,
+        'definition': (row.get('definition') or '').strip(),
+        'category': (row.get('category') or '').strip(),
+        'tree_numbers': list(row.get('tree_numbers') or []),
+        'synonyms': list(row.get('synonyms') or []),
+        'url': (row.get('url') or '').strip()
+    }
+
+
+def builtin_vocabulary_records(config=medical_terminology_config) -> Iterator[Dict]:
+    """Records for the built-in vocabularies so they share the local index"""
+    for category_name, category_data in config.BUILTIN_VOCABULARIES.items():
+        for subcategory, terms in category_data.items():
+            for term in terms:
+                yield {
+                    'source_id': f'{category_name}:{subcategory}:{term}',
+                    'term': term,
+                    'definition': config.TERM_DEFINITIONS.get(term.lower(), ''),
+                    'category': category_name,
+                    'tree_numbers': [],
+                    'synonyms': [],
+                    'url': ''
+                }
+
+
+class LocalTerminologyStore:
+    """Read-mostly SQLite FTS5 terminology index"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def is_available(self) -> bool:
+        """Whether the mirror has been loaded on this host"""
+        return self._reader() is not None
+
+    def _reader(self) -> Optional[sqlite3.Connection]:
+        """Per-thread read-only connection, opened lazily once the file exists"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            return connection
+        if not os.path.exists(self.db_path):
+            return None
+
+        try:
+            connection = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute('SELECT 1 FROM terms_fts LIMIT 1')
+        except sqlite3.Error as e:
+            logger.warning(f"Local terminology store unavailable: {str(e)}")
+            return None
+
+        self._local.connection = connection
+        return connection
+
+    def _writer(self) -> sqlite3.Connection:
+        """Writable connection with the schema in place"""
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        connection = sqlite3.connect(self.db_path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+    def load(self, source: str, records: Iterable[Dict], origin: str = '', batch_size: int = 1000) -> int:
+        """Replace all records of a source in a single transaction"""
+        connection = self._writer()
+        count = 0
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT INTO terms_fts(terms_fts, rowid, term, synonyms) "
+                    "SELECT 'delete', id, term, synonyms FROM terms WHERE source = ?",
+                    (source,)
+                )
+                connection.execute('DELETE FROM terms WHERE source = ?', (source,))
+
+                batch = []
+                for record in records:
+                    if not record.get('term'):
+                        continue
+                    batch.append(record)
+                    if len(batch) >= batch_size:
+                        count += self._insert_batch(connection, source, batch)
+                        batch = []
+                if batch:
+                    count += self._insert_batch(connection, source, batch)
+
+                connection.execute(
+                    'INSERT OR REPLACE INTO sources (source, record_count, origin, loaded_at) VALUES (?, ?, ?, ?)',
+                    (source, count, origin, time.time())
+                )
+            connection.execute("INSERT INTO terms_fts(terms_fts) VALUES ('optimize')")
+        finally:
+            connection.close()
+
+        logger.info(f"Loaded {count} {source} records into local terminology store")
+        return count
+
+    def _insert_batch(self, connection: sqlite3.Connection, source: str, batch: List[Dict]) -> int:
+        """Insert a batch of records and their FTS rows, skipping duplicate ids"""
+        inserted = 0
+        for record in batch:
+            synonyms = record.get('synonyms') or []
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO terms '
+                '(source, source_id, term, term_lower, definition, category, tree_numbers, synonyms, url) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    source,
+                    record['source_id'],
+                    record['term'],
+                    record['term'].lower(),
+                    record.get('definition', ''),
+                    record.get('category', ''),
+                    json.dumps(record.get('tree_numbers') or []),
+                    json.dumps(synonyms),
+                    record.get('url', '')
+                )
+            )
+            if cursor.rowcount != 1:
+                continue
+            connection.execute(
+                'INSERT INTO terms_fts(rowid, term, synonyms) VALUES (?, ?, ?)',
+                (cursor.lastrowid, record['term'], json.dumps(synonyms))
+            )
+            inserted += 1
+        return inserted
+
+    @staticmethod
+    def _match_expression(query: str) -> str:
+        """FTS5 MATCH expression with every query token as a prefix term"""
+        return ' '.join(f'"{token}"*' for token in _TOKEN_RE.findall(query.lower()))
+
+    def search(self, query: str, max_results: int = 15, source: Optional[str] = None) -> List[Dict]:
+        """Exact matches first, then FTS5 matches ranked by bm25"""
+        connection = self._reader()
+        expression = self._match_expression(query or '')
+        if connection is None or not expression:
+            return []
+
+        source_clause = 'AND t.source = ?' if source else ''
+        source_params = (source,) if source else ()
+
+        try:
+            exact_rows = connection.execute(
+                f'SELECT t.* FROM terms t WHERE t.term_lower = ? {source_clause} LIMIT ?',
+                (query.lower().strip(), *source_params, max_results)
+            ).fetchall()
+            fts_rows = connection.execute(
+                'SELECT t.* FROM terms_fts f JOIN terms t ON t.id = f.rowid '
+                f'WHERE terms_fts MATCH ? {source_clause} ORDER BY bm25(terms_fts) LIMIT ?',
+                (expression, *source_params, max_results)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Local terminology search error: {str(e)}")
+            return []
+
+        results = []
+        seen = set()
+        for row in list(exact_rows) + list(fts_rows):
+            if row['id'] in seen:
+                continue
+            seen.add(row['id'])
+            results.append({
+                'source': row['source'],
+                'source_id': row['source_id'],
+                'term': row['term'],
+                'definition': row['definition'],
+                'category': row['category'],
+                'tree_numbers': json.loads(row['tree_numbers']),
+                'synonyms': json.loads(row['synonyms']),
+                'url': row['url']
+            })
+        return results[:max_results]
+
+    def get_stats(self) -> Dict:
+        """Loaded sources and record counts"""
+        connection = self._reader()
+        if connection is None:
+            return {'available': False, 'db_path': self.db_path, 'sources': {}}
+
+        sources = {
+            row['source']: {
+                'records': row['record_count'],
+                'origin': row['origin'],
+                'loaded_at': row['loaded_at']
+            }
+            for row in connection.execute('SELECT * FROM sources')
+        }
+        return {'available': True, 'db_path': self.db_path, 'sources': sources}
+
+
+# Global store instance
+local_terminology_store = LocalTerminologyStore(medical_terminology_config.LOCAL_TERMINOLOGY['db_path'])
@@ -38,6 +38,10 @@ class CacheConfig:
     content_timeout: int = 86400    # 24 hours
     max_cache_size: int = 1000
     cache_prefix: str = "rag_"
+    stale_timeout: int = 604800     # 7 days of stale-while-revalidate
+    early_expiration_beta: float = 1.0
+    refresh_lock_timeout: int = 900  # 15 minutes
+    refresh_wait_timeout: int = 30
 
 @dataclass
 class AnalysisConfig:
@@ -158,7 +162,11 @@ class RAGConfig:
             vocabulary_timeout=cache_config.get('vocabulary_timeout', 3600),
             content_timeout=cache_config.get('content_timeout', 86400),
             max_cache_size=cache_config.get('max_cache_size', 1000),
-            cache_prefix=cache_config.get('cache_prefix', 'rag_')
+            cache_prefix=cache_config.get('cache_prefix', 'rag_'),
+            stale_timeout=cache_config.get('stale_timeout', 604800),
+            early_expiration_beta=cache_config.get('early_expiration_beta', 1.0),
+            refresh_lock_timeout=cache_config.get('refresh_lock_timeout', 900),
+            refresh_wait_timeout=cache_config.get('refresh_wait_timeout', 30)
         )
     
     def _get_analysis_config(self) -> AnalysisConfig:
@@ -253,7 +261,11 @@ class RAGConfig:
                 'vocabulary_timeout': self.cache.vocabulary_timeout,
                 'content_timeout': self.cache.content_timeout,
                 'max_cache_size': self.cache.max_cache_size,
-                'cache_prefix': self.cache.cache_prefix
+                'cache_prefix': self.cache.cache_prefix,
+                'stale_timeout': self.cache.stale_timeout,
+                'early_expiration_beta': self.cache.early_expiration_beta,
+                'refresh_lock_timeout': self.cache.refresh_lock_timeout,
+                'refresh_wait_timeout': self.cache.refresh_wait_timeout
             },
             'analysis': {
                 'openai_model': self.analysis.openai_model,
@@ -8,14 +8,19 @@ import requests
 from bs4 import BeautifulSoup
 import re
 import json
+import math
+import random
+import threading
 import time
-from typing import List, Dict, Optional
+import uuid
+from typing import List, Dict, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 import logging
 from django.conf import settings
 import hashlib
 from django.core.cache import cache
 from .rag_config import rag_config
+from api.metrics import track_external_call
 
 logger = logging.getLogger(__name__)
 
@@ -37,29 +42,153 @@ class RadiologyRAGService:
         self.delay_between_requests = self.source_config.delay_between_requests
         self.retry_attempts = self.source_config.retry_attempts
         
-    def fetch_medical_terminology(self, max_pages: Optional[int] = None) -> Dict:
+    def fetch_medical_terminology(self, max_pages: Optional[int] = None, force_refresh: bool = False) -> Dict:
         """
         Fetch medical terminology and content from radiologyassistant.nl
         
+        Cached content is served with stale-while-revalidate semantics: once an
+        entry is past its fresh period (or probabilistically shortly before it),
+        the stale content is returned while a single background refresh, guarded
+        by a cache lock, recrawls the source.
+        
         Args:
             max_pages: Maximum number of pages to crawl (defaults to config value)
+            force_refresh: Recrawl synchronously instead of serving cached content
             
         Returns:
             Dictionary containing medical terms, definitions, and context
         """
         if max_pages is None:
             max_pages = self.source_config.max_pages
-            
-        cache_key = f"{self.config.cache.cache_prefix}radiology_content_{max_pages}"
-        cached_content = cache.get(cache_key)
         
-        if cached_content:
-            logger.info("Returning cached radiology content")
-            return cached_content
+        if force_refresh:
+            return self._refresh_medical_terminology(max_pages)
         
-        logger.info(f"Starting RAG content extraction from {self.base_url}")
+        entry = cache.get(self._content_cache_key(max_pages))
+        
+        if self._is_content_entry(entry):
+            if self._needs_refresh(entry):
+                logger.info("Serving stale radiology content while refreshing in background")
+                self._start_background_refresh(max_pages)
+            else:
+                logger.info("Returning cached radiology content")
+            return entry['content']
+        
+        return self._refresh_medical_terminology(max_pages)
+    
+    def invalidate_medical_terminology(self) -> int:
+        """
+        Mark all cached radiology content stale
         
-        medical_content = {
+        Entries are not deleted, so readers keep getting the previous content
+        while the next request triggers a single background refresh.
+        
+        Returns:
+            The new content version
+        """
+        version = time.time_ns()
+        cache.set(self._content_version_key(), version, None)
+        logger.info(f"Invalidated radiology content cache, version {version}")
+        return version
+    
+    def _content_cache_key(self, max_pages: int) -> str:
+        return f"{self.config.cache.cache_prefix}radiology_content_{max_pages}"
+    
+    def _content_version_key(self) -> str:
+        return f"{self.config.cache.cache_prefix}radiology_content_version"
+    
+    def _refresh_lock_key(self, max_pages: int) -> str:
+        return f"{self.config.cache.cache_prefix}radiology_content_{max_pages}_lock"
+    
+    @staticmethod
+    def _is_content_entry(entry) -> bool:
+        return isinstance(entry, dict) and 'content' in entry and 'fresh_until' in entry
+    
+    def _needs_refresh(self, entry: Dict) -> bool:
+        """Check if an entry is invalidated or due for (probabilistic early) expiration"""
+        current_version = cache.get(self._content_version_key())
+        if current_version is not None and entry.get('version') != current_version:
+            return True
+        
+        # XFetch: refresh early with a probability that grows as expiry nears,
+        # scaled by how long the last crawl took
+        delta = entry.get('delta', 0.0)
+        beta = self.config.cache.early_expiration_beta
+        early_by = -delta * beta * math.log(random.random() or 1e-12)
+        return time.time() + early_by >= entry['fresh_until']
+    
+    def _start_background_refresh(self, max_pages: int):
+        """Start a refresh thread unless another worker already holds the refresh lock"""
+        token = uuid.uuid4().hex
+        if not cache.add(self._refresh_lock_key(max_pages), token, self.config.cache.refresh_lock_timeout):
+            return
+        
+        thread = threading.Thread(
+            target=self._run_locked_refresh,
+            args=(max_pages, token),
+            name=f'rag-refresh-{max_pages}',
+            daemon=True
+        )
+        thread.start()
+    
+    def _run_locked_refresh(self, max_pages: int, token: str) -> Dict:
+        """Crawl and store content, then release the refresh lock"""
+        try:
+            return self._crawl_and_store(max_pages)
+        finally:
+            lock_key = self._refresh_lock_key(max_pages)
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+    
+    def _refresh_medical_terminology(self, max_pages: int) -> Dict:
+        """Refresh synchronously, or wait for the worker that is already refreshing"""
+        token = uuid.uuid4().hex
+        if cache.add(self._refresh_lock_key(max_pages), token, self.config.cache.refresh_lock_timeout):
+            return self._run_locked_refresh(max_pages, token)
+        
+        logger.info("Radiology content refresh already in progress, waiting for it")
+        cache_key = self._content_cache_key(max_pages)
+        requested_at = time.time()
+        deadline = requested_at + self.config.cache.refresh_wait_timeout
+        
+        entry = None
+        while time.time() < deadline:
+            time.sleep(0.5)
+            entry = cache.get(cache_key)
+            if self._is_content_entry(entry) and entry['refreshed_at'] >= requested_at:
+                return entry['content']
+        
+        if self._is_content_entry(entry):
+            logger.warning("Timed out waiting for radiology content refresh, serving stale content")
+            return entry['content']
+        
+        logger.warning("Timed out waiting for radiology content refresh, no cached content available")
+        return self._empty_medical_content()
+    
+    def _crawl_and_store(self, max_pages: int) -> Dict:
+        """Crawl the source and cache the result with its freshness metadata"""
+        version = cache.get(self._content_version_key())
+        started = time.time()
+        medical_content, completed = self._crawl_medical_terminology(max_pages)
+        
+        if completed:
+            finished = time.time()
+            cache.set(
+                self._content_cache_key(max_pages),
+                {
+                    'content': medical_content,
+                    'version': version,
+                    'delta': finished - started,
+                    'refreshed_at': finished,
+                    'fresh_until': finished + self.config.cache.content_timeout
+                },
+                self.config.cache.content_timeout + self.config.cache.stale_timeout
+            )
+        
+        return medical_content
+    
+    def _empty_medical_content(self) -> Dict:
+        return {
             'terminology': {},
             'anatomical_terms': {},
             'pathology_terms': {},
@@ -72,6 +201,12 @@ class RadiologyRAGService:
                 'pages_processed': 0
             }
         }
+    
+    def _crawl_medical_terminology(self, max_pages: int) -> Tuple[Dict, bool]:
+        """Crawl radiologyassistant.nl, returning the content and whether the crawl completed"""
+        logger.info(f"Starting RAG content extraction from {self.base_url}")
+        
+        medical_content = self._empty_medical_content()
         
         try:
             # Start with the main page
@@ -103,21 +238,19 @@ class RadiologyRAGService:
                     logger.warning(f"Failed to process {link}: {str(e)}")
                     continue
             
-            # Cache the results using configured timeout
-            cache.set(cache_key, medical_content, self.config.cache.content_timeout)
-            
             logger.info(f"RAG extraction completed: {len(medical_content['terminology'])} terms extracted")
-            return medical_content
+            return medical_content, True
             
         except Exception as e:
             logger.error(f"RAG content extraction failed: {str(e)}")
-            return medical_content
+            return medical_content, False
     
     def _fetch_page_content(self, url: str) -> Optional[str]:
         """Fetch content from a single page with retry logic"""
         for attempt in range(self.retry_attempts):
             try:
-                response = self.session.get(url, timeout=self.timeout)
+                with track_external_call('radiologyassistant'):
+                    response = self.session.get(url, timeout=self.timeout)
                 response.raise_for_status()
                 return response.text
             except Exception as e:
@@ -0,0 +1,316 @@
+"""
+Built-in Vocabulary Index
+Precomputed token and character n-gram postings over the built-in medical
+vocabularies so that lookups only touch candidate terms, plus a compiled
+multi-term matcher for finding vocabulary terms in free text
+"""
+
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from config.medical_terminology_config import medical_terminology_config
+
+NGRAM_SIZE = 3
+
+
+@dataclass(frozen=True)
+class VocabularyEntry:
+    """A single term of a built-in vocabulary subcategory"""
+    term: str
+    term_lower: str
+    words: frozenset
+    category: str
+    subcategory: str
+    definition: str
+    corrections: Tuple[Dict, ...] = field(default_factory=tuple)
+
+
+@dataclass(frozen=True)
+class TermMatch:
+    """An occurrence of a vocabulary term in text"""
+    term: str
+    start: int
+    end: int
+
+
+def _ngrams(text: str, size: int = NGRAM_SIZE) -> Set[str]:
+    """Distinct character n-grams of text"""
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _short_grams(text: str) -> Set[str]:
+    """Distinct substrings shorter than NGRAM_SIZE"""
+    grams = set()
+    for size in range(1, NGRAM_SIZE):
+        grams.update(_ngrams(text, size))
+    return grams
+
+
+class VocabularyIndex:
+    """Inverted token index and character n-gram index over built-in terms"""
+
+    def __init__(self, config=medical_terminology_config):
+        self.version = config.vocabulary_version
+        self.entries: List[VocabularyEntry] = []
+        self.token_postings: Dict[str, List[int]] = defaultdict(list)
+        self.ngram_postings: Dict[str, List[int]] = defaultdict(list)
+        self.short_gram_postings: Dict[str, List[int]] = defaultdict(list)
+        self.ngram_counts: List[int] = []
+        self.short_terms: List[int] = []
+        self.corrections_by_term: Dict[str, Tuple[Dict, ...]] = {}
+
+        self._build_corrections(config)
+        self._build_entries(config)
+
+    def _build_corrections(self, config):
+        """Group every correction table by the lowercase term it applies to"""
+        grouped = defaultdict(list)
+        for correction_type, correction_dict in config.TERMINOLOGY_CORRECTIONS.items():
+            reason = f'{correction_type.replace("_", " ").title()} improvement'
+            for original, corrected in correction_dict.items():
+                grouped[original].append((correction_type, corrected, reason))
+        self._correction_templates = dict(grouped)
+
+    def _build_entries(self, config):
+        """Build postings for every (category, subcategory, term) triple"""
+        definitions = config.TERM_DEFINITIONS
+
+        for category_name, category_data in config.BUILTIN_VOCABULARIES.items():
+            for subcategory, terms in category_data.items():
+                for term in terms:
+                    term_lower = term.lower().strip()
+                    entry_id = len(self.entries)
+                    words = frozenset(term_lower.split())
+
+                    self.entries.append(VocabularyEntry(
+                        term=term,
+                        term_lower=term_lower,
+                        words=words,
+                        category=category_name,
+                        subcategory=subcategory,
+                        definition=definitions.get(term.lower(), f'Medical term: {term}'),
+                        corrections=self.corrections_for(term)
+                    ))
+
+                    for word in words:
+                        self.token_postings[word].append(entry_id)
+
+                    grams = _ngrams(term_lower)
+                    self.ngram_counts.append(len(grams))
+                    for gram in grams:
+                        self.ngram_postings[gram].append(entry_id)
+                    for gram in _short_grams(term_lower):
+                        self.short_gram_postings[gram].append(entry_id)
+
+                    if not grams:
+                        self.short_terms.append(entry_id)
+
+    def corrections_for(self, term: str) -> Tuple[Dict, ...]:
+        """Precomputed corrections for a term, computed once per term"""
+        templates = self._correction_templates.get(term.lower())
+        if not templates:
+            return ()
+        if term not in self.corrections_by_term:
+            self.corrections_by_term[term] = tuple(
+                {
+                    'type': correction_type,
+                    'original': term,
+                    'corrected': corrected,
+                    'reason': reason
+                }
+                for correction_type, corrected, reason in templates
+            )
+        return self.corrections_by_term[term]
+
+    def _contained_in_terms(self, text: str) -> Set[int]:
+        """Entries whose term contains text as a substring"""
+        if len(text) < NGRAM_SIZE:
+            return set(self.short_gram_postings.get(text, ()))
+
+        candidates: Optional[Set[int]] = None
+        # Intersect the rarest postings first to keep the working set small
+        for gram in sorted(_ngrams(text), key=lambda g: len(self.ngram_postings.get(g, ()))):
+            postings = self.ngram_postings.get(gram)
+            if not postings:
+                return set()
+            candidates = set(postings) if candidates is None else candidates.intersection(postings)
+            if not candidates:
+                return set()
+        return candidates or set()
+
+    def _containing_terms(self, text: str) -> Set[int]:
+        """Entries whose term may be a substring of text"""
+        hits = defaultdict(int)
+        for gram in _ngrams(text):
+            for entry_id in self.ngram_postings.get(gram, ()):
+                hits[entry_id] += 1
+
+        candidates = {
+            entry_id for entry_id, count in hits.items()
+            if count == self.ngram_counts[entry_id]
+        }
+        candidates.update(self.short_terms)
+        return candidates
+
+    def substring_candidates(self, text: str) -> Set[int]:
+        """Entries where text is in the term or the term is in text"""
+        if not text:
+            return set(range(len(self.entries)))
+        return self._contained_in_terms(text) | self._containing_terms(text)
+
+    def substring_matches(self, text: str) -> List[VocabularyEntry]:
+        """Entries where text is in the term or the term is in text, in vocabulary order"""
+        matches = []
+        for entry_id in sorted(self.substring_candidates(text)):
+            entry = self.entries[entry_id]
+            term_lower = entry.term.lower()
+            if text in term_lower or term_lower in text:
+                matches.append(entry)
+        return matches
+
+    @staticmethod
+    def score(query_lower: str, query_words: Set[str], entry: VocabularyEntry) -> float:
+        """Relevance score, equivalent to FreeMedicalTerminologyService._calculate_relevance"""
+        text_lower = entry.term_lower
+        if not entry.term:
+            return 0.0
+        if query_lower == text_lower:
+            return 1.0
+        if query_lower in text_lower:
+            return 0.8
+        if text_lower in query_lower:
+            return 0.7
+        if not query_words or not entry.words:
+            return 0.0
+
+        overlap = len(query_words & entry.words)
+        union = len(query_words | entry.words)
+        return overlap / union if union > 0 else 0.0
+
+    def search(self, query: str, min_score: float = 0.1) -> List[Tuple[VocabularyEntry, float]]:
+        """Score only the candidate entries that can exceed min_score"""
+        if not query:
+            return []
+
+        query_lower = query.lower().strip()
+        query_words = set(query_lower.split())
+        candidates = self.substring_candidates(query_lower)
+        for word in query_words:
+            candidates.update(self.token_postings.get(word, ()))
+
+        results = []
+        for entry_id in sorted(candidates):
+            entry = self.entries[entry_id]
+            relevance = self.score(query_lower, query_words, entry)
+            if relevance > min_score:
+                results.append((entry, relevance))
+        return results
+
+
+def _is_word_char(char: str) -> bool:
+    """Same character class as \\w in a str regex"""
+    return char.isalnum() or char == '_'
+
+
+class VocabularyMatcher:
+    """Character trie over a term list that finds every whole-word occurrence in one pass
+
+    Equivalent to running re.search(rf'\\b{re.escape(term)}\\b', text) for each
+    term, including overlapping terms such as 'spine' inside 'thoracic spine'.
+    """
+
+    _TERMINAL = object()
+
+    def __init__(self, terms: List[str], ignore_case: bool = True):
+        self.ignore_case = ignore_case
+        self.root: Dict = {}
+        self.term_count = 0
+
+        for term in terms:
+            key = term.lower() if ignore_case else term
+            if not key:
+                continue
+            node = self.root
+            for char in key:
+                node = node.setdefault(char, {})
+            node.setdefault(self._TERMINAL, []).append(term)
+            self.term_count += 1
+
+    def _prepare(self, text: str) -> str:
+        """Case-fold text while keeping offsets aligned with the original"""
+        if not self.ignore_case:
+            return text
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            lowered = ''.join(char if len(char.lower()) != 1 else char.lower() for char in text)
+        return lowered
+
+    def find_all(self, text: str) -> List[TermMatch]:
+        """Every occurrence of every term, ordered by start offset (longest first)"""
+        if not text or not self.root:
+            return []
+
+        haystack = self._prepare(text)
+        length = len(haystack)
+        word_flags = [_is_word_char(char) for char in haystack]
+        matches = []
+
+        for start in range(length):
+            node = self.root.get(haystack[start])
+            if node is None:
+                continue
+            # \b before the term
+            if (start > 0 and word_flags[start - 1]) == word_flags[start]:
+                continue
+
+            position = start
+            while node is not None:
+                position += 1
+                terms = node.get(self._TERMINAL)
+                # \b after the term
+                if terms and (position < length and word_flags[position]) != word_flags[position - 1]:
+                    matches.extend(TermMatch(term, start, position) for term in terms)
+                node = node.get(haystack[position]) if position < length else None
+
+        matches.sort(key=lambda match: (match.start, -match.end))
+        return matches
+
+    def matched_terms(self, text: str) -> List[str]:
+        """Distinct terms found in text, in order of first occurrence"""
+        return list(dict.fromkeys(match.term for match in self.find_all(text)))
+
+
+_index_lock = threading.Lock()
+_indexes: Dict[int, VocabularyIndex] = {}
+_matchers: Dict[int, Tuple[int, VocabularyMatcher]] = {}
+
+
+def get_vocabulary_index(config=medical_terminology_config) -> VocabularyIndex:
+    """Return the index for the config's current vocabulary version, rebuilding if stale"""
+    index = _indexes.get(id(config))
+    if index is not None and index.version == config.vocabulary_version:
+        return index
+
+    with _index_lock:
+        index = _indexes.get(id(config))
+        if index is None or index.version != config.vocabulary_version:
+            index = VocabularyIndex(config)
+            _indexes[id(config)] = index
+        return index
+
+
+def get_vocabulary_matcher(config=medical_terminology_config) -> VocabularyMatcher:
+    """Return the compiled matcher over all built-in terms, rebuilding if the vocabulary changed"""
+    cached = _matchers.get(id(config))
+    if cached is not None and cached[0] == config.vocabulary_version:
+        return cached[1]
+
+    with _index_lock:
+        cached = _matchers.get(id(config))
+        if cached is None or cached[0] != config.vocabulary_version:
+            version = config.vocabulary_version
+            cached = (version, VocabularyMatcher(sorted(config.get_all_builtin_terms())))
+            _matchers[id(config)] = cached
+        return cached[1]